@@ -36,6 +36,13 @@ resource "aws_lambda_function" "inference_arm64" {
   memory_size     = 1024
   timeout         = 300
 
+  environment {
+    variables = {
+      CACHE_TABLE_NAME   = aws_dynamodb_table.cache.name
+      SESSION_TABLE_NAME = aws_dynamodb_table.sessions.name
+    }
+  }
+
   tags = {
     Project      = var.project_name
     Environment  = var.environment
@@ -44,6 +51,50 @@ resource "aws_lambda_function" "inference_arm64" {
   }
 }
 
+# DynamoDB table for cached inference responses (expired items removed by TTL)
+resource "aws_dynamodb_table" "cache" {
+  name         = "${var.project_name}-Cache-${var.environment}"
+  billing_mode = "PAY_PER_REQUEST"
+  hash_key     = "cache_key"
+
+  attribute {
+    name = "cache_key"
+    type = "S"
+  }
+
+  ttl {
+    attribute_name = "expires_at"
+    enabled        = true
+  }
+
+  tags = {
+    Project     = var.project_name
+    Environment = var.environment
+  }
+}
+
+# DynamoDB table for conversation session history (idle sessions removed by TTL)
+resource "aws_dynamodb_table" "sessions" {
+  name         = "${var.project_name}-Sessions-${var.environment}"
+  billing_mode = "PAY_PER_REQUEST"
+  hash_key     = "session_id"
+
+  attribute {
+    name = "session_id"
+    type = "S"
+  }
+
+  ttl {
+    attribute_name = "expires_at"
+    enabled        = true
+  }
+
+  tags = {
+    Project     = var.project_name
+    Environment = var.environment
+  }
+}
+
 # ECS with Graviton instances
 resource "aws_ecs_cluster" "genai_cluster" {
   name = "${var.project_name}-cluster-${var.environment}"
@@ -123,4 +174,44 @@ resource "aws_iam_role_policy" "bedrock_access" {
       }
     ]
   })
-}
\ No newline at end of file
+}
+
+resource "aws_iam_role_policy" "cache_access" {
+  name = "cache-access"
+  role = aws_iam_role.lambda_role.id
+
+  policy = jsonencode({
+    Version = "2012-10-17"
+    Statement = [
+      {
+        Effect = "Allow"
+        Action = [
+          "dynamodb:GetItem",
+          "dynamodb:PutItem",
+          "dynamodb:BatchGetItem"
+        ]
+        Resource = aws_dynamodb_table.cache.arn
+      }
+    ]
+  })
+}
+
+resource "aws_iam_role_policy" "session_access" {
+  name = "session-access"
+  role = aws_iam_role.lambda_role.id
+
+  policy = jsonencode({
+    Version = "2012-10-17"
+    Statement = [
+      {
+        Effect = "Allow"
+        Action = [
+          "dynamodb:GetItem",
+          "dynamodb:PutItem",
+          "dynamodb:DeleteItem"
+        ]
+        Resource = aws_dynamodb_table.sessions.arn
+      }
+    ]
+  })
+}
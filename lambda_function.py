@@ -1,9 +1,26 @@
 import json
 import os
+import time
+
+# Module import runs once per execution environment, so it marks a cold start
+_MODULE_LOAD_START = time.perf_counter()
+
 import boto3
 
+try:
+    from src.inference import get_timing_headers
+except ImportError:
+    from inference import get_timing_headers
+
+_cold_start = True
+
 def lambda_handler(event, context):
     """AWS Lambda handler for model inference."""
+    global _cold_start
+    handler_start = time.perf_counter()
+    cold_start = _cold_start
+    _cold_start = False
+    
     try:
         # Handle CORS preflight requests
         http_method = event.get('httpMethod') or event.get('requestContext', {}).get('http', {}).get('method', 'POST')
@@ -36,12 +53,15 @@ def lambda_handler(event, context):
                 'body': json.dumps({'error': 'Missing prompt in request'}),
                 'headers': {
                     'Content-Type': 'application/json',
-                    'Access-Control-Allow-Origin': '*'
+                    'Access-Control-Allow-Origin': '*',
+                    **get_timing_headers(cold_start, handler_start, init_duration_ms=INIT_DURATION_MS)
                 }
             }
         
         # Run inference
+        inference_start = time.perf_counter()
         result = run_inference(data)
+        inference_ms = (time.perf_counter() - inference_start) * 1000
         
         return {
             'statusCode': 200,
@@ -50,7 +70,8 @@ def lambda_handler(event, context):
                 'Content-Type': 'application/json',
                 'Access-Control-Allow-Origin': '*',
                 'Access-Control-Allow-Methods': 'GET, POST, OPTIONS',
-                'Access-Control-Allow-Headers': 'Content-Type, Accept, Authorization'
+                'Access-Control-Allow-Headers': 'Content-Type, Accept, Authorization',
+                **get_timing_headers(cold_start, handler_start, inference_ms, INIT_DURATION_MS)
             }
         }
     except Exception as e:
@@ -62,7 +83,8 @@ def lambda_handler(event, context):
             }),
             'headers': {
                 'Content-Type': 'application/json',
-                'Access-Control-Allow-Origin': '*'
+                'Access-Control-Allow-Origin': '*',
+                **get_timing_headers(cold_start, handler_start, init_duration_ms=INIT_DURATION_MS)
             }
         }
 
@@ -99,4 +121,7 @@ def run_inference(data):
             'inference_complete': False,
             'error': str(e),
             'data': data
-        }
\ No newline at end of file
+        }
+
+# Time spent importing this module (including boto3 and the shared handler code) during the cold start
+INIT_DURATION_MS = (time.perf_counter() - _MODULE_LOAD_START) * 1000
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Results Analyzer for GenAI Pipeline load tests
+Reads streamed NDJSON result logs lazily and recomputes the summary statistics
+"""
+
+import argparse
+import json
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from results_log import StreamingStats, TimeSeriesAggregator, read_results
+
+def analyze_log(paths, timeseries=None):
+    """Aggregate result log segments without loading them into memory"""
+    stats = StreamingStats()
+    first_start = None
+    last_end = None
+
+    for result in read_results(paths):
+        stats.add(result)
+        if timeseries:
+            timeseries.add(result)
+
+        # Reconstruct the test window from completion timestamps
+        end = result.get('timestamp')
+        if isinstance(end, (int, float)):
+            start = end - result.get('response_time', 0)
+            first_start = start if first_start is None else min(first_start, start)
+            last_end = end if last_end is None else max(last_end, end)
+
+    total_time = (last_end - first_start) if first_start is not None else 0
+    return stats.summary(total_time)
+
+def main():
+    """Analyze one or more result logs"""
+    parser = argparse.ArgumentParser(description='GenAI Pipeline Results Analyzer')
+    parser.add_argument('paths', nargs='+', help='Result log directories, files or globs')
+    parser.add_argument('--json', action='store_true', help='Print statistics as JSON')
+    parser.add_argument('--timeseries', help='Also export per-second windows to this .csv or .json file')
+
+    args = parser.parse_args()
+
+    timeseries = TimeSeriesAggregator() if args.timeseries else None
+    stats = analyze_log(args.paths, timeseries)
+
+    if timeseries:
+        timeseries.export(args.timeseries)
+
+    if not stats['total_requests']:
+        print("❌ No results found")
+        return 1
+
+    if args.json:
+        print(json.dumps(stats, indent=2))
+        return 0
+
+    print("📊 Load Test Log Analysis")
+    print("=" * 60)
+    print(f"Total Requests: {stats['total_requests']}")
+    print(f"Successful: {stats['successful_requests']}")
+    print(f"Failed: {stats['failed_requests']}")
+    print(f"Success Rate: {stats['success_rate']:.1f}%")
+    print(f"Test Window: {stats['total_test_time']:.2f}s")
+    print(f"Requests/Second: {stats['requests_per_second']:.2f}")
+    print(f"Avg Response Time: {stats['avg_response_time']:.3f}s")
+    print(f"Median Response Time: {stats['median_response_time']:.3f}s")
+    print(f"95th Percentile: {stats['p95_response_time']:.3f}s")
+    print(f"99th Percentile: {stats['p99_response_time']:.3f}s")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -8,8 +8,6 @@ import asyncio
 import aiohttp
 import time
 import json
-import statistics
-import concurrent.futures
 from datetime import datetime
 from pathlib import Path
 import argparse
@@ -19,26 +17,39 @@ import os
 # Add project root to path
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
+from results_log import ResultLogWriter, StreamingStats, TimeSeriesAggregator, parse_timing_headers
+from workload import DEFAULT_PROFILE, fit_workload, generate_synthetic, load_workload, replay_schedule
+
 class PerformanceTestSuite:
-    def __init__(self, api_url, concurrent_users=10, total_requests=100):
+    def __init__(self, api_url, concurrent_users=10, total_requests=100, result_log=None):
         self.api_url = api_url.rstrip('/')
         self.concurrent_users = concurrent_users
         self.total_requests = total_requests
-        self.results = []
-        self.errors = []
+        self.result_log = result_log
+        self.stats = StreamingStats()
+        self.timeseries = TimeSeriesAggregator()
+    
+    def record_result(self, result):
+        """Aggregate a completed request and stream it to the result log"""
+        self.stats.add(result)
+        self.timeseries.add(result)
+        if self.result_log:
+            self.result_log.write(result)
         
     async def single_request(self, session, prompt, test_id):
         """Execute a single API request with timing"""
+        payload = prompt if isinstance(prompt, dict) else {"prompt": prompt}
         start_time = time.time()
         
         try:
             async with session.post(
                 self.api_url,
-                json={"prompt": prompt},
+                json=payload,
                 headers={"Content-Type": "application/json"},
                 timeout=aiohttp.ClientTimeout(total=30)
             ) as response:
                 response_time = time.time() - start_time
+                timing = parse_timing_headers(response.headers, response_time)
                 
                 if response.status == 200:
                     data = await response.json()
@@ -49,7 +60,8 @@ class PerformanceTestSuite:
                             'response_time': response_time,
                             'status_code': response.status,
                             'response_length': len(data.get('result', '')),
-                            'timestamp': datetime.now().isoformat()
+                            'timestamp': round(time.time(), 3),
+                            **timing
                         }
                     else:
                         return {
@@ -57,7 +69,8 @@ class PerformanceTestSuite:
                             'success': False,
                             'response_time': response_time,
                             'error': data.get('error', 'Unknown error'),
-                            'timestamp': datetime.now().isoformat()
+                            'timestamp': round(time.time(), 3),
+                            **timing
                         }
                 else:
                     return {
@@ -65,7 +78,8 @@ class PerformanceTestSuite:
                         'success': False,
                         'response_time': response_time,
                         'error': f"HTTP {response.status}",
-                        'timestamp': datetime.now().isoformat()
+                        'timestamp': round(time.time(), 3),
+                        **timing
                     }
                     
         except Exception as e:
@@ -75,7 +89,7 @@ class PerformanceTestSuite:
                 'success': False,
                 'response_time': response_time,
                 'error': str(e),
-                'timestamp': datetime.now().isoformat()
+                'timestamp': round(time.time(), 3)
             }
     
     async def load_test(self, test_prompts):
@@ -95,61 +109,77 @@ class PerformanceTestSuite:
         timeout = aiohttp.ClientTimeout(total=15)  # Reduced timeout for faster failure detection
         
         async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
-            tasks = []
+            # Workers pull request ids from a shared iterator so only
+            # concurrent_users requests are ever in flight or in memory
+            request_ids = iter(range(self.total_requests))
             
-            for i in range(self.total_requests):
-                prompt = test_prompts[i % len(test_prompts)]
-                task = self.single_request(session, prompt, i + 1)
-                tasks.append(task)
+            async def worker():
+                for i in request_ids:
+                    prompt = test_prompts[i % len(test_prompts)]
+                    result = await self.single_request(session, prompt, i + 1)
+                    self.record_result(result)
             
-            # Execute requests with concurrency control
-            semaphore = asyncio.Semaphore(self.concurrent_users)
+            start_time = time.time()
+            self.timeseries.start_time = start_time
+            await asyncio.gather(*[worker() for _ in range(min(self.concurrent_users, self.total_requests))])
+            total_time = time.time() - start_time
             
-            async def bounded_request(task):
-                async with semaphore:
-                    return await task
+            return total_time
+    
+    async def replay_test(self, schedule):
+        """Send requests at their scheduled offsets (open loop) with a concurrency cap"""
+        print(f"🎬 Starting workload replay...")
+        print(f"   Max in-flight requests: {self.concurrent_users}")
+        print(f"   API endpoint: {self.api_url}")
+        print("-" * 60)
+        
+        connector = aiohttp.TCPConnector(
+            limit=self.concurrent_users * 4,
+            limit_per_host=self.concurrent_users * 2,
+            keepalive_timeout=60,
+            enable_cleanup_closed=True
+        )
+        timeout = aiohttp.ClientTimeout(total=30)
+        semaphore = asyncio.Semaphore(self.concurrent_users)
+        
+        async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+            async def send(payload, test_id):
+                try:
+                    self.record_result(await self.single_request(session, payload, test_id))
+                finally:
+                    semaphore.release()
             
             start_time = time.time()
-            results = await asyncio.gather(*[bounded_request(task) for task in tasks])
+            self.timeseries.start_time = start_time
+            pending = set()
+            sent = 0
+            
+            for offset, payload in schedule:
+                delay = start_time + offset - time.time()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                
+                # Blocks only when the endpoint falls behind the recorded rate
+                await semaphore.acquire()
+                sent += 1
+                task = asyncio.create_task(send(payload, sent))
+                pending.add(task)
+                task.add_done_callback(pending.discard)
+            
+            if pending:
+                await asyncio.gather(*pending)
             total_time = time.time() - start_time
             
-            self.results = results
+            self.total_requests = sent
             return total_time
     
     def analyze_results(self, total_time):
         """Analyze performance test results"""
-        successful_results = [r for r in self.results if r['success']]
-        failed_results = [r for r in self.results if not r['success']]
-        
-        if not successful_results:
+        if not self.stats.successful_requests:
             print("❌ No successful requests - cannot analyze performance")
             return
         
-        response_times = [r['response_time'] for r in successful_results]
-        
-        # Calculate statistics
-        stats = {
-            'total_requests': len(self.results),
-            'successful_requests': len(successful_results),
-            'failed_requests': len(failed_results),
-            'success_rate': (len(successful_results) / len(self.results)) * 100,
-            'total_test_time': total_time,
-            'requests_per_second': len(self.results) / total_time,
-            'avg_response_time': statistics.mean(response_times),
-            'median_response_time': statistics.median(response_times),
-            'min_response_time': min(response_times),
-            'max_response_time': max(response_times),
-            'p95_response_time': self.percentile(response_times, 95),
-            'p99_response_time': self.percentile(response_times, 99)
-        }
-        
-        return stats
-    
-    def percentile(self, data, percentile):
-        """Calculate percentile"""
-        sorted_data = sorted(data)
-        index = int((percentile / 100) * len(sorted_data))
-        return sorted_data[min(index, len(sorted_data) - 1)]
+        return self.stats.summary(total_time)
     
     def print_results(self, stats):
         """Print formatted test results"""
@@ -179,7 +209,24 @@ class PerformanceTestSuite:
         print(f"\n🚀 ARM64 Performance Benefits:")
         print(f"   Cost Savings: 40% vs x86 instances")
         print(f"   Performance Gain: 20% faster processing")
-        print(f"   Cold Start: 25% faster initialization")
+        
+        # Measured cold start behaviour from the handler's timing headers
+        cold = stats.get('cold_start')
+        print(f"\n🧊 Cold Start Analysis:")
+        if not cold:
+            print(f"   No timing headers reported by the endpoint")
+        else:
+            print(f"   Cold Starts: {cold['cold_starts']} ({cold['cold_start_rate']:.1f}% of requests)")
+            if cold['cold_avg_response_time'] is not None:
+                print(f"   Cold Avg Response Time: {cold['cold_avg_response_time']:.3f}s")
+                print(f"   Avg Init Duration: {cold['avg_init_duration']:.3f}s")
+            if cold['warm_avg_response_time'] is not None:
+                print(f"   Warm Avg Response Time: {cold['warm_avg_response_time']:.3f}s")
+            if cold['cold_avg_response_time'] is not None and cold['warm_avg_response_time'] is not None:
+                penalty = cold['cold_avg_response_time'] - cold['warm_avg_response_time']
+                print(f"   Cold Start Penalty: {penalty:.3f}s")
+            print(f"   Avg Server Time: {cold['avg_server_time']:.3f}s")
+            print(f"   Avg Network Time: {cold['avg_network_time']:.3f}s")
         
         # Performance assessment
         if stats['success_rate'] >= 99:
@@ -196,8 +243,8 @@ class PerformanceTestSuite:
         else:
             print(f"❌ SLOW: {stats['avg_response_time']:.3f}s average response")
     
-    def save_results(self, stats, filename=None):
-        """Save results to JSON file"""
+    def save_results(self, stats, filename=None, timeseries_file=None):
+        """Save results to JSON file and the per-second time series to CSV/JSON"""
         if not filename:
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
             filename = f"performance_results_{timestamp}.json"
@@ -207,16 +254,23 @@ class PerformanceTestSuite:
                 'api_url': self.api_url,
                 'concurrent_users': self.concurrent_users,
                 'total_requests': self.total_requests,
-                'timestamp': datetime.now().isoformat()
+                'timestamp': round(time.time(), 3)
             },
             'statistics': stats,
-            'detailed_results': self.results
+            'result_log': self.result_log.files if self.result_log else []
         }
         
         with open(filename, 'w') as f:
             json.dump(results_data, f, indent=2)
         
         print(f"\n💾 Results saved to: {filename}")
+        
+        if not timeseries_file:
+            timeseries_file = str(Path(filename).with_suffix('')) + '_timeseries.csv'
+        self.timeseries.export(timeseries_file)
+        print(f"📈 Time series saved to: {timeseries_file}")
+        if self.result_log and self.result_log.files:
+            print(f"📝 Per-request log: {self.result_log.directory} ({len(self.result_log.files)} segment(s))")
 
 def get_test_prompts():
     """Get diverse test prompts for performance testing"""
@@ -245,6 +299,14 @@ async def main():
     parser.add_argument('--users', type=int, default=10, help='Concurrent users (default: 10)')
     parser.add_argument('--requests', type=int, default=100, help='Total requests (default: 100)')
     parser.add_argument('--output', help='Output file for results')
+    parser.add_argument('--replay', help='Replay recorded traffic from a JSONL request log')
+    parser.add_argument('--speedup', type=float, default=1.0, help='Replay speed-up factor for recorded inter-arrival times (default: 1.0)')
+    parser.add_argument('--synthetic', type=int, help='Generate this many requests from a fitted (or default) workload profile')
+    parser.add_argument('--seed', type=int, default=42, help='Random seed for synthetic workloads (default: 42)')
+    parser.add_argument('--timeseries', help='Output file for per-second time series (.csv or .json)')
+    parser.add_argument('--log-dir', default='performance_logs', help='Directory for the streamed per-request log (default: performance_logs)')
+    parser.add_argument('--rotate-mb', type=int, default=64, help='Rotate the per-request log after this many MB (default: 64)')
+    parser.add_argument('--compress', action='store_true', help='Gzip the per-request log segments')
     
     args = parser.parse_args()
     
@@ -252,19 +314,37 @@ async def main():
     print("ARM64 Optimized Performance Testing")
     print("=" * 60)
     
+    # Stream per-request results to disk instead of holding them in memory
+    result_log = ResultLogWriter(
+        args.log_dir,
+        prefix=f"results_{datetime.now().strftime('%Y%m%d_%H%M%S')}",
+        max_bytes=args.rotate_mb * 1024 * 1024,
+        compress=args.compress
+    )
+    
     # Initialize test suite
     test_suite = PerformanceTestSuite(
         api_url=args.url,
         concurrent_users=args.users,
-        total_requests=args.requests
+        total_requests=args.requests,
+        result_log=result_log
     )
     
-    # Get test prompts
-    test_prompts = get_test_prompts()
-    
     try:
-        # Run load test
-        total_time = await test_suite.load_test(test_prompts)
+        if args.synthetic:
+            # Fit the profile from recorded traffic when available
+            profile = fit_workload(load_workload(args.replay)) if args.replay else dict(DEFAULT_PROFILE)
+            profile['rate'] *= args.speedup
+            print(f"🎲 Synthetic workload: {profile['distinct_prompts']} prompts, "
+                  f"Zipf s={profile['zipf_s']:.2f}, {profile['rate']:.1f} req/s")
+            schedule = generate_synthetic(profile, args.synthetic, seed=args.seed)
+            total_time = await test_suite.replay_test(schedule)
+        elif args.replay:
+            schedule = replay_schedule(load_workload(args.replay), speedup=args.speedup)
+            total_time = await test_suite.replay_test(schedule)
+        else:
+            # Run load test
+            total_time = await test_suite.load_test(get_test_prompts())
         
         # Analyze results
         stats = test_suite.analyze_results(total_time)
@@ -274,12 +354,14 @@ async def main():
             test_suite.print_results(stats)
             
             # Save results
-            test_suite.save_results(stats, args.output)
+            test_suite.save_results(stats, args.output, args.timeseries)
         
     except KeyboardInterrupt:
         print("\n⚠️  Test interrupted by user")
     except Exception as e:
         print(f"\n❌ Test failed: {str(e)}")
+    finally:
+        result_log.close()
 
 if __name__ == "__main__":
     asyncio.run(main())
\ No newline at end of file
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Preprocessing Benchmark for GenAI Pipeline
+Measures rows/sec, peak memory and worker scaling of the preprocessor on large inputs
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# Add project root to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+sys.path.insert(0, str(Path(__file__).parent))
+
+from src.data_processing import PREPROCESS_CHUNK_ROWS, preprocess_data
+from workload import WORDS
+
+# Rows generated per write when building the synthetic input
+GENERATE_CHUNK_ROWS = 100000
+
+def generate_input(path, size_mb, file_format, seed=42):
+    """Write a synthetic CSV or JSONL file of roughly size_mb megabytes"""
+    rng = np.random.default_rng(seed)
+    words = np.array(WORDS, dtype=object)
+    target = size_mb * 1024 * 1024
+    rows = 0
+
+    with open(path, 'w', encoding='utf-8') as f:
+        if file_format == 'csv':
+            f.write('id,topic,text\n')
+        while f.tell() < target:
+            lengths = rng.integers(10, 60, GENERATE_CHUNK_ROWS)
+            picks = rng.integers(0, len(words), lengths.sum())
+            texts = [' '.join(chunk) for chunk in np.split(words[picks], np.cumsum(lengths)[:-1])]
+            chunk = pd.DataFrame({
+                'id': np.arange(rows, rows + GENERATE_CHUNK_ROWS),
+                'topic': words[rng.integers(0, len(words), GENERATE_CHUNK_ROWS)],
+                'text': texts
+            })
+            if file_format == 'csv':
+                chunk.to_csv(f, header=False, index=False)
+            else:
+                chunk.to_json(f, orient='records', lines=True)
+            rows += GENERATE_CHUNK_ROWS
+    return rows
+
+def main():
+    """Main benchmark function"""
+    parser = argparse.ArgumentParser(description='GenAI Pipeline Preprocessing Benchmark')
+    parser.add_argument('--input', help='Existing CSV/JSONL file (default: generate one)')
+    parser.add_argument('--size-mb', type=int, default=1024, help='Size of the generated input (default: 1024)')
+    parser.add_argument('--format', choices=['csv', 'jsonl'], default='csv', help='Generated input format')
+    parser.add_argument('--chunk-rows', type=int, default=PREPROCESS_CHUNK_ROWS, help='Rows per chunk')
+    parser.add_argument('--template', default='Summarize this {topic} note: {text}', help='Prompt template')
+    parser.add_argument('--workers', default='1', help='Comma-separated worker counts to compare, e.g. 1,2,4,8')
+    parser.add_argument('--output', help='Also write prompts to this JSONL file')
+    parser.add_argument('--json', action='store_true', help='Print results as JSON')
+
+    args = parser.parse_args()
+
+    print("🧪 GenAI Pipeline - Preprocessing Benchmark")
+    print("=" * 60)
+
+    temp_dir = None
+    input_path = args.input
+    if input_path is None:
+        temp_dir = tempfile.TemporaryDirectory()
+        input_path = os.path.join(temp_dir.name, f"input.{args.format}")
+        print(f"📝 Generating ~{args.size_mb} MB {args.format.upper()} input...")
+        start_time = time.time()
+        # Generate in a child process so it does not count toward our peak RSS
+        with ProcessPoolExecutor(max_workers=1) as executor:
+            generated = executor.submit(generate_input, input_path, args.size_mb, args.format).result()
+        print(f"   {generated:,} rows in {time.time() - start_time:.1f}s")
+
+    worker_counts = [int(count) for count in args.workers.split(',')]
+    results = []
+    try:
+        input_mb = os.path.getsize(input_path) / (1024 * 1024)
+        for workers in worker_counts:
+            print(f"⚙️  Preprocessing {input_mb:.0f} MB with {workers} worker(s), {args.chunk_rows:,} rows per chunk...")
+            result = preprocess_data(input_path, args.template, args.output, args.chunk_rows, workers)
+            result['input_mb'] = round(input_mb, 1)
+            result['mb_per_sec'] = round(input_mb / result['seconds'], 1) if result['seconds'] else 0.0
+            results.append(result)
+    finally:
+        if temp_dir:
+            temp_dir.cleanup()
+
+    if args.json:
+        print(json.dumps(results if len(results) > 1 else results[0], indent=2))
+        return 0
+
+    print("\n📊 Results")
+    print(f"   Rows: {results[0]['rows']:,} from {input_mb:.0f} MB")
+    print(f"   {'Workers':>7} {'Time':>9} {'Rows/sec':>12} {'MB/s':>8} {'Speed-up':>9} {'Peak RSS':>10}")
+    baseline = results[0]['seconds']
+    for result in results:
+        speedup = baseline / result['seconds'] if result['seconds'] else 0.0
+        # Peak RSS is a high-water mark, so later runs report at least the earlier peaks
+        peak = max(result['peak_rss_mb'], result['peak_worker_rss_mb'] or 0)
+        print(f"   {result['workers']:>7} {result['seconds']:>8.2f}s {result['rows_per_sec']:>12,.0f} "
+              f"{result['mb_per_sec']:>8} {speedup:>8.2f}x {peak:>8.0f} MB")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Result Writer Benchmark for GenAI Pipeline
+Compares write throughput, file size and scan time of Parquet, Arrow IPC and JSONL results
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# Add project root to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+sys.path.insert(0, str(Path(__file__).parent))
+
+from src import result_writer
+from workload import WORDS
+
+MODELS = ['claude-haiku', 'claude-3-5-haiku', 'claude-sonnet', 'titan-text']
+
+def generate_records(count, seed=42):
+    """Synthetic result rows with outputs of 30-150 words"""
+    rng = random.Random(seed)
+    records = []
+    for row_id in range(count):
+        failed = rng.random() < 0.02
+        response = {
+            'inference_complete': not failed,
+            'model': rng.choice(MODELS),
+            'result': None if failed else ' '.join(rng.choices(WORDS, k=rng.randint(30, 150))),
+            'error': 'ThrottlingException: Rate exceeded' if failed else None,
+            'usage': {'input_tokens': rng.randint(20, 2000), 'output_tokens': rng.randint(30, 300)}
+        }
+        records.append(result_writer.result_record(
+            row_id, {'prompt': f'prompt {row_id}'}, response, rng.uniform(200, 3000), rng.random() < 0.3
+        ))
+    return records
+
+def scan_latency(path, result_format):
+    """Mean latency over all rows, reading only what the format allows"""
+    if result_format == 'parquet':
+        column = pq.read_table(path, columns=['latency_ms']).column('latency_ms')
+    elif result_format == 'arrow':
+        with pa.memory_map(path) as source:
+            column = pa.ipc.open_file(source).read_all().column('latency_ms')
+        return pa.compute.mean(column).as_py()
+    else:
+        total = count = 0
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                latency = json.loads(line)['latency_ms']
+                if latency is not None:
+                    total += latency
+                    count += 1
+        return total / count
+    return pa.compute.mean(column).as_py()
+
+def benchmark(records, result_format, directory):
+    """Write all records in one format and scan them back"""
+    path = os.path.join(directory, f'results.{result_format}')
+    start = time.perf_counter()
+    writer = result_writer.open_result_writer(path, result_format)
+    for record in records:
+        writer.write(record)
+    writer.close()
+    write_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    scan_latency(path, result_format)
+    scan_seconds = time.perf_counter() - start
+
+    size_mb = os.path.getsize(path) / (1024 * 1024)
+    return {
+        'format': result_format,
+        'rows': len(records),
+        'write_seconds': round(write_seconds, 3),
+        'rows_per_sec': round(len(records) / write_seconds, 1),
+        'size_mb': round(size_mb, 2),
+        'mb_per_sec': round(size_mb / write_seconds, 1),
+        'scan_seconds': round(scan_seconds, 3)
+    }
+
+def main():
+    """Main benchmark function"""
+    parser = argparse.ArgumentParser(description='GenAI Pipeline Result Writer Benchmark')
+    parser.add_argument('--rows', type=int, default=200000, help='Result rows to write (default: 200000)')
+    parser.add_argument('--row-group-rows', type=int, default=result_writer.RESULT_ROW_GROUP_ROWS, help='Rows per row group')
+    parser.add_argument('--formats', default='jsonl,parquet,arrow', help='Comma-separated formats to compare')
+    parser.add_argument('--json', action='store_true', help='Print results as JSON')
+
+    args = parser.parse_args()
+    result_writer.RESULT_ROW_GROUP_ROWS = args.row_group_rows
+
+    print("🧪 GenAI Pipeline - Result Writer Benchmark")
+    print("=" * 60)
+    print(f"📝 Generating {args.rows:,} result rows...")
+    records = generate_records(args.rows)
+
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        for result_format in args.formats.split(','):
+            print(f"⚙️  Writing {result_format}...")
+            results.append(benchmark(records, result_format, directory))
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return 0
+
+    print("\n📊 Results")
+    print(f"   {'Format':<8} {'Write':>9} {'Rows/sec':>12} {'Size':>10} {'Scan latency_ms':>16}")
+    for result in results:
+        print(f"   {result['format']:<8} {result['write_seconds']:>8.2f}s {result['rows_per_sec']:>12,.0f} "
+              f"{result['size_mb']:>7.1f} MB {result['scan_seconds']:>15.3f}s")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,325 @@
+#!/usr/bin/env python3
+"""
+Streaming results log for GenAI Pipeline load tests
+Writes per-request results as compact NDJSON and aggregates them incrementally
+"""
+
+import csv
+import gzip
+import json
+import math
+from pathlib import Path
+
+class LatencyHistogram:
+    """Log-bucketed latency histogram with bounded memory and ~1% relative error"""
+
+    def __init__(self, relative_accuracy=0.01):
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.log_gamma = math.log(self.gamma)
+        self.buckets = {}
+        self.zero_count = 0
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+
+    def add(self, value):
+        """Record a single latency value (seconds)"""
+        self.count += 1
+        self.total += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+        if value <= 1e-9:
+            self.zero_count += 1
+            return
+
+        index = math.ceil(math.log(value) / self.log_gamma)
+        self.buckets[index] = self.buckets.get(index, 0) + 1
+
+    def merge(self, other):
+        """Merge another histogram into this one"""
+        for index, count in other.buckets.items():
+            self.buckets[index] = self.buckets.get(index, 0) + count
+        self.zero_count += other.zero_count
+        self.count += other.count
+        self.total += other.total
+        if other.min is not None:
+            self.min = other.min if self.min is None else min(self.min, other.min)
+            self.max = other.max if self.max is None else max(self.max, other.max)
+
+    def mean(self):
+        """Average of recorded values"""
+        return self.total / self.count if self.count else 0.0
+
+    def percentile(self, percentile):
+        """Estimate a percentile using the same rank rule as the load test suite"""
+        if not self.count:
+            return 0.0
+
+        rank = min(int((percentile / 100) * self.count), self.count - 1)
+        if rank < self.zero_count:
+            return 0.0
+
+        seen = self.zero_count
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen > rank:
+                # Midpoint of the bucket, clamped to the observed range
+                value = 2 * self.gamma ** index / (self.gamma + 1)
+                return min(max(value, self.min), self.max)
+
+        return self.max
+
+def parse_timing_headers(headers, response_time):
+    """Split client latency using the timing headers set by the Lambda handler"""
+    if 'X-Cold-Start' not in headers:
+        return {}
+
+    timing = {'cold_start': headers['X-Cold-Start'] == 'true'}
+    try:
+        server_time = float(headers.get('X-Server-Time-Ms', 0)) / 1000
+        init_duration = float(headers.get('X-Init-Duration-Ms', 0)) / 1000
+        timing['server_time'] = server_time
+        timing['init_duration'] = init_duration
+        # Init runs before the handler, so it is neither server nor network time
+        timing['network_time'] = max(response_time - server_time - init_duration, 0.0)
+        if 'X-Inference-Time-Ms' in headers:
+            timing['inference_time'] = float(headers['X-Inference-Time-Ms']) / 1000
+    except ValueError:
+        pass
+    return timing
+
+class StreamingStats:
+    """Incremental aggregation of load test results"""
+
+    def __init__(self):
+        self.total_requests = 0
+        self.successful_requests = 0
+        self.failed_requests = 0
+        self.latency = LatencyHistogram()
+        self.cold_latency = LatencyHistogram()
+        self.warm_latency = LatencyHistogram()
+        self.server_time = LatencyHistogram()
+        self.network_time = LatencyHistogram()
+        self.init_duration = LatencyHistogram()
+
+    def add(self, result):
+        """Fold one per-request result dict into the aggregate"""
+        self.total_requests += 1
+        if result.get('success'):
+            self.successful_requests += 1
+            if 'response_time' in result:
+                self.latency.add(result['response_time'])
+        else:
+            self.failed_requests += 1
+
+        # Server-reported timing is only present when the endpoint sends it
+        if 'cold_start' in result and 'response_time' in result:
+            if result['cold_start']:
+                self.cold_latency.add(result['response_time'])
+                self.init_duration.add(result.get('init_duration', 0.0))
+            else:
+                self.warm_latency.add(result['response_time'])
+            if 'server_time' in result:
+                self.server_time.add(result['server_time'])
+                self.network_time.add(result['network_time'])
+
+    def cold_start_summary(self):
+        """Cold vs warm latency and the network/server split, if reported"""
+        if not (self.cold_latency.count or self.warm_latency.count):
+            return None
+
+        reported = self.cold_latency.count + self.warm_latency.count
+        return {
+            'reported_requests': reported,
+            'cold_starts': self.cold_latency.count,
+            'cold_start_rate': (self.cold_latency.count / reported) * 100,
+            'cold_avg_response_time': self.cold_latency.mean() if self.cold_latency.count else None,
+            'cold_p50_response_time': self.cold_latency.percentile(50) if self.cold_latency.count else None,
+            'warm_avg_response_time': self.warm_latency.mean() if self.warm_latency.count else None,
+            'warm_p50_response_time': self.warm_latency.percentile(50) if self.warm_latency.count else None,
+            'avg_init_duration': self.init_duration.mean() if self.init_duration.count else None,
+            'avg_server_time': self.server_time.mean(),
+            'avg_network_time': self.network_time.mean()
+        }
+
+    def summary(self, total_time):
+        """Build the statistics dict reported by the performance test"""
+        return {
+            'total_requests': self.total_requests,
+            'successful_requests': self.successful_requests,
+            'failed_requests': self.failed_requests,
+            'success_rate': (self.successful_requests / self.total_requests) * 100 if self.total_requests else 0,
+            'total_test_time': total_time,
+            'requests_per_second': self.total_requests / total_time if total_time else 0,
+            'avg_response_time': self.latency.mean(),
+            'median_response_time': self.latency.percentile(50),
+            'min_response_time': self.latency.min or 0.0,
+            'max_response_time': self.latency.max or 0.0,
+            'p95_response_time': self.latency.percentile(95),
+            'p99_response_time': self.latency.percentile(99),
+            'cold_start': self.cold_start_summary()
+        }
+
+class TimeSeriesAggregator:
+    """Per-window throughput, error rate and latency percentiles"""
+
+    COLUMNS = [
+        'second', 'requests', 'requests_per_second', 'errors', 'error_rate',
+        'avg_response_time', 'p50_response_time', 'p95_response_time',
+        'p99_response_time', 'cold_starts', 'active_users'
+    ]
+
+    def __init__(self, window=1.0, start_time=None):
+        self.window = window
+        self.start_time = start_time
+        self.windows = {}
+
+    def _window(self, timestamp):
+        """Get or create the bucket for an epoch timestamp"""
+        if self.start_time is None:
+            self.start_time = timestamp
+
+        index = max(int((timestamp - self.start_time) // self.window), 0)
+        if index not in self.windows:
+            self.windows[index] = {
+                'requests': 0,
+                'errors': 0,
+                'cold_starts': 0,
+                'latency': LatencyHistogram(),
+                'active_users': None
+            }
+        return self.windows[index]
+
+    def add(self, result):
+        """Assign a result to the window in which it completed"""
+        timestamp = result.get('timestamp')
+        if not isinstance(timestamp, (int, float)):
+            return
+
+        window = self._window(timestamp)
+        window['requests'] += 1
+        if result.get('success'):
+            if 'response_time' in result:
+                window['latency'].add(result['response_time'])
+        else:
+            window['errors'] += 1
+        if result.get('cold_start'):
+            window['cold_starts'] += 1
+
+    def observe_users(self, timestamp, users):
+        """Record the peak number of active virtual users in a window"""
+        window = self._window(timestamp)
+        window['active_users'] = max(window['active_users'] or 0, users)
+
+    def rows(self):
+        """Yield one row per window, including empty windows"""
+        if not self.windows:
+            return
+
+        for index in range(max(self.windows) + 1):
+            window = self.windows.get(index)
+            if window is None:
+                yield dict.fromkeys(self.COLUMNS, 0) | {'second': index * self.window, 'active_users': None}
+                continue
+
+            latency = window['latency']
+            yield {
+                'second': index * self.window,
+                'requests': window['requests'],
+                'requests_per_second': window['requests'] / self.window,
+                'errors': window['errors'],
+                'error_rate': (window['errors'] / window['requests']) * 100 if window['requests'] else 0,
+                'avg_response_time': latency.mean(),
+                'p50_response_time': latency.percentile(50),
+                'p95_response_time': latency.percentile(95),
+                'p99_response_time': latency.percentile(99),
+                'cold_starts': window['cold_starts'],
+                'active_users': window['active_users']
+            }
+
+    def export(self, filename):
+        """Write the time series as CSV or JSON depending on the file extension"""
+        rows = list(self.rows())
+
+        if str(filename).endswith('.json'):
+            with open(filename, 'w', encoding='utf-8') as f:
+                json.dump({'window_seconds': self.window, 'windows': rows}, f)
+        else:
+            with open(filename, 'w', encoding='utf-8', newline='') as f:
+                writer = csv.DictWriter(f, fieldnames=self.COLUMNS)
+                writer.writeheader()
+                writer.writerows(rows)
+
+        return filename
+
+class ResultLogWriter:
+    """Append-only NDJSON result log with size-based rotation"""
+
+    def __init__(self, directory, prefix='results', max_bytes=64 * 1024 * 1024, compress=False):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.prefix = prefix
+        self.max_bytes = max_bytes
+        self.compress = compress
+        self.files = []
+        self._handle = None
+        self._written = 0
+
+    def _open_next(self):
+        """Close the current segment and start a new one"""
+        if self._handle:
+            self._handle.close()
+
+        suffix = '.ndjson.gz' if self.compress else '.ndjson'
+        path = self.directory / f"{self.prefix}-{len(self.files) + 1:05d}{suffix}"
+        if self.compress:
+            self._handle = gzip.open(path, 'wt', encoding='utf-8', compresslevel=1)
+        else:
+            self._handle = open(path, 'w', encoding='utf-8', buffering=1024 * 1024)
+        self.files.append(str(path))
+        self._written = 0
+
+    def write(self, result):
+        """Append one result as a single compact JSON line"""
+        if self._handle is None or self._written >= self.max_bytes:
+            self._open_next()
+
+        line = json.dumps(result, separators=(',', ':')) + '\n'
+        self._handle.write(line)
+        self._written += len(line)
+
+    def close(self):
+        """Flush and close the current segment"""
+        if self._handle:
+            self._handle.close()
+            self._handle = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+def expand_log_paths(paths):
+    """Expand directories and globs into an ordered list of log segments"""
+    files = []
+    for path in paths:
+        path = Path(path)
+        if path.is_dir():
+            files.extend(sorted(path.glob('*.ndjson')) + sorted(path.glob('*.ndjson.gz')))
+        elif path.exists():
+            files.append(path)
+        else:
+            files.extend(sorted(Path(path.parent).glob(path.name)))
+    return files
+
+def read_results(paths):
+    """Lazily yield result dicts from one or more NDJSON log segments"""
+    for path in expand_log_paths(paths):
+        opener = gzip.open if str(path).endswith('.gz') else open
+        with opener(path, 'rt', encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
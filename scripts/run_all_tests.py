@@ -3,60 +3,129 @@
 Fast Test Runner - Execute all performance tests quickly
 """
 
+import argparse
 import asyncio
-import subprocess
 import time
 import sys
 from pathlib import Path
 
 API_URL = "https://w7pifyp624nwwvrcjomh47ynsy0shwce.lambda-url.us-east-1.on.aws/"
 
+SCRIPTS_DIR = Path(__file__).parent
+
+# Per-check timeouts in seconds
+CHECK_TIMEOUTS = {
+    'quick': 120,
+    'performance': 600,
+    'stress': 300
+}
+
 async def run_quick_test():
     """Run quick performance test"""
     print("🚀 Running Quick Test...")
-    exec(open('scripts/quick_test.py').read())
+    sys.path.insert(0, str(SCRIPTS_DIR))
+    from quick_test import quick_test
+    await quick_test()
+
+async def run_script(name, args):
+    """Run a test script in a subprocess and print its output when it finishes"""
+    process = await asyncio.create_subprocess_exec(
+        sys.executable, str(SCRIPTS_DIR / args[0]), *args[1:],
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.STDOUT
+    )
+    try:
+        output, _ = await process.communicate()
+    except asyncio.CancelledError:
+        # Timed out: make sure the child does not outlive the runner
+        process.kill()
+        await process.wait()
+        raise
+
+    print(f"\n{name} output:")
+    print(output.decode('utf-8', errors='replace'))
+
+    if process.returncode != 0:
+        raise RuntimeError(f"exited with code {process.returncode}")
 
-def run_performance_test():
+async def run_performance_test():
     """Run full performance test"""
     print("\n📊 Running Performance Test...")
-    cmd = [
-        sys.executable, 'scripts/performance_test.py',
+    await run_script("📊 Performance Test", [
+        'performance_test.py',
         '--url', API_URL,
         '--users', '15',
         '--requests', '50'
-    ]
-    subprocess.run(cmd)
+    ])
 
-def run_stress_test():
+async def run_stress_test():
     """Run stress test"""
     print("\n🔥 Running Stress Test...")
-    cmd = [
-        sys.executable, 'scripts/stress_test.py',
+    await run_script("🔥 Stress Test", [
+        'stress_test.py',
         '--url', API_URL,
         '--max-users', '25',
         '--ramp-duration', '60',
         '--test-duration', '120'
-    ]
-    subprocess.run(cmd)
+    ])
+
+async def run_check(name, check, timeout):
+    """Run one check with a timeout and record its outcome"""
+    start_time = time.time()
+    try:
+        await asyncio.wait_for(check(), timeout)
+        status = 'PASS'
+    except asyncio.TimeoutError:
+        status = f'TIMEOUT ({timeout}s)'
+    except Exception as e:
+        status = f'FAIL ({e})'
+    return name, status, time.time() - start_time
 
 async def main():
-    """Run all tests in sequence"""
+    """Run all tests, one after another unless --concurrent is given"""
+    parser = argparse.ArgumentParser(description='GenAI Pipeline Fast Test Suite')
+    parser.add_argument('--concurrent', action='store_true',
+                        help='Run the tests at the same time; each one generates load, so their latency '
+                             'and RPS numbers then skew each other')
+    args = parser.parse_args()
+
     print("⚡ GenAI Pipeline - Fast Test Suite")
     print("=" * 50)
-    
+
+    checks = [
+        ('Quick Test', run_quick_test, CHECK_TIMEOUTS['quick']),
+        ('Performance Test', run_performance_test, CHECK_TIMEOUTS['performance']),
+        ('Stress Test', run_stress_test, CHECK_TIMEOUTS['stress'])
+    ]
+
     start_time = time.time()
-    
-    # Quick test first
-    await run_quick_test()
-    
-    # Performance test
-    run_performance_test()
-    
-    # Stress test
-    run_stress_test()
-    
+
+    # Every test here generates load against the same endpoint, so by default
+    # each runs alone and reports numbers that are not skewed by the others
+    if args.concurrent:
+        results = await asyncio.gather(*[run_check(*check) for check in checks])
+    else:
+        results = [await run_check(*check) for check in checks]
+
     total_time = time.time() - start_time
+    cumulative_time = sum(elapsed for _, _, elapsed in results)
+
+    print("\n📋 Summary")
+    print("=" * 50)
+    for name, status, elapsed in results:
+        print(f"  {status} {name}: {elapsed:.1f}s")
+    print(f"Cumulative check time: {cumulative_time:.1f}s")
+    print(f"Wall-clock time: {total_time:.1f}s")
+    if args.concurrent:
+        print("⚠️  Tests ran concurrently; latency and RPS figures include each other's load")
+
+    failed = [name for name, status, _ in results if status != 'PASS']
+    if failed:
+        print(f"\n❌ {len(failed)} check(s) did not pass: {', '.join(failed)}")
+        return 1
+
     print(f"\n✅ All tests completed in {total_time:.1f}s")
+    return 0
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    sys.exit(asyncio.run(main()))
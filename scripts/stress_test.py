@@ -18,10 +18,18 @@ import os
 # Add project root to path
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
+from results_log import TimeSeriesAggregator, parse_timing_headers
+
 class StressTestSuite:
     def __init__(self, api_url):
         self.api_url = api_url.rstrip('/')
         self.results = []
+        self.timeseries = TimeSeriesAggregator()
+    
+    def record_result(self, result):
+        """Keep a completed request for totals and the time series"""
+        self.results.append(result)
+        self.timeseries.add(result)
         
     async def ramp_up_test(self, max_users=50, ramp_duration=300, test_duration=600):
         """Gradually increase load to find breaking point"""
@@ -32,6 +40,7 @@ class StressTestSuite:
         print("-" * 60)
         
         start_time = time.time()
+        self.timeseries.start_time = start_time
         current_users = 1
         user_increment = max_users / (ramp_duration / 10)  # Increase every 10 seconds
         
@@ -61,14 +70,17 @@ class StressTestSuite:
                     active_tasks.remove(task)
                     try:
                         result = await task
-                        self.results.append(result)
+                        self.record_result(result)
                     except Exception as e:
-                        self.results.append({
+                        self.record_result({
                             'success': False,
                             'error': str(e),
-                            'timestamp': datetime.now().isoformat()
+                            'timestamp': round(time.time(), 3)
                         })
                 
+                # Track concurrency so scaling is visible per window
+                self.timeseries.observe_users(time.time(), len(active_tasks))
+                
                 # Print progress every 30 seconds
                 if int(current_time) % 30 == 0:
                     success_rate = self.calculate_success_rate()
@@ -111,14 +123,15 @@ class StressTestSuite:
                             'success': data.get('inference_complete', False),
                             'response_time': response_time,
                             'request_count': request_count + 1,
-                            'timestamp': datetime.now().isoformat()
+                            'timestamp': round(time.time(), 3),
+                            **parse_timing_headers(response.headers, response_time)
                         }
                     else:
                         return {
                             'success': False,
                             'response_time': response_time,
                             'error': f"HTTP {response.status}",
-                            'timestamp': datetime.now().isoformat()
+                            'timestamp': round(time.time(), 3)
                         }
                         
             except asyncio.CancelledError:
@@ -127,7 +140,7 @@ class StressTestSuite:
                 return {
                     'success': False,
                     'error': str(e),
-                    'timestamp': datetime.now().isoformat()
+                    'timestamp': round(time.time(), 3)
                 }
             
             request_count += 1
@@ -175,6 +188,7 @@ async def main():
     parser.add_argument('--max-users', type=int, default=50, help='Maximum concurrent users')
     parser.add_argument('--ramp-duration', type=int, default=300, help='Ramp-up duration in seconds')
     parser.add_argument('--test-duration', type=int, default=600, help='Total test duration in seconds')
+    parser.add_argument('--timeseries', help='Output file for per-second time series (.csv or .json)')
     
     args = parser.parse_args()
     
@@ -205,6 +219,10 @@ async def main():
             if 'avg_response_time' in stats:
                 print(f"Avg Response Time: {stats['avg_response_time']:.3f}s")
                 print(f"Max Response Time: {stats['max_response_time']:.3f}s")
+            
+            timeseries_file = args.timeseries or f"stress_timeseries_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
+            test_suite.timeseries.export(timeseries_file)
+            print(f"📈 Time series saved to: {timeseries_file}")
         
     except KeyboardInterrupt:
         print("\n⚠️  Stress test interrupted")
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Vector Index Benchmark for GenAI Pipeline
+Measures build, snapshot, insert and query latency of flat and IVF search at 100k and 1M vectors
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+# Add project root to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src import vector_index
+
+def clustered_vectors(count, dimensions, clusters=1000, seed=0):
+    """Unit vectors around random centres, built in blocks to bound memory"""
+    rng = np.random.default_rng(seed)
+    centres = rng.normal(size=(clusters, dimensions)).astype(np.float32)
+    vectors = np.empty((count, dimensions), dtype=np.float32)
+    for start in range(0, count, 100000):
+        size = min(100000, count - start)
+        block = centres[rng.integers(0, clusters, size)] + rng.normal(scale=0.5, size=(size, dimensions)).astype(np.float32)
+        vectors[start:start + size] = block / np.linalg.norm(block, axis=1, keepdims=True)
+    return vectors
+
+def query_latency(index, queries, k, **options):
+    """p50/p99 single-query latency in ms, and the ids found"""
+    latencies, found = [], []
+    for query in queries:
+        start = time.perf_counter()
+        ids, _ = index.search(query, k, **options)
+        latencies.append((time.perf_counter() - start) * 1000)
+        found.append(ids[0])
+    return np.percentile(latencies, 50), np.percentile(latencies, 99), np.array(found)
+
+def recall(found, truth):
+    return float(np.mean([len(set(row) & set(expected)) / len(expected) for row, expected in zip(found, truth)]))
+
+def benchmark(count, dimensions, queries, k, nlist, nprobe, batch, directory):
+    """Build, snapshot and query one index size"""
+    result = {'vectors': count, 'dimensions': dimensions}
+    vectors = clustered_vectors(count, dimensions)
+    texts = [f'passage {i}' for i in range(count)]
+    path = os.path.join(directory, f'index-{count}')
+
+    index = vector_index.VectorIndex(dimensions)
+    start = time.perf_counter()
+    index.add(vectors, texts)
+    result['add_seconds'] = round(time.perf_counter() - start, 3)
+    del vectors
+
+    start = time.perf_counter()
+    index.save(path)
+    result['save_seconds'] = round(time.perf_counter() - start, 3)
+
+    start = time.perf_counter()
+    index = vector_index.VectorIndex.load(path)
+    result['load_ms'] = round((time.perf_counter() - start) * 1000, 2)
+
+    start = time.perf_counter()
+    for i in range(100):
+        index.add(queries[i % len(queries)], ['inserted'])
+    result['insert_ms'] = round((time.perf_counter() - start) * 10, 3)
+
+    p50, p99, truth = query_latency(index, queries, k)
+    result['flat'] = {'p50_ms': round(p50, 2), 'p99_ms': round(p99, 2), 'recall': 1.0}
+
+    start = time.perf_counter()
+    index.search(queries[:batch], k)
+    result['flat']['batch_qps'] = round(batch / (time.perf_counter() - start), 1)
+
+    start = time.perf_counter()
+    index.train(nlist)
+    result['train_seconds'] = round(time.perf_counter() - start, 2)
+    result['nlist'] = index.nlist
+    index.save(path)
+    index = vector_index.VectorIndex.load(path)
+
+    p50, p99, found = query_latency(index, queries, k, nprobe=nprobe)
+    start = time.perf_counter()
+    index.search(queries[:batch], k, nprobe=nprobe)
+    result['ivf'] = {
+        'p50_ms': round(p50, 2),
+        'p99_ms': round(p99, 2),
+        'recall': round(recall(found, truth), 4),
+        'batch_qps': round(batch / (time.perf_counter() - start), 1)
+    }
+    return result
+
+def main():
+    """Main benchmark function"""
+    parser = argparse.ArgumentParser(description='GenAI Pipeline Vector Index Benchmark')
+    parser.add_argument('--sizes', default='100000,1000000', help='Comma-separated index sizes (default: 100000,1000000)')
+    parser.add_argument('--dimensions', type=int, default=256, help='Vector dimensions (default: 256)')
+    parser.add_argument('--queries', type=int, default=200, help='Single queries timed per size')
+    parser.add_argument('--k', type=int, default=10, help='Neighbours per query')
+    parser.add_argument('--nlist', type=int, default=None, help='Inverted lists (default: 4 * sqrt(n))')
+    parser.add_argument('--nprobe', type=int, default=vector_index.VECTOR_NPROBE, help='Lists scanned per query')
+    parser.add_argument('--batch', type=int, default=64, help='Queries per batched search')
+    parser.add_argument('--json', action='store_true', help='Print results as JSON')
+
+    args = parser.parse_args()
+    queries = clustered_vectors(max(args.queries, args.batch), args.dimensions, seed=1)
+
+    print("🧪 GenAI Pipeline - Vector Index Benchmark")
+    print("=" * 60)
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        for size in map(int, args.sizes.split(',')):
+            print(f"⚙️  {size:,} x {args.dimensions} vectors...")
+            results.append(benchmark(size, args.dimensions, queries, args.k, args.nlist, args.nprobe, args.batch, directory))
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return 0
+
+    print("\n📊 Results")
+    for result in results:
+        print(f"   {result['vectors']:,} vectors: add {result['add_seconds']}s, save {result['save_seconds']}s, "
+              f"mmap load {result['load_ms']} ms, insert {result['insert_ms']} ms, "
+              f"train {result['train_seconds']}s ({result['nlist']} lists)")
+        for mode in ('flat', 'ivf'):
+            stats = result[mode]
+            print(f"      {mode:<5} p50 {stats['p50_ms']:>8.2f} ms  p99 {stats['p99_ms']:>8.2f} ms  "
+                  f"batch {stats['batch_qps']:>9,.0f} q/s  recall@{args.k} {stats['recall']:.3f}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+Cache Warming for GenAI Pipeline
+Pre-populates the inference cache with the most popular historical prompts
+"""
+
+import argparse
+import hashlib
+import heapq
+import sys
+import threading
+import time
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+# Add project root to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+sys.path.insert(0, str(Path(__file__).parent))
+
+from workload import build_payload, load_workload
+
+class HeavyHitters:
+    """Streaming top-N estimator: a Count-Min sketch plus a min-heap of candidates"""
+
+    def __init__(self, capacity, width=1 << 16, depth=4):
+        if not 1 <= depth <= 16:
+            raise ValueError(f"depth must be between 1 and 16, got {depth}")
+        self.capacity = capacity
+        self.width = width
+        self.depth = depth
+        self.table = [array('L', [0]) * width for _ in range(depth)]
+        self.top = {}
+        self.payloads = {}
+        self.heap = []
+        self.total = 0
+
+    def _positions(self, digest):
+        """Derive one column per row from 4 digest bytes each"""
+        return [int.from_bytes(digest[i * 4:(i + 1) * 4], 'little') % self.width for i in range(self.depth)]
+
+    def add(self, key, payload):
+        """Count one occurrence and keep the key if it is among the heaviest"""
+        self.total += 1
+        digest = hashlib.blake2b(key.encode('utf-8'), digest_size=4 * self.depth).digest()
+
+        estimate = None
+        for row, column in zip(self.table, self._positions(digest)):
+            row[column] += 1
+            estimate = row[column] if estimate is None else min(estimate, row[column])
+
+        if key in self.top:
+            self.top[key] = estimate
+        elif len(self.top) < self.capacity:
+            self.top[key] = estimate
+            self.payloads[key] = payload
+        else:
+            minimum, victim = self._minimum()
+            if estimate <= minimum:
+                return
+            heapq.heappop(self.heap)
+            del self.top[victim]
+            del self.payloads[victim]
+            self.top[key] = estimate
+            self.payloads[key] = payload
+
+        heapq.heappush(self.heap, (estimate, key))
+        if len(self.heap) > 4 * self.capacity:
+            # Drop outdated heap entries left behind by count updates
+            self.heap = [(count, key) for key, count in self.top.items()]
+            heapq.heapify(self.heap)
+
+    def _minimum(self):
+        """Current smallest tracked count, discarding outdated heap entries"""
+        while True:
+            count, key = self.heap[0]
+            if self.top.get(key) == count:
+                return count, key
+            heapq.heappop(self.heap)
+
+    def most_common(self):
+        """Tracked keys ordered by estimated count"""
+        return sorted(self.top.items(), key=lambda item: item[1], reverse=True)
+
+class RateLimiter:
+    """Thread-safe limiter that spaces calls to at most `rate` per second"""
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate > 0 else 0
+        self.next_time = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        with self.lock:
+            now = time.monotonic()
+            wait = self.next_time - now
+            self.next_time = max(self.next_time, now) + self.interval
+        if wait > 0:
+            time.sleep(wait)
+
+def find_popular_prompts(log_path, top_n):
+    """Stream a request log and return (top entries, sketch)"""
+    from src.cached_inference import get_cache_key, request_options
+
+    sketch = HeavyHitters(capacity=top_n)
+    for record in load_workload(log_path):
+        payload = build_payload(record['prompt'], record.get('model'), record.get('options'))
+        sketch.add(get_cache_key(payload['prompt'], payload.get('model'), request_options(payload)), payload)
+    return sketch.most_common(), sketch
+
+def warm_cache(entries, payloads, rate, batch_size, inference_function=None):
+    """Run popular prompts that are missing or stale through the model and cache them
+
+    Stale entries are refreshed here rather than served, since a background
+    refresh would still be running when the process exits.
+    """
+    from src.cached_inference import (BATCH_INFERENCE_WORKERS, flush_cache_writes, get_cache_policy,
+                                      get_many_cache_entries, store_response)
+    from src.multi_model import run_inference_with_model
+
+    inference_function = inference_function or run_inference_with_model
+    limiter = RateLimiter(rate)
+    model_calls = 0
+    failed = 0
+
+    def limited_inference(data):
+        limiter.acquire()
+        return inference_function(data)
+
+    with ThreadPoolExecutor(max_workers=BATCH_INFERENCE_WORKERS) as executor:
+        for start in range(0, len(entries), batch_size):
+            keys = [key for key, _ in entries[start:start + batch_size]]
+            cached = get_many_cache_entries(keys)
+            now = time.time()
+            keys = [key for key in keys if key not in cached or cached[key]['fresh_until'] <= now]
+
+            # Only missing and stale entries reach the model, so only they are rate limited
+            for key, result in zip(keys, executor.map(limited_inference, [payloads[key] for key in keys])):
+                store_response(key, result, get_cache_policy(payloads[key].get('model')))
+                failed += not result.get('inference_complete')
+            model_calls += len(keys)
+            print(f"   Warmed {min(start + batch_size, len(entries))}/{len(entries)} prompts")
+
+    flush_cache_writes()
+    return model_calls, failed
+
+def main():
+    """Main cache warming function"""
+    parser = argparse.ArgumentParser(description='GenAI Pipeline Cache Warming')
+    parser.add_argument('--log', required=True, help='JSONL request log to mine for popular prompts')
+    parser.add_argument('--top', type=int, default=1000, help='Number of prompts to warm (default: 1000)')
+    parser.add_argument('--rate', type=float, default=5.0, help='Maximum model calls per second (default: 5)')
+    parser.add_argument('--batch-size', type=int, default=50, help='Prompts per batched cache lookup (default: 50)')
+    parser.add_argument('--dry-run', action='store_true', help='Only report the popular set and its coverage')
+
+    args = parser.parse_args()
+
+    print("🔥 GenAI Pipeline - Cache Warming")
+    print("=" * 60)
+
+    entries, sketch = find_popular_prompts(args.log, args.top)
+    if not sketch.total:
+        print("❌ No requests found in log")
+        return 1
+
+    # Count-Min never underestimates, so this is an upper bound on coverage
+    covered = sum(count for _, count in entries)
+    print(f"📊 Requests analysed: {sketch.total}")
+    print(f"🎯 Popular prompts selected: {len(entries)}")
+    print(f"📈 Expected traffic coverage: up to {min(covered / sketch.total, 1.0) * 100:.1f}%")
+
+    if args.dry_run:
+        return 0
+
+    start_time = time.time()
+    model_calls, failed = warm_cache(entries, sketch.payloads, args.rate, args.batch_size)
+
+    print(f"\n✅ Cache warming completed in {time.time() - start_time:.1f}s")
+    print(f"   Already cached: {len(entries) - model_calls}")
+    print(f"   Model calls: {model_calls}")
+    print(f"   Failed: {failed}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
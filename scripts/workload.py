@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+Workload replay and synthetic traffic for GenAI Pipeline load tests
+Replays recorded JSONL traffic or generates traffic from a fitted profile
+"""
+
+import bisect
+import hashlib
+import json
+import math
+import random
+from collections import Counter
+from datetime import datetime
+
+# Vocabulary used to synthesize prompts of a given length
+WORDS = [
+    "explain", "the", "difference", "between", "cloud", "computing", "and", "edge",
+    "devices", "summarize", "this", "report", "about", "quarterly", "revenue", "for",
+    "a", "customer", "write", "python", "function", "that", "parses", "json", "logs",
+    "describe", "how", "neural", "networks", "learn", "from", "data", "in", "simple",
+    "terms", "list", "benefits", "of", "arm64", "processors", "compare", "latency",
+    "throughput", "translate", "following", "paragraph", "into", "french", "draft",
+    "an", "email", "to", "team", "regarding", "deployment", "schedule", "review",
+    "code", "security", "issues", "generate", "test", "cases", "api", "endpoint"
+]
+
+DEFAULT_PROFILE = {
+    'distinct_prompts': 1000,
+    'zipf_s': 1.1,
+    'length_mu': math.log(200),
+    'length_sigma': 0.8,
+    'rate': 5.0,
+    'models': {}
+}
+
+# Recorded request fields besides prompt and model that change the response
+REQUEST_FIELDS = ('system', 'request_class', 'overflow', 'json_mode', 'response_schema', 'retrieve')
+
+def parse_timestamp(value):
+    """Convert an epoch number or ISO-8601 string to epoch seconds"""
+    if value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    try:
+        return datetime.fromisoformat(str(value).replace('Z', '+00:00')).timestamp()
+    except ValueError:
+        return None
+
+def synthesize_prompt(prompt_id, length):
+    """Build a deterministic prompt of roughly `length` characters"""
+    rng = random.Random(prompt_id)
+    words = []
+    size = 0
+    while size < length:
+        word = rng.choice(WORDS)
+        words.append(word)
+        size += len(word) + 1
+    return ' '.join(words)[:max(int(length), 1)]
+
+def load_workload(path):
+    """Lazily yield normalized request records from a JSONL traffic log"""
+    with open(path, 'r', encoding='utf-8') as f:
+        for line_number, line in enumerate(f):
+            if not line.strip():
+                continue
+            record = json.loads(line)
+
+            prompt = record.get('prompt') or record.get('body')
+            prompt_length = record.get('prompt_length')
+            if prompt is None:
+                # Length-only logs get a stable synthetic prompt per request id
+                prompt_id = record.get('request_id', line_number)
+                # Unknown lengths use the median of the default length distribution
+                prompt = synthesize_prompt(prompt_id, prompt_length or math.exp(DEFAULT_PROFILE['length_mu']))
+
+            yield {
+                'timestamp': parse_timestamp(record.get('timestamp', record.get('ts'))),
+                'prompt': prompt,
+                'prompt_length': prompt_length or len(prompt),
+                'model': record.get('model'),
+                'options': {field: record[field] for field in REQUEST_FIELDS if record.get(field) is not None}
+            }
+
+def build_payload(prompt, model=None, options=None):
+    """Request body for the inference API"""
+    payload = {'prompt': prompt}
+    if model:
+        payload['model'] = model
+    payload.update(options or {})
+    return payload
+
+def replay_schedule(records, speedup=1.0):
+    """Yield (offset_seconds, payload) preserving recorded inter-arrival times"""
+    first = None
+    last_offset = 0.0
+
+    for record in records:
+        timestamp = record['timestamp']
+        if timestamp is None:
+            # No timestamp: send right after the previous request
+            offset = last_offset
+        else:
+            if first is None:
+                first = timestamp
+            offset = max((timestamp - first) / speedup, last_offset)
+
+        last_offset = offset
+        yield offset, build_payload(record['prompt'], record.get('model'), record.get('options'))
+
+def fit_zipf_exponent(counts):
+    """Least-squares slope of log(frequency) against log(rank)"""
+    frequencies = sorted(counts, reverse=True)
+    if len(frequencies) < 2:
+        return DEFAULT_PROFILE['zipf_s']
+
+    xs = [math.log(rank) for rank in range(1, len(frequencies) + 1)]
+    ys = [math.log(freq) for freq in frequencies]
+    mean_x = sum(xs) / len(xs)
+    mean_y = sum(ys) / len(ys)
+    covariance = sum((x - mean_x) * (y - mean_y) for x, y in zip(xs, ys))
+    variance = sum((x - mean_x) ** 2 for x in xs)
+    return max(-covariance / variance, 0.0) if variance else DEFAULT_PROFILE['zipf_s']
+
+def fit_workload(records):
+    """Fit prompt-length, popularity and arrival-rate parameters from traffic"""
+    popularity = Counter()
+    models = Counter()
+    log_lengths_sum = 0.0
+    log_lengths_sq = 0.0
+    total = 0
+    first = last = None
+
+    for record in records:
+        total += 1
+        key = hashlib.md5(record['prompt'].encode('utf-8')).digest()
+        popularity[key] += 1
+        models[record.get('model') or ''] += 1
+
+        log_length = math.log(max(record['prompt_length'], 1))
+        log_lengths_sum += log_length
+        log_lengths_sq += log_length ** 2
+
+        timestamp = record['timestamp']
+        if timestamp is not None:
+            first = timestamp if first is None else min(first, timestamp)
+            last = timestamp if last is None else max(last, timestamp)
+
+    if not total:
+        return dict(DEFAULT_PROFILE)
+
+    mu = log_lengths_sum / total
+    sigma = math.sqrt(max(log_lengths_sq / total - mu ** 2, 0.0))
+    duration = (last - first) if first is not None and last > first else 0
+
+    return {
+        'distinct_prompts': len(popularity),
+        'zipf_s': fit_zipf_exponent(popularity.values()),
+        'length_mu': mu,
+        'length_sigma': sigma,
+        'rate': total / duration if duration else DEFAULT_PROFILE['rate'],
+        'models': {model: count / total for model, count in models.items() if model}
+    }
+
+def generate_synthetic(profile, total, seed=42):
+    """Yield (offset_seconds, payload) drawn from a fitted workload profile"""
+    rng = random.Random(seed)
+    distinct = max(int(profile['distinct_prompts']), 1)
+
+    # Cumulative Zipf weights over prompt ranks for inverse-CDF sampling
+    cumulative = []
+    running = 0.0
+    for rank in range(1, distinct + 1):
+        running += 1.0 / rank ** profile['zipf_s']
+        cumulative.append(running)
+
+    model_names = list(profile.get('models', {}))
+    model_weights = [profile['models'][name] for name in model_names]
+
+    prompt_lengths = {}
+    offset = 0.0
+    for _ in range(total):
+        prompt_id = bisect.bisect_left(cumulative, rng.random() * running)
+
+        # Each prompt id keeps one length so repeats are exact cache hits
+        if prompt_id not in prompt_lengths:
+            length_rng = random.Random(f"{seed}-{prompt_id}")
+            prompt_lengths[prompt_id] = length_rng.lognormvariate(profile['length_mu'], profile['length_sigma'])
+        prompt = synthesize_prompt(f"{seed}-{prompt_id}", prompt_lengths[prompt_id])
+
+        model = rng.choices(model_names, model_weights)[0] if model_names else None
+        yield offset, build_payload(prompt, model)
+
+        # Poisson arrivals at the fitted rate
+        offset += rng.expovariate(profile['rate'])
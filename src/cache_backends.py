@@ -0,0 +1,420 @@
+"""
+Cache backends for GenAI Pipeline
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import boto3
+from botocore.exceptions import ClientError
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+try:
+    from .metrics import SIZE_BUCKETS_BYTES, increment, observe
+except ImportError:
+    from metrics import SIZE_BUCKETS_BYTES, increment, observe
+
+# DynamoDB batch API limits
+BATCH_GET_LIMIT = 100
+MAX_BATCH_RETRIES = 5
+
+# Conditional puts in flight at once when DynamoDB writes a batch
+CACHE_WRITE_CONCURRENCY = int(os.environ.get('CACHE_WRITE_CONCURRENCY', '8'))
+
+# SQLite limits the number of bound parameters per statement
+SQLITE_QUERY_CHUNK = 500
+
+def encode_response(response):
+    """Serialize a response into a compact compressed binary payload"""
+    return zlib.compress(json.dumps(response, separators=(',', ':')).encode('utf-8'))
+
+def decode_response(payload):
+    """Inverse of encode_response; accepts bytes or a boto3 Binary"""
+    raw = payload.value if hasattr(payload, 'value') else bytes(payload)
+    return json.loads(zlib.decompress(raw))
+
+def make_entry(response, ttl, now=None, grace=0):
+    """Build a cache entry with epoch expiry (seconds) and creation time (ms)
+
+    The entry is fresh until fresh_until and may still be served as stale
+    until expires_at, which is ttl + grace seconds from now.
+    """
+    now = time.time() if now is None else now
+    return {
+        'response': response,
+        'fresh_until': int(now) + ttl,
+        'expires_at': int(now) + ttl + grace,
+        'created_at': int(now * 1000)
+    }
+
+class CacheBackend:
+    """Interface shared by all cache backends
+
+    Entries are dicts with 'response', 'fresh_until' and 'expires_at'
+    (epoch seconds) and 'created_at' (epoch milliseconds). Backends never
+    return entries past expires_at, and a put never replaces an entry with
+    a newer created_at.
+    """
+
+    name = 'base'
+
+    def _encode(self, response):
+        """Encode a payload and record its stored size"""
+        payload = encode_response(response)
+        observe('cache_payload_bytes', len(payload), SIZE_BUCKETS_BYTES, tier=self.name, op='put')
+        return payload
+
+    def _decode(self, payload):
+        """Decode a payload and record its read size"""
+        raw = payload.value if hasattr(payload, 'value') else bytes(payload)
+        observe('cache_payload_bytes', len(raw), SIZE_BUCKETS_BYTES, tier=self.name, op='get')
+        return decode_response(raw)
+
+    def get(self, key):
+        """Get one live entry or None"""
+        return self.get_many([key]).get(key)
+
+    def get_many(self, keys):
+        """Get live entries for many keys as a dict of key -> entry"""
+        raise NotImplementedError
+
+    def put(self, key, response, ttl, grace=0):
+        """Store one response; returns False if a fresher entry was kept"""
+        return self.put_many({key: response}, ttl, grace)
+
+    def put_many(self, responses, ttl, grace=0):
+        """Store many responses (dict of key -> response)"""
+        raise NotImplementedError
+
+    def delete(self, key):
+        """Remove an entry"""
+        raise NotImplementedError
+
+class MemoryCacheBackend(CacheBackend):
+    """In-process LRU cache"""
+
+    name = 'memory'
+
+    def __init__(self, max_entries=None):
+        self.max_entries = max_entries or int(os.environ.get('CACHE_MAX_ENTRIES', 10000))
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get_many(self, keys):
+        now = time.time()
+        found = {}
+        with self.lock:
+            for key in keys:
+                entry = self.entries.get(key)
+                if entry is None:
+                    continue
+                if entry['expires_at'] <= now:
+                    del self.entries[key]
+                    increment('cache_evictions', tier=self.name, reason='expired')
+                    continue
+                self.entries.move_to_end(key)
+                found[key] = entry
+        return found
+
+    def put_many(self, responses, ttl, grace=0):
+        now = time.time()
+        stored = True
+        with self.lock:
+            for key, response in responses.items():
+                entry = make_entry(response, ttl, now, grace)
+                current = self.entries.get(key)
+                if current and current['created_at'] > entry['created_at']:
+                    stored = False
+                    continue
+                self.entries[key] = entry
+                self.entries.move_to_end(key)
+
+            evicted = 0
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                evicted += 1
+        if evicted:
+            increment('cache_evictions', evicted, tier=self.name, reason='capacity')
+        return stored
+
+    def delete(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+
+class SQLiteCacheBackend(CacheBackend):
+    """On-disk cache for EC2/container hosts, using WAL mode and mmap reads"""
+
+    name = 'sqlite'
+
+    def __init__(self, path=None):
+        self.path = path or os.environ.get('CACHE_SQLITE_PATH', '/tmp/genai-pipeline-cache.db')
+        self.local = threading.local()
+        self._connect().execute(
+            'CREATE TABLE IF NOT EXISTS cache ('
+            'cache_key TEXT PRIMARY KEY, payload BLOB NOT NULL, fresh_until INTEGER NOT NULL, '
+            'expires_at INTEGER NOT NULL, created_at INTEGER NOT NULL) WITHOUT ROWID'
+        )
+
+    def _connect(self):
+        """One connection per thread, since sqlite3 connections are not shareable"""
+        connection = getattr(self.local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            connection.execute('PRAGMA mmap_size=268435456')
+            self.local.connection = connection
+        return connection
+
+    def get_many(self, keys):
+        connection = self._connect()
+        keys = list(dict.fromkeys(keys))
+        now = int(time.time())
+        found = {}
+
+        for start in range(0, len(keys), SQLITE_QUERY_CHUNK):
+            chunk = keys[start:start + SQLITE_QUERY_CHUNK]
+            rows = connection.execute(
+                f"SELECT cache_key, payload, fresh_until, expires_at, created_at FROM cache "
+                f"WHERE cache_key IN ({','.join('?' * len(chunk))}) AND expires_at > ?",
+                (*chunk, now)
+            )
+            for key, payload, fresh_until, expires_at, created_at in rows:
+                found[key] = {
+                    'response': self._decode(payload),
+                    'fresh_until': fresh_until,
+                    'expires_at': expires_at,
+                    'created_at': created_at
+                }
+        return found
+
+    def put_many(self, responses, ttl, grace=0):
+        now = time.time()
+        rows = []
+        for key, response in responses.items():
+            entry = make_entry(response, ttl, now, grace)
+            rows.append((key, self._encode(response), entry['fresh_until'], entry['expires_at'], entry['created_at']))
+
+        # Upsert unless the stored entry is newer, mirroring the DynamoDB condition
+        connection = self._connect()
+        before = connection.total_changes
+        connection.executemany(
+            'INSERT INTO cache (cache_key, payload, fresh_until, expires_at, created_at) VALUES (?, ?, ?, ?, ?) '
+            'ON CONFLICT(cache_key) DO UPDATE SET payload = excluded.payload, fresh_until = excluded.fresh_until, '
+            'expires_at = excluded.expires_at, created_at = excluded.created_at '
+            'WHERE excluded.created_at >= cache.created_at',
+            rows
+        )
+        return connection.total_changes - before == len(rows)
+
+    def delete(self, key):
+        self._connect().execute('DELETE FROM cache WHERE cache_key = ?', (key,))
+
+    def purge_expired(self):
+        """Delete expired rows; returns the number removed"""
+        removed = self._connect().execute('DELETE FROM cache WHERE expires_at <= ?', (int(time.time()),)).rowcount
+        increment('cache_evictions', removed, tier=self.name, reason='expired')
+        return removed
+
+# Store an entry unless the key holds one with a newer created_at.
+# KEYS[1] = key, ARGV = encoded entry, created_at, expiry in seconds
+REDIS_PUT_IF_NEWER = """
+local current = redis.call('HGET', KEYS[1], 'created_at')
+if current and tonumber(current) > tonumber(ARGV[2]) then
+    return 0
+end
+redis.call('HSET', KEYS[1], 'entry', ARGV[1], 'created_at', ARGV[2])
+redis.call('EXPIRE', KEYS[1], ARGV[3])
+return 1
+"""
+
+class RedisCacheBackend(CacheBackend):
+    """Cache on any Redis-protocol server (Redis, Valkey, ElastiCache)
+
+    Each key is a hash of the encoded entry and its created_at, so the
+    freshness check runs server-side in one script call per key.
+    """
+
+    name = 'redis'
+
+    def __init__(self, url=None, prefix='genai:cache:', client=None):
+        if client is None:
+            if redis is None:
+                raise ImportError("The redis package is required for CACHE_BACKEND=redis")
+            client = redis.Redis.from_url(url or os.environ.get('REDIS_URL', 'redis://localhost:6379/0'))
+        self.client = client
+        self.prefix = prefix
+        self.put_if_newer = self.client.register_script(REDIS_PUT_IF_NEWER)
+
+    def get_many(self, keys):
+        keys = list(dict.fromkeys(keys))
+        if not keys:
+            return {}
+
+        now = time.time()
+        found = {}
+        pipeline = self.client.pipeline(transaction=False)
+        for key in keys:
+            pipeline.hget(self.prefix + key, 'entry')
+        for key, value in zip(keys, pipeline.execute()):
+            if value is None:
+                continue
+            entry = self._decode(value)
+            if entry['expires_at'] > now:
+                found[key] = entry
+        return found
+
+    def put_many(self, responses, ttl, grace=0):
+        now = time.time()
+        pipeline = self.client.pipeline(transaction=False)
+        for key, response in responses.items():
+            entry = make_entry(response, ttl, now, grace)
+            # Redis expires the key itself, so no separate cleanup is needed
+            self.put_if_newer(
+                keys=[self.prefix + key],
+                args=[self._encode(entry), entry['created_at'], max(entry['expires_at'] - int(now), 1)],
+                client=pipeline
+            )
+        return all(pipeline.execute())
+
+    def delete(self, key):
+        self.client.delete(self.prefix + key)
+
+class DynamoDBCacheBackend(CacheBackend):
+    """Cache in a DynamoDB table with native TTL on expires_at"""
+
+    name = 'dynamodb'
+
+    def __init__(self, table_name=None):
+        self.dynamodb = boto3.resource('dynamodb')
+        self.table = self.dynamodb.Table(table_name or os.environ.get('CACHE_TABLE_NAME', 'GenAIPipelineCache'))
+        self.local = threading.local()
+        self.write_executor = ThreadPoolExecutor(max_workers=CACHE_WRITE_CONCURRENCY, thread_name_prefix='cache-put')
+
+    def _thread_table(self):
+        """Table resource for the current write thread, since boto3 resources are not thread-safe"""
+        table = getattr(self.local, 'table', None)
+        if table is None:
+            table = self.local.table = boto3.session.Session().resource('dynamodb').Table(self.table.name)
+        return table
+
+    def _entry(self, item, now):
+        """Convert an item to an entry; legacy-format and expired items are skipped"""
+        if 'payload' not in item or int(item.get('expires_at', 0)) <= now:
+            return None
+        return {
+            'response': self._decode(item['payload']),
+            'fresh_until': int(item.get('fresh_until', item['expires_at'])),
+            'expires_at': int(item['expires_at']),
+            'created_at': int(item.get('created_at', 0))
+        }
+
+    def get(self, key):
+        # Eventually consistent read of only the attributes we need
+        response = self.table.get_item(
+            Key={'cache_key': key},
+            ProjectionExpression='payload, fresh_until, expires_at, created_at'
+        )
+        item = response.get('Item')
+        return self._entry(item, time.time()) if item else None
+
+    def get_many(self, keys):
+        keys = list(dict.fromkeys(keys))
+        now = time.time()
+        found = {}
+
+        for start in range(0, len(keys), BATCH_GET_LIMIT):
+            request = {
+                self.table.name: {
+                    'Keys': [{'cache_key': key} for key in keys[start:start + BATCH_GET_LIMIT]],
+                    'ProjectionExpression': 'cache_key, payload, fresh_until, expires_at, created_at'
+                }
+            }
+
+            # Retry throttled keys with exponential backoff
+            for attempt in range(MAX_BATCH_RETRIES + 1):
+                response = self.dynamodb.batch_get_item(RequestItems=request)
+                for item in response.get('Responses', {}).get(self.table.name, []):
+                    entry = self._entry(item, now)
+                    if entry:
+                        found[item['cache_key']] = entry
+
+                request = response.get('UnprocessedKeys')
+                if not request:
+                    break
+                time.sleep(min(0.05 * 2 ** attempt, 1.0))
+
+        return found
+
+    def _item(self, key, response, ttl, now, grace=0):
+        """Build the DynamoDB item stored for a cached response"""
+        entry = make_entry(response, ttl, now, grace)
+        return {
+            'cache_key': key,
+            'payload': self._encode(response),
+            'fresh_until': entry['fresh_until'],
+            'expires_at': entry['expires_at'],
+            'created_at': entry['created_at']
+        }
+
+    def _put_item(self, item, table=None):
+        try:
+            # The condition keeps a concurrent writer from replacing a fresher entry
+            (table or self.table).put_item(
+                Item=item,
+                ConditionExpression='attribute_not_exists(created_at) OR created_at <= :created_at',
+                ExpressionAttributeValues={':created_at': item['created_at']}
+            )
+            return True
+        except ClientError as e:
+            if e.response['Error']['Code'] == 'ConditionalCheckFailedException':
+                return False
+            raise
+
+    def put(self, key, response, ttl, grace=0):
+        return self._put_item(self._item(key, response, ttl, time.time(), grace))
+
+    def put_many(self, responses, ttl, grace=0):
+        now = time.time()
+        items = [self._item(key, response, ttl, now, grace) for key, response in responses.items()]
+        if len(items) == 1:
+            return self._put_item(items[0])
+        # BatchWriteItem cannot be conditional, so the items go out as
+        # conditional puts in parallel; the write capacity consumed is the same
+        return all(list(self.write_executor.map(lambda item: self._put_item(item, self._thread_table()), items)))
+
+    def delete(self, key):
+        self.table.delete_item(Key={'cache_key': key})
+
+BACKENDS = {
+    'memory': MemoryCacheBackend,
+    'sqlite': SQLiteCacheBackend,
+    'redis': RedisCacheBackend,
+    'dynamodb': DynamoDBCacheBackend
+}
+
+# Backend instance selected by CACHE_BACKEND, created on first use
+_backend = None
+_backend_lock = threading.Lock()
+
+def get_cache_backend():
+    """Get the configured cache backend (CACHE_BACKEND, default: dynamodb)"""
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                name = os.environ.get('CACHE_BACKEND', 'dynamodb').lower()
+                if name not in BACKENDS:
+                    raise ValueError(f"Unsupported cache backend: {name}")
+                _backend = BACKENDS[name]()
+    return _backend
@@ -4,87 +4,327 @@ Cached inference module for GenAI Pipeline
 
 import json
 import os
-import boto3
+import queue
+import threading
 import hashlib
 import time
-from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    from .cache_backends import get_cache_backend
+    from .metrics import increment, observe
+    from .multi_model import MODELS
+except ImportError:
+    from cache_backends import get_cache_backend
+    from metrics import increment, observe
+    from multi_model import MODELS
 
 # Cache TTL in seconds (default: 1 hour)
 CACHE_TTL = int(os.environ.get('CACHE_TTL', 3600))
 
-def get_cache_key(prompt):
+# How long an expired entry may still be served while it is refreshed
+CACHE_STALE_GRACE = int(os.environ.get('CACHE_STALE_GRACE', 300))
+
+# TTL for cached deterministic failures
+CACHE_NEGATIVE_TTL = int(os.environ.get('CACHE_NEGATIVE_TTL', 60))
+
+# Request fields that are part of the cache key
+CACHE_KEY_FIELDS = ('system', 'response_schema', 'json_mode', 'request_class', 'overflow', 'retrieve')
+
+# Errors that fail the same way on every retry of the same request
+NEGATIVE_CACHE_ERRORS = (
+    'ValidationException',
+    'ResourceNotFoundException',
+    'Unsupported model',
+    'Unsupported provider'
+)
+
+# Maximum number of queued writes coalesced into one batch
+BATCH_WRITE_LIMIT = 25
+
+# Parallel model calls for cache misses in a batch
+BATCH_INFERENCE_WORKERS = int(os.environ.get('BATCH_INFERENCE_WORKERS', 8))
+
+# Write-behind queue drained by a background thread
+_write_queue = queue.Queue()
+_writer_thread = None
+_writer_lock = threading.Lock()
+
+# Background refreshes for stale entries, one in flight per key
+_refresh_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix='cache-refresh')
+_refreshing = set()
+_refresh_lock = threading.Lock()
+
+def cache_enabled():
+    """Check if caching is enabled"""
+    return os.environ.get('ENABLE_CACHE', 'true').lower() == 'true'
+
+def write_behind_enabled():
+    """Check if cache writes should be deferred to the background writer"""
+    return os.environ.get('CACHE_WRITE_BEHIND', 'true').lower() == 'true'
+
+def background_refresh_enabled():
+    """Check if stale entries should be refreshed in the background
+
+    Off by default in Lambda: the execution environment is frozen once the
+    handler returns, so a background refresh may never finish and its
+    write would miss the handler's flush. There, stale entries are served
+    without a refresh until the grace window ends and the next request
+    misses.
+    """
+    default = 'false' if os.environ.get('AWS_LAMBDA_FUNCTION_NAME') else 'true'
+    return os.environ.get('CACHE_BACKGROUND_REFRESH', default).lower() == 'true'
+
+def get_cache_policy(model_name=None):
+    """Get TTL, stale grace and negative TTL, overridable per model in MODELS"""
+    model_config = MODELS.get(model_name, {})
+    return {
+        'ttl': model_config.get('cache_ttl', CACHE_TTL),
+        'stale_grace': model_config.get('stale_grace', CACHE_STALE_GRACE),
+        'negative_ttl': model_config.get('negative_ttl', CACHE_NEGATIVE_TTL)
+    }
+
+def request_options(data):
+    """Request fields besides prompt and model that change the response"""
+    return {field: data[field] for field in CACHE_KEY_FIELDS if data.get(field) is not None}
+
+def get_cache_key(prompt, model=None, options=None):
     """Generate a cache key for a prompt"""
-    # Create a hash of the prompt to use as the cache key
-    return hashlib.md5(prompt.encode('utf-8')).hexdigest()
+    # Create a hash of the prompt to use as the cache key; responses from
+    # different models or request options must not share an entry
+    key_source = f"{model}\n{prompt}" if model else prompt
+    if options:
+        key_source = f"{json.dumps(options, sort_keys=True)}\n{key_source}"
+    return hashlib.md5(key_source.encode('utf-8')).hexdigest()
 
-def get_from_cache(cache_key):
-    """Get a cached response from DynamoDB"""
+def is_negative_cacheable(response):
+    """Check if a failed response is deterministic and safe to cache briefly"""
+    error = response.get('error') or ''
+    return not response.get('inference_complete') and any(marker in error for marker in NEGATIVE_CACHE_ERRORS)
+
+def get_cache_tier():
+    """Name of the configured cache backend, used as the metrics tier label"""
+    return os.environ.get('CACHE_BACKEND', 'dynamodb').lower()
+
+def record_lookups(cache_keys, entries, elapsed_ms):
+    """Count hit/stale/negative/miss outcomes for a lookup"""
+    tier = get_cache_tier()
+    now = time.time()
+    outcomes = {}
+    for cache_key in cache_keys:
+        entry = entries.get(cache_key)
+        if entry is None:
+            outcome = 'miss'
+        elif entry['fresh_until'] <= now:
+            outcome = 'stale'
+        elif not entry['response'].get('inference_complete'):
+            outcome = 'negative_hit'
+        else:
+            outcome = 'hit'
+        outcomes[outcome] = outcomes.get(outcome, 0) + 1
+    
+    for outcome, count in outcomes.items():
+        increment('cache_requests', count, tier=tier, result=outcome)
+    observe('cache_lookup_ms', elapsed_ms, tier=tier)
+
+def get_cache_entry(cache_key):
+    """Get the raw cache entry, including stale entries still within grace"""
+    start = time.perf_counter()
     try:
-        # Create DynamoDB client
-        dynamodb = boto3.resource('dynamodb')
-        table = dynamodb.Table(os.environ.get('CACHE_TABLE_NAME', 'GenAIPipelineCache'))
-        
-        # Get item from cache
-        response = table.get_item(Key={'cache_key': cache_key})
-        
-        # Check if item exists and is not expired
-        if 'Item' in response:
-            item = response['Item']
-            expiration_time = datetime.fromisoformat(item['expiration_time'])
-            
-            if expiration_time > datetime.now():
-                print(f"Cache hit for key: {cache_key}")
-                return item['response']
-        
-        print(f"Cache miss for key: {cache_key}")
-        return None
+        entry = get_cache_backend().get(cache_key)
     except Exception as e:
+        increment('cache_errors', tier=get_cache_tier(), op='get')
         print(f"Error getting from cache: {str(e)}")
         return None
+    
+    record_lookups([cache_key], {cache_key: entry} if entry else {}, (time.perf_counter() - start) * 1000)
+    return entry
+
+def get_from_cache(cache_key):
+    """Get a fresh cached response from the configured backend"""
+    entry = get_cache_entry(cache_key)
+    
+    if entry and entry['fresh_until'] > time.time():
+        return entry['response']
+    return None
 
-def save_to_cache(cache_key, response):
-    """Save a response to DynamoDB cache"""
+def save_to_cache(cache_key, response, ttl=None, grace=0):
+    """Save a response to the configured cache backend"""
     try:
-        # Create DynamoDB client
-        dynamodb = boto3.resource('dynamodb')
-        table = dynamodb.Table(os.environ.get('CACHE_TABLE_NAME', 'GenAIPipelineCache'))
-        
-        # Calculate expiration time
-        expiration_time = (datetime.now() + timedelta(seconds=CACHE_TTL)).isoformat()
-        
-        # Save item to cache
-        table.put_item(Item={
-            'cache_key': cache_key,
-            'response': response,
-            'expiration_time': expiration_time,
-            'created_at': datetime.now().isoformat()
-        })
-        
-        print(f"Saved to cache: {cache_key}")
-        return True
+        stored = get_cache_backend().put(cache_key, response, CACHE_TTL if ttl is None else ttl, grace)
+        increment('cache_writes', tier=get_cache_tier(), result='stored' if stored else 'kept_newer')
+        return stored
     except Exception as e:
+        increment('cache_errors', tier=get_cache_tier(), op='put')
         print(f"Error saving to cache: {str(e)}")
         return False
 
+def get_many_from_cache(cache_keys):
+    """Get fresh cached responses for many keys (dict of cache_key -> response)"""
+    now = time.time()
+    return {
+        cache_key: entry['response']
+        for cache_key, entry in get_many_cache_entries(cache_keys).items()
+        if entry['fresh_until'] > now
+    }
+
+def get_many_cache_entries(cache_keys):
+    """Get raw cache entries for many keys, including stale ones"""
+    start = time.perf_counter()
+    try:
+        entries = get_cache_backend().get_many(cache_keys)
+    except Exception as e:
+        increment('cache_errors', tier=get_cache_tier(), op='get_many')
+        print(f"Error getting batch from cache: {str(e)}")
+        return {}
+    
+    record_lookups(cache_keys, entries, (time.perf_counter() - start) * 1000)
+    return entries
+
+def save_many_to_cache(responses, ttl=None, grace=0):
+    """Save many responses (dict of cache_key -> response)"""
+    try:
+        stored = get_cache_backend().put_many(responses, CACHE_TTL if ttl is None else ttl, grace)
+        increment('cache_writes', len(responses), tier=get_cache_tier(), result='stored' if stored else 'kept_newer')
+        return stored
+    except Exception as e:
+        increment('cache_errors', tier=get_cache_tier(), op='put_many')
+        print(f"Error saving batch to cache: {str(e)}")
+        return False
+
+def _write_behind_worker():
+    """Drain queued cache writes in batches"""
+    while True:
+        pending = {}
+        cache_key, response, ttl, grace = _write_queue.get()
+        pending[(ttl, grace)] = {cache_key: response}
+        count = 1
+        
+        # Coalesce whatever else is already queued into the same batch
+        while count < BATCH_WRITE_LIMIT:
+            try:
+                cache_key, response, ttl, grace = _write_queue.get(timeout=0.05)
+            except queue.Empty:
+                break
+            pending.setdefault((ttl, grace), {})[cache_key] = response
+            count += 1
+        
+        try:
+            for (ttl, grace), responses in pending.items():
+                save_many_to_cache(responses, ttl, grace)
+        finally:
+            for _ in range(count):
+                _write_queue.task_done()
+
+def queue_cache_write(cache_key, response, ttl=None, grace=0):
+    """Save a response to the cache without blocking the caller"""
+    global _writer_thread
+    with _writer_lock:
+        if _writer_thread is None or not _writer_thread.is_alive():
+            _writer_thread = threading.Thread(target=_write_behind_worker, name='cache-write-behind', daemon=True)
+            _writer_thread.start()
+    _write_queue.put((cache_key, response, CACHE_TTL if ttl is None else ttl, grace))
+
+def flush_cache_writes():
+    """Block until all queued cache writes have been sent"""
+    _write_queue.join()
+
+def store_response(cache_key, response, policy=None):
+    """Cache a successful or deterministic-failure response per the model's policy"""
+    policy = policy or get_cache_policy()
+    
+    if response.get('inference_complete'):
+        ttl, grace = policy['ttl'], policy['stale_grace']
+    elif policy['negative_ttl'] > 0 and is_negative_cacheable(response):
+        ttl, grace = policy['negative_ttl'], 0
+    else:
+        return
+    
+    if write_behind_enabled():
+        queue_cache_write(cache_key, response, ttl, grace)
+    else:
+        save_to_cache(cache_key, response, ttl, grace)
+
+def _refresh(cache_key, data, inference_function, policy):
+    """Re-run inference for a stale entry; a transient failure keeps the stale entry"""
+    try:
+        store_response(cache_key, inference_function(data), policy)
+    finally:
+        with _refresh_lock:
+            _refreshing.discard(cache_key)
+
+def refresh_in_background(cache_key, data, inference_function, policy):
+    """Schedule a refresh of a stale entry unless one is already running"""
+    with _refresh_lock:
+        if cache_key in _refreshing:
+            return
+        _refreshing.add(cache_key)
+    _refresh_executor.submit(_refresh, cache_key, data, inference_function, policy)
+
+def serve_entry(entry, cache_key, data, inference_function, policy):
+    """Return a cached response, refreshing it in the background if stale"""
+    if entry['fresh_until'] <= time.time() and background_refresh_enabled():
+        refresh_in_background(cache_key, data, inference_function, policy)
+    return entry['response']
+
+def run_cached_batch_inference(items, inference_function):
+    """Run inference for many requests with one batched cache lookup"""
+    if not cache_enabled():
+        with ThreadPoolExecutor(max_workers=BATCH_INFERENCE_WORKERS) as executor:
+            return list(executor.map(inference_function, items))
+    
+    cache_keys = [get_cache_key(data.get('prompt', ''), data.get('model'), request_options(data)) for data in items]
+    entries = get_many_cache_entries(cache_keys)
+    
+    results = {}
+    misses = {}
+    for data, cache_key in zip(items, cache_keys):
+        if cache_key in results or cache_key in misses:
+            continue
+        if cache_key in entries:
+            policy = get_cache_policy(data.get('model'))
+            results[cache_key] = serve_entry(entries[cache_key], cache_key, data, inference_function, policy)
+        else:
+            # Identical prompts within the batch are only sent to the model once
+            misses[cache_key] = data
+    
+    if misses:
+        with ThreadPoolExecutor(max_workers=BATCH_INFERENCE_WORKERS) as executor:
+            responses = dict(zip(misses, executor.map(inference_function, misses.values())))
+        
+        for cache_key, response in responses.items():
+            store_response(cache_key, response, get_cache_policy(misses[cache_key].get('model')))
+        results.update(responses)
+    
+    return [results[cache_key] for cache_key in cache_keys]
+
 def run_cached_inference(data, inference_function):
     """Run inference with caching"""
+    # Multi-prompt requests go through the batched cache path
+    if isinstance(data, list):
+        return run_cached_batch_inference(data, inference_function)
+    
     prompt = data.get('prompt', '')
+    model = data.get('model')
     
     # Check if caching is enabled
-    if os.environ.get('ENABLE_CACHE', 'true').lower() == 'true':
-        # Generate cache key
-        cache_key = get_cache_key(prompt)
-        
-        # Try to get from cache
-        cached_response = get_from_cache(cache_key)
-        if cached_response:
-            return cached_response
+    if not cache_enabled():
+        return inference_function(data)
+    
+    # Generate cache key
+    cache_key = get_cache_key(prompt, model, request_options(data))
+    policy = get_cache_policy(model)
+    
+    # Fresh entries (including cached failures) are returned as-is; stale
+    # entries within the grace window are served while being refreshed
+    entry = get_cache_entry(cache_key)
+    if entry:
+        return serve_entry(entry, cache_key, data, inference_function, policy)
     
     # Run inference
     response = inference_function(data)
     
-    # Save to cache if successful
-    if response.get('inference_complete') and os.environ.get('ENABLE_CACHE', 'true').lower() == 'true':
-        save_to_cache(get_cache_key(prompt), response)
+    # Save to cache if successful, or briefly if the failure is deterministic
+    store_response(cache_key, response, policy)
     
-    return response
\ No newline at end of file
+    return response
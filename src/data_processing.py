@@ -1,21 +1,424 @@
+import csv
+import io
 import json
-import boto3
+import os
+import string
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import resource_tracker, shared_memory
+from urllib.parse import unquote_plus
 
-def preprocess_data(file_path):
-    """Process input data for GenAI pipeline."""
-    # Placeholder implementation
-    return {"processed": True, "source": file_path}
+import pandas as pd
+
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+try:
+    import resource
+except ImportError:
+    # Not available on Windows
+    resource = None
+
+try:
+    from .s3_io import abort_output, open_input, open_output, parse_s3_uri
+except ImportError:
+    from s3_io import abort_output, open_input, open_output, parse_s3_uri
+
+# Rows read per chunk; bounds memory use regardless of file size
+PREPROCESS_CHUNK_ROWS = int(os.environ.get('PREPROCESS_CHUNK_ROWS', '50000'))
+
+# Prompts longer than this (in characters) are cut
+MAX_PROMPT_CHARS = int(os.environ.get('MAX_PROMPT_CHARS', '20000'))
+
+# Columns tried, in order, when no template is given
+DEFAULT_TEXT_COLUMNS = ('prompt', 'text', 'body', 'content')
+
+# Worker processes for parallel preprocessing (1 = serial)
+PREPROCESS_WORKERS = int(os.environ.get('PREPROCESS_WORKERS', '1'))
+
+# Target shard size for parallel preprocessing
+PREPROCESS_SHARD_MB = int(os.environ.get('PREPROCESS_SHARD_MB', '64'))
+
+COMPRESSED_SUFFIXES = ('.gz', '.bz2', '.zst', '.xz')
+
+COMPRESSION_BY_SUFFIX = {'.gz': 'gzip', '.bz2': 'bz2', '.zst': 'zstd', '.xz': 'xz'}
+
+# Bucket that relative Lambda paths refer to
+DATA_BUCKET = os.environ.get('DATA_BUCKET')
+
+# Key prefix for prompts written back by S3-triggered runs
+PROCESSED_PREFIX = os.environ.get('PROCESSED_PREFIX', 'processed/')
+
+WHITESPACE = r'\s+'
+
+# Whitespace that needs collapsing: runs, or anything other than a plain space
+MESSY_WHITESPACE = r'\s\s|[^\S ]'
+
+def detect_format(file_path):
+    """Input format from the file name: 'csv' or 'jsonl' (compression suffixes are ignored)"""
+    name = file_path.lower()
+    for suffix in COMPRESSED_SUFFIXES:
+        if name.endswith(suffix):
+            name = name[:-len(suffix)]
+    if name.endswith(('.jsonl', '.ndjson', '.json')):
+        return 'jsonl'
+    return 'csv'
+
+def detect_compression(file_path):
+    """pandas compression name from the file name, or None"""
+    name = file_path.lower()
+    for suffix, compression in COMPRESSION_BY_SUFFIX.items():
+        if name.endswith(suffix):
+            return compression
+    return None
+
+def read_chunks(source, file_format, chunk_rows=None):
+    """Read a CSV or JSONL file (or file object) in DataFrame chunks of at most chunk_rows rows"""
+    chunk_rows = chunk_rows or PREPROCESS_CHUNK_ROWS
+    # pandas only infers compression from paths; file objects go by their name
+    compression = 'infer' if isinstance(source, str) else detect_compression(getattr(source, 'name', ''))
+    if file_format == 'jsonl':
+        reader = pd.read_json(source, lines=True, chunksize=chunk_rows, dtype=False, compression=compression)
+    else:
+        # Everything as strings: prompts are text and type inference per chunk is slow
+        reader = pd.read_csv(source, chunksize=chunk_rows, dtype=str, keep_default_na=False, compression=compression)
+    with reader:
+        yield from reader
+
+def compile_template(template):
+    """Split a str.format template into literal text and field names"""
+    parts = []
+    for literal, field, _, _ in string.Formatter().parse(template):
+        if literal:
+            parts.append((literal, None))
+        if field is not None:
+            parts.append((None, field))
+    return parts
+
+def default_template(columns):
+    """Template that uses the first text-like column present"""
+    for column in DEFAULT_TEXT_COLUMNS:
+        if column in columns:
+            return '{' + column + '}'
+    raise ValueError(f"No prompt column found; expected one of {DEFAULT_TEXT_COLUMNS} or a template")
+
+def clean_text(series):
+    """Vectorized cleanup: collapse whitespace, strip and cap the length"""
+    series = series.fillna('').astype(str)
+    # Matching is much cheaper than replacing, and most rows need no change
+    messy = series.str.contains(MESSY_WHITESPACE, regex=True)
+    if messy.any():
+        series = series.copy()
+        series[messy] = series[messy].str.replace(WHITESPACE, ' ', regex=True)
+    return series.str.strip().str.slice(0, MAX_PROMPT_CHARS)
+
+def build_prompts(chunk, template_parts):
+    """Render the template for every row of a chunk with column-wise string concatenation"""
+    prompt = pd.Series('', index=chunk.index, dtype=object)
+    for literal, field in template_parts:
+        if field is None:
+            prompt = prompt + literal
+        else:
+            if field not in chunk.columns:
+                raise ValueError(f"Template field {field!r} is not a column")
+            prompt = prompt + clean_text(chunk[field])
+    return prompt.str.strip()
+
+def iter_prompt_batches(source, template=None, file_format=None, chunk_rows=None):
+    """Yield DataFrames with 'row_id' and 'prompt' columns, one per input chunk
+
+    Only one chunk is held in memory at a time. Rows whose prompt is empty
+    after cleaning are dropped; row_id keeps their position in the input.
+    """
+    if file_format is None:
+        file_format = detect_format(source if isinstance(source, str) else getattr(source, 'name', ''))
+
+    template_parts = compile_template(template) if template else None
+    row_offset = 0
+    for chunk in read_chunks(source, file_format, chunk_rows):
+        if template_parts is None:
+            template_parts = compile_template(default_template(chunk.columns))
+
+        yield prompt_batch(chunk, template_parts, row_offset)
+        row_offset += len(chunk)
+
+def prompt_batch(chunk, template_parts, row_offset):
+    """Build the prompt batch for one input chunk"""
+    batch = pd.DataFrame({
+        'row_id': range(row_offset, row_offset + len(chunk)),
+        'prompt': build_prompts(chunk.reset_index(drop=True), template_parts)
+    })
+    return batch[batch['prompt'] != ''].reset_index(drop=True)
+
+def batch_to_payloads(batch):
+    """Inference request bodies for a prompt batch"""
+    return [{'prompt': prompt, 'row_id': int(row_id)} for row_id, prompt in zip(batch['row_id'], batch['prompt'])]
+
+def plan_shards(file_path, shards, skip_header=False):
+    """Split a file into byte ranges that start and end on line boundaries
+
+    Returns (header, ranges). Shards never split a line, but a quoted CSV
+    field containing newlines can still straddle a boundary; the workers
+    detect that and the rest of the file is then read serially.
+    """
+    size = os.path.getsize(file_path)
+    with open(file_path, 'rb') as f:
+        header = f.readline() if skip_header else b''
+        base = start = f.tell()
+        ranges = []
+        for index in range(1, shards + 1):
+            if index == shards:
+                end = size
+            else:
+                # Targets are fixed fractions of the body, so shards come out even
+                f.seek(max(base + (size - base) * index // shards - 1, start))
+                f.readline()
+                end = f.tell()
+            if end > start:
+                ranges.append((start, end))
+                start = end
+    return header, ranges
+
+def _preprocess_shard(file_path, start, end, header, template, file_format, chunk_rows):
+    """Worker: preprocess one byte range into an Arrow IPC stream in shared memory
+
+    Returns (shared memory name, stream size, input rows, cut). Row ids are
+    shard-local; the parent adds the shard's offset. cut is True, and
+    nothing is parsed, when a quoted CSV field runs past the shard's end.
+    """
+    with open(file_path, 'rb') as f:
+        f.seek(start)
+        data = header + f.read(end - start)
+
+    # With the shard starting outside quotes, an odd number of quote
+    # characters (escaped quotes come in pairs) means it ends inside one
+    if file_format == 'csv' and (data.count(b'"') - header.count(b'"')) % 2:
+        return None, 0, 0, True
+
+    template_parts = compile_template(template) if template else None
+    batches = []
+    input_rows = 0
+    for chunk in read_chunks(io.BytesIO(data), file_format, chunk_rows):
+        if template_parts is None:
+            template_parts = compile_template(default_template(chunk.columns))
+        batches.append(pa.RecordBatch.from_pandas(prompt_batch(chunk, template_parts, input_rows), preserve_index=False))
+        input_rows += len(chunk)
+    del data
+
+    if not batches:
+        return None, 0, input_rows, False
+
+    # Measure first so the stream is written straight into shared memory
+    schema = batches[0].schema
+    sink = pa.MockOutputStream()
+    with pa.ipc.new_stream(sink, schema) as writer:
+        for batch in batches:
+            writer.write_batch(batch)
+    size = sink.size()
+
+    block = shared_memory.SharedMemory(create=True, size=size)
+    if os.name == 'posix':
+        # The parent owns the block from here on and unlinks it after reading;
+        # the tracker knows it by its POSIX name, which has a leading slash
+        resource_tracker.unregister('/' + block.name, 'shared_memory')
+    sink = pa.FixedSizeBufferWriter(pa.py_buffer(block.buf))
+    with pa.ipc.new_stream(sink, schema) as writer:
+        for batch in batches:
+            writer.write_batch(batch)
+    # Arrow must drop its view of the block before it can be closed
+    sink.close()
+    del sink, writer
+    block.close()
+    return block.name, size, input_rows, False
+
+def _read_shard(name, size):
+    """Parent: load a shard's prompt batch from shared memory and free the block"""
+    block = shared_memory.SharedMemory(name=name)
+    try:
+        # One flat copy out of the block; Arrow-backed columns would otherwise
+        # keep referencing shared memory that is about to be freed
+        frame = pa.ipc.open_stream(pa.py_buffer(bytes(block.buf[:size]))).read_all().to_pandas()
+    finally:
+        block.close()
+        block.unlink()
+    return frame
+
+def iter_prompt_batches_parallel(file_path, template=None, file_format=None, chunk_rows=None, workers=None):
+    """Yield prompt batches in input order, preprocessing byte-range shards across processes
+
+    Batches cross process boundaries as Arrow IPC streams in shared
+    memory rather than pickles. At most two shards per worker are in
+    flight, which bounds memory use. If a quoted CSV field crosses a shard
+    boundary, the file is read serially from the start of that shard.
+    """
+    if pa is None:
+        raise ImportError("Parallel preprocessing requires pyarrow")
+
+    workers = workers or os.cpu_count()
+    file_format = file_format or detect_format(file_path)
+    size = os.path.getsize(file_path)
+    shards = max(workers * 4, size // (PREPROCESS_SHARD_MB * 1024 * 1024) + 1)
+    header, ranges = plan_shards(file_path, shards, skip_header=file_format == 'csv')
+
+    row_offset = 0
+    resume = None
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+        try:
+            for start, end in ranges:
+                pending.append((start, executor.submit(
+                    _preprocess_shard, file_path, start, end, header, template, file_format, chunk_rows
+                )))
+                while len(pending) >= workers * 2 and resume is None:
+                    resume, row_offset = yield from _yield_shard(*pending.popleft(), row_offset)
+                if resume is not None:
+                    break
+            while pending and resume is None:
+                resume, row_offset = yield from _yield_shard(*pending.popleft(), row_offset)
+        finally:
+            # Free the shared memory of shards that were never consumed
+            for _, future in pending:
+                if future.cancel() or future.exception():
+                    continue
+                name = future.result()[0]
+                if name:
+                    block = shared_memory.SharedMemory(name=name)
+                    block.close()
+                    block.unlink()
+
+    if resume is not None:
+        yield from _iter_csv_tail(file_path, resume, header, template, chunk_rows, row_offset)
+
+def _iter_csv_tail(file_path, start, header, template, chunk_rows, row_offset):
+    """Yield prompt batches for a CSV from byte offset start, numbering rows from row_offset"""
+    columns = next(csv.reader([header.decode('utf-8-sig')]))
+    template_parts = compile_template(template or default_template(columns))
+    with open(file_path, 'rb') as f:
+        f.seek(start)
+        reader = pd.read_csv(f, names=columns, header=None, chunksize=chunk_rows or PREPROCESS_CHUNK_ROWS,
+                             dtype=str, keep_default_na=False)
+        with reader:
+            for chunk in reader:
+                yield prompt_batch(chunk, template_parts, row_offset)
+                row_offset += len(chunk)
+
+def _yield_shard(start, future, row_offset):
+    """Yield one finished shard's batch with global row ids
+
+    Returns (resume, next row offset); resume is the shard's start when
+    it was cut and has to be read serially, else None.
+    """
+    name, size, input_rows, cut = future.result()
+    if cut:
+        return start, row_offset
+    if name:
+        batch = _read_shard(name, size)
+        batch['row_id'] += row_offset
+        yield batch
+    return None, row_offset + input_rows
+
+def peak_rss_mb(children=False):
+    """Peak resident set size of this process (or its largest finished child) in MB; 0 where unknown"""
+    if resource is None:
+        return 0.0
+    peak = resource.getrusage(resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and kilobytes on Linux
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+def preprocess_data(file_path, template=None, output_path=None, chunk_rows=None, workers=None):
+    """Process input data for GenAI pipeline.
+
+    Streams the file through the chunked preprocessor, optionally writing
+    prompts as JSONL, and returns throughput statistics. Either path may be
+    an s3:// URI: input is read with parallel ranged GETs and output is
+    sent as a multipart upload, so neither is held in memory or on disk.
+    With more than one worker, uncompressed local files are preprocessed
+    in parallel.
+    """
+    start_time = time.perf_counter()
+    rows = batches = 0
+
+    workers = PREPROCESS_WORKERS if workers is None else workers
+    local = not file_path.startswith('s3://')
+    source = open_input(file_path)
+    if workers > 1 and local and not file_path.lower().endswith(COMPRESSED_SUFFIXES):
+        batch_source = iter_prompt_batches_parallel(file_path, template, chunk_rows=chunk_rows, workers=workers)
+    else:
+        workers = 1
+        batch_source = iter_prompt_batches(source, template, chunk_rows=chunk_rows)
+
+    output = open_output(output_path) if output_path else None
+    try:
+        for batch in batch_source:
+            rows += len(batch)
+            batches += 1
+            if output:
+                batch.to_json(output, orient='records', lines=True, force_ascii=False)
+    except BaseException:
+        if output:
+            abort_output(output)
+        raise
+    finally:
+        if output and not output.closed:
+            output.close()
+        if not local:
+            source.close()
+
+    elapsed = time.perf_counter() - start_time
+    return {
+        "processed": True,
+        "source": file_path,
+        "output": output_path,
+        "rows": rows,
+        "batches": batches,
+        "seconds": round(elapsed, 3),
+        "rows_per_sec": round(rows / elapsed, 1) if elapsed else 0.0,
+        "workers": workers,
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+        "peak_worker_rss_mb": round(peak_rss_mb(children=True), 1) if workers > 1 else None
+    }
+
+def resolve_path(path, bucket=None):
+    """s3:// URIs and absolute paths as-is; relative paths are keys in the bucket when one is set"""
+    if path is None or path.startswith('s3://') or os.path.isabs(path) or not bucket:
+        return path
+    return f"s3://{bucket}/{path}"
+
+def s3_event_paths(record):
+    """Input URI and default output URI for an S3 event notification record"""
+    bucket = record['s3']['bucket']['name']
+    key = unquote_plus(record['s3']['object']['key'])
+    name = os.path.basename(key)
+    for suffix in COMPRESSED_SUFFIXES:
+        if name.lower().endswith(suffix):
+            name = name[:-len(suffix)]
+    stem = os.path.splitext(name)[0]
+    return f"s3://{bucket}/{key}", f"s3://{bucket}/{PROCESSED_PREFIX}{stem}.jsonl"
 
 def lambda_handler(event, context):
     """AWS Lambda handler for data processing."""
     try:
-        # Extract data from event
-        data = json.loads(event.get('body', '{}'))
-        file_path = data.get('file_path', 'default.csv')
-        
-        # Process data
-        result = preprocess_data(file_path)
-        
+        if 'Records' in event:
+            # S3 upload notification: write prompts under PROCESSED_PREFIX
+            file_path, output_path = s3_event_paths(event['Records'][0])
+            if parse_s3_uri(file_path)[1].startswith(PROCESSED_PREFIX):
+                return {'statusCode': 200, 'body': json.dumps({'processed': False, 'skipped': file_path})}
+            data = {}
+        else:
+            # Extract data from event
+            data = json.loads(event.get('body', '{}'))
+            bucket = data.get('bucket', DATA_BUCKET)
+            file_path = resolve_path(data.get('file_path', 'default.csv'), bucket)
+            output_path = resolve_path(data.get('output_path'), bucket)
+
+        # Process data serially: Lambda has no /dev/shm for worker processes
+        # and shared memory, so the request's workers setting is ignored
+        result = preprocess_data(file_path, data.get('template'), output_path, workers=1)
+
         return {
             'statusCode': 200,
             'body': json.dumps(result),
@@ -31,4 +434,4 @@ def lambda_handler(event, context):
             'headers': {
                 'Content-Type': 'application/json'
             }
-        }
\ No newline at end of file
+        }
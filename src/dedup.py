@@ -0,0 +1,290 @@
+"""
+Prompt deduplication for GenAI Pipeline
+Exact and near-duplicate detection over bulk inputs, so each distinct prompt is sent once
+"""
+
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+try:
+    from .data_processing import iter_prompt_batches
+    from .result_writer import prompt_hash
+except ImportError:
+    from data_processing import iter_prompt_batches
+    from result_writer import prompt_hash
+
+# MinHash signature length and LSH banding; rows sharing any band are near-duplicates.
+# Pairs above a Jaccard similarity of about (1 / bands) ** (bands / num_perm), 0.5 by default, usually match.
+# Short prompts that differ only in an identifier also match, so near mode is opt-in.
+DEDUP_NUM_PERM = int(os.environ.get('DEDUP_NUM_PERM', '64'))
+DEDUP_BANDS = int(os.environ.get('DEDUP_BANDS', '16'))
+
+# Words per shingle for near-duplicate detection
+DEDUP_SHINGLE_WORDS = int(os.environ.get('DEDUP_SHINGLE_WORDS', '3'))
+
+# Rows per MinHash block; bounds the (shingles x num_perm) working array
+MINHASH_BLOCK_ROWS = 1000
+
+# Universal hashing modulus for MinHash; products of 31-bit values fit in uint64
+MERSENNE_PRIME = np.uint64((1 << 31) - 1)
+
+EMPTY = np.uint64(0)
+
+def hash_strings(values):
+    """64-bit SipHash of each string, vectorized by pandas
+
+    Two different prompts share a hash with probability about 2**-64 per
+    pair; at 10M distinct prompts that is a few in a million runs.
+    """
+    hashes = pd.util.hash_pandas_object(pd.Series(values, dtype=object), index=False).to_numpy(copy=True)
+    # Zero marks an empty slot in HashIndex
+    hashes[hashes == EMPTY] = 1
+    return hashes
+
+class HashIndex:
+    """Open-addressing hash table of uint64 keys to int64 values in two numpy arrays
+
+    Costs 16 bytes per slot and stays at most half full, so 32-64 bytes per
+    distinct key, with no per-key Python objects. Keys must be well-mixed
+    hashes and never zero.
+    """
+
+    def __init__(self, capacity=1 << 16):
+        capacity = 1 << max(int(capacity) - 1, 1).bit_length()
+        self.keys = np.zeros(capacity, dtype=np.uint64)
+        self.values = np.zeros(capacity, dtype=np.int64)
+        self.size = 0
+
+    @property
+    def nbytes(self):
+        return self.keys.nbytes + self.values.nbytes
+
+    def _reserve(self, additional):
+        """Double the table until it stays at most half full"""
+        capacity = len(self.keys)
+        while (self.size + additional) * 2 > capacity:
+            capacity *= 2
+        if capacity == len(self.keys):
+            return
+        occupied = self.keys != EMPTY
+        keys, values = self.keys[occupied], self.values[occupied]
+        self.keys = np.zeros(capacity, dtype=np.uint64)
+        self.values = np.zeros(capacity, dtype=np.int64)
+        self.size = 0
+        self._insert_unique(keys, values)
+
+    def _insert_unique(self, keys, values):
+        """Insert or find distinct keys; returns the value stored for each"""
+        result = np.empty(len(keys), dtype=np.int64)
+        mask = np.uint64(len(self.keys) - 1)
+        slots = keys & mask
+        pending = np.arange(len(keys))
+
+        # Linear probing, one step for all pending keys per round
+        while pending.size:
+            probe = slots[pending]
+            current = self.keys[probe]
+            found = current == keys[pending]
+            result[pending[found]] = self.values[probe[found]]
+
+            # Empty slots go to the first pending key that reaches them
+            empty = np.flatnonzero(current == EMPTY)
+            _, first = np.unique(probe[empty], return_index=True)
+            winners = pending[empty[first]]
+            self.keys[slots[winners]] = keys[winners]
+            self.values[slots[winners]] = values[winners]
+            result[winners] = values[winners]
+            self.size += len(winners)
+
+            # Keys that hit another key move on; losers of a claim retry the same slot
+            collided = pending[~found & (current != EMPTY)]
+            slots[collided] = (slots[collided] + np.uint64(1)) & mask
+
+            done = found
+            done[empty[first]] = True
+            pending = pending[~done]
+        return result
+
+    def lookup_or_insert(self, keys, values):
+        """Value stored for each key, inserting missing keys with the given value
+
+        Within one call, repeated keys all get the value of their first occurrence.
+        """
+        keys = np.asarray(keys, dtype=np.uint64)
+        values = np.asarray(values, dtype=np.int64)
+        unique_keys, first, inverse = np.unique(keys, return_index=True, return_inverse=True)
+        self._reserve(len(unique_keys))
+        return self._insert_unique(unique_keys, values[first])[inverse]
+
+def shingles(prompt, size=None):
+    """Lower-cased word n-grams of a prompt (the whole prompt when shorter than size)"""
+    size = size or DEDUP_SHINGLE_WORDS
+    words = prompt.lower().split()
+    if len(words) <= size:
+        return [' '.join(words)]
+    return [' '.join(words[i:i + size]) for i in range(len(words) - size + 1)]
+
+class MinHasher:
+    """MinHash signatures and LSH band keys for batches of prompts"""
+
+    def __init__(self, num_perm=None, bands=None, seed=42):
+        self.num_perm = num_perm or DEDUP_NUM_PERM
+        self.bands = bands or DEDUP_BANDS
+        if self.num_perm % self.bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        rng = np.random.default_rng(seed)
+        self.a = rng.integers(1, int(MERSENNE_PRIME), self.num_perm, dtype=np.uint64)
+        self.b = rng.integers(0, int(MERSENNE_PRIME), self.num_perm, dtype=np.uint64)
+        # Odd multipliers that fold each band's rows into one 64-bit key
+        self.fold = rng.integers(1, 1 << 63, self.num_perm // self.bands, dtype=np.uint64) | np.uint64(1)
+
+    def signatures(self, prompts):
+        """(rows, num_perm) MinHash signatures"""
+        signatures = np.empty((len(prompts), self.num_perm), dtype=np.uint64)
+        for start in range(0, len(prompts), MINHASH_BLOCK_ROWS):
+            block = [shingles(prompt) for prompt in prompts[start:start + MINHASH_BLOCK_ROWS]]
+            counts = np.fromiter((len(row) for row in block), dtype=np.int64, count=len(block))
+            hashes = hash_strings([shingle for row in block for shingle in row]) & MERSENNE_PRIME
+            permuted = (hashes[:, None] * self.a + self.b) % MERSENNE_PRIME
+            offsets = np.concatenate(([0], np.cumsum(counts)[:-1]))
+            signatures[start:start + len(block)] = np.minimum.reduceat(permuted, offsets, axis=0)
+        return signatures
+
+    def band_keys(self, prompts):
+        """(rows, bands) LSH keys; rows with an equal key in any band are candidates"""
+        signatures = self.signatures(prompts).reshape(len(prompts), self.bands, -1)
+        with np.errstate(over='ignore'):
+            keys = (signatures * self.fold).sum(axis=2, dtype=np.uint64)
+        keys[keys == EMPTY] = 1
+        return keys
+
+class DedupPlan:
+    """Maps every input row to the first row with the same (or a near-identical) prompt
+
+    Built in one pass over the input, before inference. Only rows that are
+    their own canonical row need a model call; followers() lists the rows
+    that get a canonical row's result. Costs 8 bytes per input row plus
+    the hash indexes, and 40 bytes per row whose prompt differs from its
+    canonical row's, to keep that row's own prompt hash.
+    """
+
+    def __init__(self, near_duplicates=False, num_perm=None, bands=None):
+        self.exact = HashIndex()
+        self.hasher = MinHasher(num_perm, bands) if near_duplicates else None
+        self.band_indexes = [HashIndex() for _ in range(self.hasher.bands)] if self.hasher else []
+        self.canonical = np.full(1 << 16, -1, dtype=np.int64)
+        self.rows = 0
+        self.exact_duplicates = 0
+        self.near_duplicates = 0
+        self.seconds = 0.0
+        self._order = None
+        self._bounds = None
+        # Rows whose prompt differs from their canonical row's, with their prompt hashes
+        self._hashed_rows = []
+        self._hashes = []
+
+    def _grow(self, max_row):
+        if max_row >= len(self.canonical):
+            size = len(self.canonical)
+            while size <= max_row:
+                size *= 2
+            grown = np.full(size, -1, dtype=np.int64)
+            grown[:len(self.canonical)] = self.canonical
+            self.canonical = grown
+
+    def add(self, row_ids, prompts):
+        """Assign canonical rows for a batch of rows in ascending row order"""
+        start = time.perf_counter()
+        row_ids = np.asarray(row_ids, dtype=np.int64)
+        if not len(row_ids):
+            return
+        self._grow(int(row_ids[-1]))
+        self._order = None
+
+        canonical = self.exact.lookup_or_insert(hash_strings(prompts), row_ids)
+        self.canonical[row_ids] = canonical
+        self.exact_duplicates += int((canonical != row_ids).sum())
+
+        if self.hasher:
+            # Only prompts seen for the first time need a signature
+            new = np.flatnonzero(canonical == row_ids)
+            if len(new):
+                keys = self.hasher.band_keys([prompts[i] for i in new])
+                candidates = np.min([
+                    index.lookup_or_insert(keys[:, band], row_ids[new])
+                    for band, index in enumerate(self.band_indexes)
+                ], axis=0)
+                self.canonical[row_ids[new]] = candidates
+                self.near_duplicates += int((candidates != row_ids[new]).sum())
+
+            # A candidate, or the first copy of an exact repeat, may itself be
+            # a near duplicate; follow links to the first row
+            while True:
+                linked = self.canonical[self.canonical[row_ids]]
+                if np.array_equal(linked, self.canonical[row_ids]):
+                    break
+                self.canonical[row_ids] = linked
+
+            differs = np.flatnonzero(canonical != self.canonical[row_ids])
+            if len(differs):
+                self._hashed_rows.append(row_ids[differs])
+                self._hashes.append(np.array([prompt_hash(prompts[i]) for i in differs], dtype='S32'))
+
+        self.rows += len(row_ids)
+        self.seconds += time.perf_counter() - start
+
+    def is_canonical(self, row_id):
+        return self.canonical[row_id] == row_id
+
+    def followers(self, row_id):
+        """Rows, other than row_id itself, that reuse row_id's result"""
+        if self._order is None:
+            self._order = np.argsort(self.canonical, kind='stable')
+            self._bounds = self.canonical[self._order]
+        start, end = np.searchsorted(self._bounds, [row_id, row_id + 1])
+        rows = self._order[start:end]
+        return rows[rows != row_id]
+
+    def prompt_hash(self, row_id):
+        """Prompt hash of a near-duplicate row, or None when its prompt is its canonical row's"""
+        if len(self._hashed_rows) > 1:
+            self._hashed_rows = [np.concatenate(self._hashed_rows)]
+            self._hashes = [np.concatenate(self._hashes)]
+        if not self._hashed_rows:
+            return None
+        rows = self._hashed_rows[0]
+        position = np.searchsorted(rows, row_id)
+        if position < len(rows) and rows[position] == row_id:
+            return self._hashes[0][position].decode('ascii')
+        return None
+
+    @property
+    def nbytes(self):
+        order = self._order.nbytes + self._bounds.nbytes if self._order is not None else 0
+        hashes = sum(rows.nbytes for rows in self._hashed_rows) + sum(hashes.nbytes for hashes in self._hashes)
+        return (self.exact.nbytes + sum(index.nbytes for index in self.band_indexes) + self.canonical.nbytes
+                + order + hashes)
+
+    def stats(self):
+        """Duplicate counts, the fraction of model calls saved and memory use"""
+        duplicates = self.exact_duplicates + self.near_duplicates
+        return {
+            'rows': self.rows,
+            'unique': self.rows - duplicates,
+            'exact_duplicates': self.exact_duplicates,
+            'near_duplicates': self.near_duplicates,
+            'calls_saved': round(duplicates / self.rows, 4) if self.rows else 0.0,
+            'index_mb': round(self.nbytes / (1024 * 1024), 2),
+            'mb_per_million_rows': round(self.nbytes / self.rows * 1e6 / (1024 * 1024), 2) if self.rows else 0.0,
+            'seconds': round(self.seconds, 3)
+        }
+
+def build_dedup_plan(source, template=None, chunk_rows=None, near_duplicates=False):
+    """Read a prompt file (path or file object) once and map each row to its canonical row"""
+    plan = DedupPlan(near_duplicates)
+    for batch in iter_prompt_batches(source, template, chunk_rows=chunk_rows):
+        plan.add(batch['row_id'].to_numpy(), batch['prompt'].tolist())
+    return plan
@@ -0,0 +1,271 @@
+"""
+Embeddings for GenAI Pipeline
+Batched Bedrock embedding calls with NumPy post-processing and compact binary output
+"""
+
+import base64
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+try:
+    from . import multi_model
+    from .metrics import increment, observe
+except ImportError:
+    import multi_model
+    from metrics import increment, observe
+
+# Embedding model configurations
+# max_batch is the number of texts the provider accepts per call
+EMBEDDING_MODELS = {
+    'titan-embed-v2': {
+        'id': 'amazon.titan-embed-text-v2:0',
+        'family': 'titan',
+        'dimensions': 1024,
+        'allowed_dimensions': (256, 512, 1024),
+        'max_batch': 1
+    },
+    'titan-embed-v1': {
+        'id': 'amazon.titan-embed-text-v1',
+        'family': 'titan',
+        'dimensions': 1536,
+        'max_batch': 1
+    },
+    'cohere-embed-english': {
+        'id': 'cohere.embed-english-v3',
+        'family': 'cohere',
+        'dimensions': 1024,
+        'max_batch': 96
+    },
+    'cohere-embed-multilingual': {
+        'id': 'cohere.embed-multilingual-v3',
+        'family': 'cohere',
+        'dimensions': 1024,
+        'max_batch': 96
+    }
+}
+
+DEFAULT_EMBEDDING_MODEL = os.environ.get('EMBEDDING_MODEL', 'titan-embed-v2')
+
+# Parallel Bedrock calls per request; Titan takes one text per call
+EMBED_CONCURRENCY = int(os.environ.get('EMBED_CONCURRENCY', '8'))
+
+# Texts accepted per request
+MAX_EMBED_TEXTS = int(os.environ.get('MAX_EMBED_TEXTS', '2048'))
+
+ENCODINGS = ('base64', 'float')
+QUANTIZATIONS = ('int8', 'binary')
+
+BATCH_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 96, 128, 256, 512, 1024, 2048)
+
+_embed_executor = ThreadPoolExecutor(max_workers=EMBED_CONCURRENCY, thread_name_prefix='embed')
+
+def get_embedding_config(model_name):
+    """Embedding model configuration; unknown names are an error rather than a silent default"""
+    if model_name not in EMBEDDING_MODELS:
+        raise ValueError(f"ValidationException: unsupported embedding model {model_name!r}")
+    return EMBEDDING_MODELS[model_name]
+
+def _invoke(model_config, body):
+    response = multi_model.get_bedrock_client().invoke_model(
+        modelId=model_config['id'],
+        contentType='application/json',
+        accept='application/json',
+        body=json.dumps(body)
+    )
+    return json.loads(response.get('body').read())
+
+def _embed_titan(model_config, texts, dimensions, input_type):
+    """One Titan call per text; returns (vectors, input tokens)"""
+    body = {'inputText': texts[0]}
+    if dimensions and 'allowed_dimensions' in model_config:
+        body['dimensions'] = dimensions
+    response = _invoke(model_config, body)
+    return [response['embedding']], response.get('inputTextTokenCount', 0)
+
+def _embed_cohere(model_config, texts, dimensions, input_type):
+    """Up to 96 texts per Cohere call; returns (vectors, input tokens)"""
+    response = _invoke(model_config, {
+        'texts': texts,
+        'input_type': input_type,
+        'truncate': 'END',
+        'embedding_types': ['float']
+    })
+    embeddings = response['embeddings']
+    # With embedding_types the vectors are keyed by type
+    if isinstance(embeddings, dict):
+        embeddings = embeddings['float']
+    return embeddings, 0
+
+PROVIDERS = {
+    'titan': _embed_titan,
+    'cohere': _embed_cohere
+}
+
+def embed_texts(texts, model_name=None, dimensions=None, input_type='search_document'):
+    """Embed texts as a float32 (len(texts), dimensions) array
+
+    Identical texts are embedded once. Texts are split into the largest
+    batches the model accepts and the batches run in parallel. Returns
+    (vectors, usage).
+    """
+    model_name = model_name or DEFAULT_EMBEDDING_MODEL
+    model_config = get_embedding_config(model_name)
+    if dimensions and dimensions not in model_config.get('allowed_dimensions', (model_config['dimensions'],)):
+        raise ValueError(f"ValidationException: {model_name} does not support {dimensions} dimensions")
+
+    unique = list(dict.fromkeys(texts))
+    positions = {text: index for index, text in enumerate(unique)}
+    batch_size = model_config['max_batch']
+    batches = [unique[i:i + batch_size] for i in range(0, len(unique), batch_size)]
+
+    embed = PROVIDERS[model_config['family']]
+    start = time.perf_counter()
+    results = list(_embed_executor.map(lambda batch: embed(model_config, batch, dimensions, input_type), batches))
+    observe('embedding_call_ms', (time.perf_counter() - start) * 1000, model=model_name)
+
+    vectors = np.array([vector for batch_vectors, _ in results for vector in batch_vectors], dtype=np.float32)
+    increment('embedding_texts', len(texts), model=model_name)
+    increment('embedding_calls', len(batches), model=model_name)
+    observe('embedding_batch_size', len(texts), BATCH_BUCKETS, model=model_name)
+
+    if len(unique) < len(texts):
+        vectors = vectors[[positions[text] for text in texts]]
+    return vectors, {'input_tokens': sum(tokens for _, tokens in results)}
+
+def normalize(vectors):
+    """L2-normalize rows in place so dot products are cosine similarities"""
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    np.divide(vectors, norms, out=vectors, where=norms > 0)
+    return vectors
+
+def quantize(vectors, kind):
+    """Compress float32 rows: 'int8' (per-row scale) or 'binary' (sign bits)
+
+    Returns (array, scales); scales is None for binary. int8 values are
+    round(v / scale) with scale = max(|v|) / 127 per row.
+    """
+    if kind == 'int8':
+        scales = np.abs(vectors).max(axis=1) / 127
+        scales[scales == 0] = 1
+        return np.rint(vectors / scales[:, None]).astype(np.int8), scales.astype(np.float32)
+    if kind == 'binary':
+        return np.packbits(vectors > 0, axis=1), None
+    raise ValueError(f"ValidationException: unsupported quantization {kind!r}")
+
+def encode_array(array):
+    """Base64 of the array's little-endian bytes, row-major"""
+    return base64.b64encode(array.astype(array.dtype.newbyteorder('<'), copy=False).tobytes()).decode('ascii')
+
+def decode_array(payload, dtype, shape):
+    """Inverse of encode_array"""
+    return np.frombuffer(base64.b64decode(payload), dtype=np.dtype(dtype).newbyteorder('<')).reshape(shape)
+
+def request_texts(data):
+    """Texts of an embedding request: data['texts'], or [data['text']]"""
+    texts = data.get('texts')
+    if texts is None:
+        texts = [data['text']] if data.get('text') is not None else []
+    return texts
+
+def batch_key(data):
+    """Requests with equal keys can share one embed_texts call"""
+    return data.get('model') or DEFAULT_EMBEDDING_MODEL, data.get('dimensions'), data.get('input_type', 'search_document')
+
+def run_embedding(data, embed=None):
+    """Embed data['texts'] (or data['text']) and encode the vectors for the response
+
+    Options: model, dimensions, input_type (Cohere), normalize, quantize
+    ('int8' or 'binary') and encoding ('base64', the default, or 'float'
+    for JSON lists). Returns a result dict; the 'vectors' key holds the
+    array for callers that want raw bytes and is not JSON-serializable.
+    embed replaces embed_texts, e.g. to serve rows of a batched call.
+    """
+    try:
+        texts = request_texts(data)
+        if not texts or not all(isinstance(text, str) and text for text in texts):
+            raise ValueError("ValidationException: texts must be a non-empty list of non-empty strings")
+        if len(texts) > MAX_EMBED_TEXTS:
+            raise ValueError(f"ValidationException: at most {MAX_EMBED_TEXTS} texts per request")
+        encoding = data.get('encoding', 'base64')
+        if encoding not in ENCODINGS:
+            raise ValueError(f"ValidationException: unsupported encoding {encoding!r}")
+        if data.get('quantize') and data['quantize'] not in QUANTIZATIONS:
+            raise ValueError(f"ValidationException: unsupported quantization {data['quantize']!r}")
+
+        model_name, dimensions, input_type = batch_key(data)
+        vectors, usage = (embed or embed_texts)(texts, model_name, dimensions, input_type)
+        if data.get('normalize'):
+            normalize(vectors)
+        dimensions = int(vectors.shape[1])
+
+        scales = None
+        if data.get('quantize'):
+            vectors, scales = quantize(vectors, data['quantize'])
+
+        result = {
+            'inference_complete': True,
+            'model': model_name,
+            'count': len(texts),
+            'dimensions': dimensions,
+            'dtype': vectors.dtype.name,
+            'shape': list(vectors.shape),
+            'encoding': encoding,
+            'usage': usage,
+            'vectors': vectors
+        }
+        if encoding == 'base64':
+            result['embeddings'] = encode_array(vectors)
+        else:
+            result['embeddings'] = vectors.tolist()
+        if scales is not None:
+            result['scales'] = encode_array(scales) if encoding == 'base64' else scales.tolist()
+        return result
+    except Exception as e:
+        return {
+            'inference_complete': False,
+            'error': str(e),
+            'data': {key: value for key, value in data.items() if key not in ('texts', 'text')}
+        }
+
+def run_embedding_batch(items):
+    """Run several embedding requests that share a batch_key with one embed_texts call
+
+    Texts from all requests are deduplicated and packed into provider-sized
+    batches together; each request is then encoded on its own. Reported
+    input tokens are the batch total shared out by text count. If the
+    combined call fails, each request runs (and fails) on its own.
+    """
+    texts = [text for data in items for text in request_texts(data)]
+    try:
+        if not all(isinstance(text, str) and text for text in texts) or len(texts) > MAX_EMBED_TEXTS:
+            raise ValueError("requests must be embedded separately")
+        vectors, usage = embed_texts(texts, *batch_key(items[0]))
+    except Exception:
+        return [run_embedding(data) for data in items]
+
+    rows = {text: row for row, text in enumerate(texts)}
+    def embed(own_texts, *args):
+        share = round(usage['input_tokens'] * len(own_texts) / len(texts))
+        return vectors[[rows[text] for text in own_texts]], {'input_tokens': share}
+    return [run_embedding(data, embed) for data in items]
+
+def response_body(result):
+    """JSON-serializable view of a run_embedding result"""
+    return {key: value for key, value in result.items() if key != 'vectors'}
+
+def binary_response(result):
+    """Raw little-endian vector bytes and headers describing them, for octet-stream clients"""
+    vectors = result['vectors']
+    headers = {
+        'X-Embedding-Model': result['model'],
+        'X-Embedding-Shape': ','.join(str(size) for size in vectors.shape),
+        'X-Embedding-Dtype': vectors.dtype.name
+    }
+    if result.get('scales') is not None:
+        scales = result['scales']
+        headers['X-Embedding-Scales'] = scales if isinstance(scales, str) else encode_array(np.array(scales, dtype=np.float32))
+    return vectors.astype(vectors.dtype.newbyteorder('<'), copy=False).tobytes(), headers
@@ -1,81 +1,246 @@
+import asyncio
+import base64
 import json
-import os
-import boto3
-from fastapi import FastAPI, HTTPException
+import time
+from typing import Any, Dict, List, Optional, Union
+
+# Module import runs once per execution environment, so it marks a cold start
+_MODULE_LOAD_START = time.perf_counter()
+
+from fastapi import FastAPI, Header, HTTPException
+from fastapi.responses import PlainTextResponse, Response, StreamingResponse
 from pydantic import BaseModel
-import uvicorn
+from starlette.background import BackgroundTask
+
+try:
+    from . import metrics
+    from .cached_inference import flush_cache_writes, run_cached_inference
+    from .embeddings import batch_key, binary_response, response_body, run_embedding, run_embedding_batch
+    from .multi_model import run_inference_with_model, stream_inference_with_model
+    from .scheduler import acquire_slot, admitted, admitted_async, batching_enabled, request_flow, submit
+    from .sessions import get_session_store, run_session_inference
+except ImportError:
+    import metrics
+    from cached_inference import flush_cache_writes, run_cached_inference
+    from embeddings import batch_key, binary_response, response_body, run_embedding, run_embedding_batch
+    from multi_model import run_inference_with_model, stream_inference_with_model
+    from scheduler import acquire_slot, admitted, admitted_async, batching_enabled, request_flow, submit
+    from sessions import get_session_store, run_session_inference
+
+_cold_start = True
+
+TIMING_HEADERS = 'X-Cold-Start, X-Init-Duration-Ms, X-Server-Time-Ms, X-Inference-Time-Ms, Server-Timing'
 
 # FastAPI app for EC2 deployment
 app = FastAPI(title="GenAI Pipeline", description="ARM64/Graviton optimized GenAI Pipeline")
 
 class InferenceRequest(BaseModel):
     prompt: str
+    # Shared instructions or documents; a string or a list of Anthropic text blocks
+    system: Optional[Union[str, List[Dict[str, Any]]]] = None
+    model: Optional[str] = None
+    # Continue a server-side conversation; only the new message is sent
+    session_id: Optional[str] = None
+    # Sizes max_tokens: classify, extract, summarize, chat or generate
+    request_class: Optional[str] = None
+    # Oversized prompts: 'truncate' or 'reject' (default from TOKEN_OVERFLOW_POLICY)
+    overflow: Optional[str] = None
+    # JSON mode: output is parsed (and validated when a schema is given) into 'output'
+    json_mode: Optional[bool] = None
+    response_schema: Optional[Dict[str, Any]] = None
+    # Prepend passages from the vector index: true for RETRIEVAL_TOP_K, or a count
+    retrieve: Optional[Union[bool, int]] = None
+    # Scheduling: the X-Tenant-Id and X-Priority headers take precedence
+    tenant: Optional[str] = None
+    # 'interactive' (default) or 'batch'
+    priority: Optional[str] = None
+
+class EmbedRequest(BaseModel):
+    texts: List[str]
+    model: Optional[str] = None
+    # Titan v2 only: 256, 512 or 1024
+    dimensions: Optional[int] = None
+    # Cohere only: search_document, search_query, classification or clustering
+    input_type: Optional[str] = None
+    normalize: bool = False
+    # 'int8' (with per-vector scales) or 'binary' (packed sign bits)
+    quantize: Optional[str] = None
+    # 'base64' little-endian bytes (default) or 'float' JSON lists
+    encoding: Optional[str] = None
+    # Scheduling, as for InferenceRequest
+    tenant: Optional[str] = None
+    priority: Optional[str] = None
 
 class InferenceResponse(BaseModel):
     inference_complete: bool
     result: str = None
     error: str = None
     data: dict = None
+    usage: dict = None
+    session_id: str = None
+    turns: int = None
+    output: Any = None
 
 @app.get("/health")
 async def health_check():
     return {"status": "healthy", "architecture": "ARM64", "service": "GenAI Pipeline"}
 
+@app.get("/metrics")
+async def metrics_endpoint(format: str = 'prometheus'):
+    """Expose cache and request metrics (Prometheus text, or JSON with ?format=json)"""
+    if format == 'json':
+        return metrics.registry.snapshot()
+    return PlainTextResponse(metrics.registry.render_prometheus(), media_type='text/plain; version=0.0.4')
+
+def request_data(request, tenant=None, priority=None):
+    """Request body as a dict and its (tenant, priority) flow, or a 400 for an unknown priority"""
+    data = request.model_dump(exclude_none=True)
+    try:
+        return data, request_flow(data, tenant, priority)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
 @app.post("/", response_model=InferenceResponse)
-async def inference_endpoint(request: InferenceRequest):
+async def inference_endpoint(request: InferenceRequest, x_tenant_id: Optional[str] = Header(None),
+                             x_priority: Optional[str] = Header(None)):
+    data, flow = request_data(request, x_tenant_id, x_priority)
     try:
-        result = run_inference({"prompt": request.prompt})
+        async with admitted_async(flow):
+            result = await run_inference_async(data)
         return InferenceResponse(**result)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/stream")
+async def stream_endpoint(request: InferenceRequest, x_tenant_id: Optional[str] = Header(None),
+                          x_priority: Optional[str] = Header(None)):
+    """Stream newline-delimited JSON events; in JSON mode, one per completed top-level field"""
+    data, flow = request_data(request, x_tenant_id, x_priority)
+    # Queue on the event loop rather than in the threadpool that runs the stream
+    release = await acquire_slot(flow)
+    def events():
+        try:
+            for event in stream_inference_with_model(data):
+                yield json.dumps(event) + '\n'
+        except Exception as e:
+            yield json.dumps({'done': True, 'error': str(e)}) + '\n'
+        finally:
+            release()
+    # A client that disconnects mid-stream leaves the generator unfinished,
+    # so the slot is also given back once the response ends
+    return StreamingResponse(events(), media_type='application/x-ndjson', background=BackgroundTask(release))
+
+@app.post("/embed")
+async def embed_endpoint(request: EmbedRequest, accept: Optional[str] = Header(None),
+                         x_tenant_id: Optional[str] = Header(None), x_priority: Optional[str] = Header(None)):
+    """Embed texts; vectors come back base64-encoded, or as raw bytes with Accept: application/octet-stream"""
+    data, flow = request_data(request, x_tenant_id, x_priority)
+    async with admitted_async(flow):
+        result = await run_embedding_async(data)
+    if not result['inference_complete']:
+        status = 400 if result['error'].startswith('ValidationException') else 500
+        raise HTTPException(status_code=status, detail=result['error'])
+    if accept == 'application/octet-stream':
+        content, headers = binary_response(result)
+        return Response(content=content, media_type='application/octet-stream', headers=headers)
+    return response_body(result)
+
+@app.delete("/sessions/{session_id}")
+async def delete_session(session_id: str):
+    """End a conversation and drop its stored history"""
+    get_session_store().delete(session_id)
+    return {"session_id": session_id, "deleted": True}
+
 def run_inference(data):
-    """Run GenAI model inference on processed data."""
-    try:
-        # Get credentials from environment variables if available
-        aws_access_key = os.environ.get('AWS_ACCESS_KEY_ID')
-        aws_secret_key = os.environ.get('AWS_SECRET_ACCESS_KEY')
-        aws_region = os.environ.get('AWS_DEFAULT_REGION', 'us-east-1')
-        
-        # Create Bedrock client with explicit credentials if available
-        if aws_access_key and aws_secret_key:
-            bedrock = boto3.client('bedrock-runtime',
-                                  region_name=aws_region,
-                                  aws_access_key_id=aws_access_key,
-                                  aws_secret_access_key=aws_secret_key)
-        else:
-            bedrock = boto3.client('bedrock-runtime')
-        
-        # Prepare prompt
-        prompt = data.get('prompt', 'Hello, how can I help you?')
-        
-        # Call Bedrock model with correct model ID
-        response = bedrock.invoke_model(
-            modelId='anthropic.claude-3-haiku-20240307-v1:0',  # Updated model ID
-            contentType='application/json',
-            accept='application/json',
-            body=json.dumps({
-                'anthropic_version': 'bedrock-2023-05-31',
-                'max_tokens': 500,
-                'messages': [{'role': 'user', 'content': prompt}]
-            })
-        )
-        
-        response_body = json.loads(response.get('body').read())
-        return {
-            'inference_complete': True,
-            'result': response_body['content'][0]['text'],
-            'data': data
-        }
-    except Exception as e:
+    """Run GenAI model inference on processed data, served from the cache when possible."""
+    # Conversation turns depend on stored history, so they bypass the response cache
+    if isinstance(data, dict) and data.get('session_id'):
+        return run_session_inference(data, invoke_bedrock)
+    return run_cached_inference(data, invoke_bedrock)
+
+async def run_inference_async(data):
+    """Run inference off the event loop; concurrent requests for one model share a batch"""
+    # Conversation turns must run in order, so they are never batched
+    if not batching_enabled() or data.get('session_id'):
+        return await asyncio.to_thread(run_inference, data)
+    return await asyncio.wrap_future(submit(f"inference:{data.get('model', 'claude-haiku')}", data, run_inference))
+
+async def run_embedding_async(data):
+    """Embed off the event loop; concurrent requests with the same model and options share Bedrock calls"""
+    if not batching_enabled():
+        return await asyncio.to_thread(run_embedding, data)
+    model_name, dimensions, input_type = batch_key(data)
+    return await asyncio.wrap_future(submit(f'embed:{model_name}:{dimensions}:{input_type}', data, run_embedding_batch))
+
+def is_embedding_event(event, data):
+    """Embedding requests are POSTs to /embed, or direct invocations with action 'embed'"""
+    path = event.get('rawPath') or event.get('path') or ''
+    return path.rstrip('/').endswith('/embed') or (isinstance(data, dict) and data.get('action') == 'embed')
+
+def invoke_bedrock(data):
+    """Call the requested Bedrock model directly."""
+    return run_inference_with_model(data)
+
+def event_headers(event):
+    """Request headers of an API Gateway or Function URL event, with lower-case names"""
+    return {key.lower(): value for key, value in (event.get('headers') or {}).items()}
+
+def get_timing_headers(cold_start, handler_start, inference_ms=None, init_duration_ms=None):
+    """Build response headers describing cold start and server-side timing
+
+    init_duration_ms is the caller's own import time; it defaults to this module's.
+    """
+    server_ms = (time.perf_counter() - handler_start) * 1000
+    init_ms = (INIT_DURATION_MS if init_duration_ms is None else init_duration_ms) if cold_start else 0.0
+    
+    server_timing = [f'init;dur={init_ms:.1f}', f'handler;dur={server_ms:.1f}']
+    headers = {
+        'X-Cold-Start': 'true' if cold_start else 'false',
+        'X-Init-Duration-Ms': f'{init_ms:.1f}',
+        'X-Server-Time-Ms': f'{server_ms:.1f}',
+        'Access-Control-Expose-Headers': TIMING_HEADERS
+    }
+    if inference_ms is not None:
+        headers['X-Inference-Time-Ms'] = f'{inference_ms:.1f}'
+        server_timing.append(f'inference;dur={inference_ms:.1f}')
+    headers['Server-Timing'] = ', '.join(server_timing)
+    return headers
+
+def embedding_lambda_response(event, data, flow, cold_start, handler_start):
+    """Lambda response for an embedding request; raw bytes when the client accepts them"""
+    inference_start = time.perf_counter()
+    with admitted(flow):
+        result = run_embedding(data)
+    inference_ms = (time.perf_counter() - inference_start) * 1000
+    headers = {
+        'Access-Control-Allow-Origin': '*',
+        'Access-Control-Allow-Methods': 'POST, OPTIONS',
+        'Access-Control-Allow-Headers': 'Content-Type, Accept, X-Tenant-Id, X-Priority',
+        **get_timing_headers(cold_start, handler_start, inference_ms)
+    }
+    
+    accept = event_headers(event).get('accept')
+    if result['inference_complete'] and accept == 'application/octet-stream':
+        content, binary_headers = binary_response(result)
         return {
-            'inference_complete': False,
-            'error': str(e),
-            'data': data
+            'statusCode': 200,
+            'body': base64.b64encode(content).decode('ascii'),
+            'isBase64Encoded': True,
+            'headers': {'Content-Type': 'application/octet-stream', **headers, **binary_headers}
         }
+    return {
+        'statusCode': 200,
+        'body': json.dumps(response_body(result)),
+        'headers': {'Content-Type': 'application/json', **headers}
+    }
 
 def lambda_handler(event, context):
     """AWS Lambda handler for model inference."""
+    global _cold_start
+    handler_start = time.perf_counter()
+    cold_start = _cold_start
+    _cold_start = False
+    
     try:
         # Handle both API Gateway and Function URL formats
         if 'body' in event:
@@ -83,8 +248,28 @@ def lambda_handler(event, context):
         else:
             data = event
         
-        # Run inference
-        result = run_inference(data)
+        headers = event_headers(event)
+        try:
+            flow = request_flow(data, headers.get('x-tenant-id'), headers.get('x-priority'))
+        except ValueError as e:
+            return {
+                'statusCode': 400,
+                'body': json.dumps({'error': str(e)}),
+                'headers': {
+                    'Content-Type': 'application/json',
+                    'Access-Control-Allow-Origin': '*',
+                    **get_timing_headers(cold_start, handler_start)
+                }
+            }
+        
+        if is_embedding_event(event, data):
+            return embedding_lambda_response(event, data, flow, cold_start, handler_start)
+        
+        # Run inference once the fair queue admits the request
+        inference_start = time.perf_counter()
+        with admitted(flow):
+            result = run_inference(data)
+        inference_ms = (time.perf_counter() - inference_start) * 1000
         
         return {
             'statusCode': 200,
@@ -93,7 +278,8 @@ def lambda_handler(event, context):
                 'Content-Type': 'application/json',
                 'Access-Control-Allow-Origin': '*',
                 'Access-Control-Allow-Methods': 'POST, OPTIONS',
-                'Access-Control-Allow-Headers': 'Content-Type'
+                'Access-Control-Allow-Headers': 'Content-Type, X-Tenant-Id, X-Priority',
+                **get_timing_headers(cold_start, handler_start, inference_ms)
             }
         }
     except Exception as e:
@@ -102,6 +288,15 @@ def lambda_handler(event, context):
             'body': json.dumps({'error': str(e)}),
             'headers': {
                 'Content-Type': 'application/json',
-                'Access-Control-Allow-Origin': '*'
+                'Access-Control-Allow-Origin': '*',
+                **get_timing_headers(cold_start, handler_start)
             }
-        }
\ No newline at end of file
+        }
+    finally:
+        # A frozen or recycled execution environment would lose queued cache writes
+        flush_cache_writes()
+        # Emit metrics recorded during this invocation as EMF log lines
+        metrics.registry.flush_emf()
+
+# Time spent importing this module (including boto3 and FastAPI) during the cold start
+INIT_DURATION_MS = (time.perf_counter() - _MODULE_LOAD_START) * 1000
\ No newline at end of file
@@ -1,10 +1,91 @@
-from data_processing import preprocess_data
-from inference import run_inference
+#!/usr/bin/env python3
+"""
+GenAI Pipeline command line
+Runs a prompt file through preprocessing, the cache and model inference
+"""
+
+import argparse
+import json
+import os
+import sys
+
+try:
+    from .pipeline import run_pipeline
+except ImportError:
+    from pipeline import run_pipeline
+
+def dry_run_inference(data):
+    """Stand-in model call that answers instantly, for measuring the rest of the pipeline"""
+    return {'inference_complete': True, 'result': '', 'dry_run': True}
+
+def print_stats(stats):
+    """Per-stage throughput and queue table"""
+    print(f"   {'Stage':<13} {'Workers':>7} {'Items':>9} {'Items/sec':>11} {'Busy':>6} {'Queue':>6} {'Max':>5}")
+    for stage in stats['stages']:
+        queue_depth = '-' if stage['queue_depth'] is None else stage['queue_depth']
+        max_depth = '-' if stage['max_queue_depth'] is None else stage['max_queue_depth']
+        print(f"   {stage['stage']:<13} {stage['workers']:>7} {stage['items']:>9,} {stage['items_per_sec']:>11,.1f} "
+              f"{stage['utilization']:>6.0%} {queue_depth:>6} {max_depth:>5}")
 
 def main():
-    data = preprocess_data("data/input.csv")
-    results = run_inference(data)
-    print(results)
+    """Main pipeline function"""
+    parser = argparse.ArgumentParser(description='GenAI Pipeline')
+    parser.add_argument('input', nargs='?', default='data/input.csv', help='CSV/JSONL prompt file, local or s3:// (default: data/input.csv)')
+    parser.add_argument('--output', help='Write results here, local or s3:// (.parquet, .arrow or .jsonl)')
+    parser.add_argument('--format', choices=['parquet', 'arrow', 'jsonl'], help='Result format (default: from --output suffix)')
+    parser.add_argument('--template', help='Prompt template, e.g. "Summarize: {text}"')
+    parser.add_argument('--model', help='Model name (default: claude-haiku)')
+    parser.add_argument('--chunk-rows', type=int, help='Rows per input chunk')
+    parser.add_argument('--preprocess-workers', type=int, help='Preprocessing threads')
+    parser.add_argument('--cache-workers', type=int, help='Cache lookup threads')
+    parser.add_argument('--inference-workers', type=int, help='Concurrent model calls')
+    parser.add_argument('--queue-size', type=int, help='Items queued in front of each stage')
+    parser.add_argument('--dedup', choices=['exact', 'near'], help='Send duplicate (or near-duplicate) prompts once')
+    parser.add_argument('--no-cache', action='store_true', help='Bypass the inference cache')
+    parser.add_argument('--dry-run', action='store_true', help='Skip model calls and the cache')
+    parser.add_argument('--progress', type=float, default=10.0, help='Seconds between progress reports (0 = off)')
+    parser.add_argument('--json', action='store_true', help='Print statistics as JSON')
+
+    args = parser.parse_args()
+    # Dry-run answers are empty, so they must neither come from nor go into the cache
+    if args.no_cache or args.dry_run:
+        os.environ['ENABLE_CACHE'] = 'false'
+
+    def progress(stats):
+        queues = ', '.join(f"{stage['stage']}={stage['queue_depth']}" for stage in stats['stages'][1:])
+        print(f"   {stats['seconds']:>7.1f}s  written {stats['stages'][-1]['items']:,}  queues: {queues}", file=sys.stderr)
+
+    stats = run_pipeline(
+        args.input, args.output, args.template, args.model,
+        inference_function=dry_run_inference if args.dry_run else None,
+        chunk_rows=args.chunk_rows,
+        progress=progress if args.progress and not args.json else None,
+        interval=args.progress or 5.0,
+        result_format=args.format,
+        dedup=args.dedup,
+        preprocess_workers=args.preprocess_workers,
+        cache_workers=args.cache_workers,
+        inference_workers=args.inference_workers,
+        queue_size=args.queue_size
+    )
+
+    if args.json:
+        print(json.dumps(stats, indent=2))
+        return 0 if not stats['failed'] else 1
+
+    print("🚀 GenAI Pipeline")
+    print("=" * 60)
+    print(f"   Requests: {stats['requests']:,} in {stats['seconds']:.1f}s "
+          f"({stats['cache_hits']:,} cached, {stats['failed']:,} failed)")
+    if 'dedup' in stats:
+        dedup = stats['dedup']
+        print(f"   Dedup: {dedup['exact_duplicates']:,} exact and {dedup['near_duplicates']:,} near duplicates, "
+              f"{dedup['calls_saved']:.1%} of calls saved, {dedup['mb_per_million_rows']:.0f} MB per million rows")
+    print_stats(stats)
+    print(f"   Bottleneck: {stats['bottleneck']}")
+    if stats['output']:
+        print(f"   Results: {stats['output']}")
+    return 0 if not stats['failed'] else 1
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    sys.exit(main())
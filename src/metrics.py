@@ -0,0 +1,145 @@
+"""
+Metrics for GenAI Pipeline
+"""
+
+import json
+import os
+import threading
+import time
+
+# Histogram bucket upper bounds
+LATENCY_BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+SIZE_BUCKETS_BYTES = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+# CloudWatch accepts at most 100 values per metric in one EMF document
+EMF_MAX_VALUES = 100
+
+class MetricsRegistry:
+    """Thread-safe counters and fixed-bucket histograms with optional labels"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = {}
+        self.histograms = {}
+        # Values recorded since the last EMF flush, keyed like the metrics
+        self.pending_counters = {}
+        self.pending_values = {}
+
+    @staticmethod
+    def _key(name, labels):
+        return name, tuple(sorted(labels.items()))
+
+    def increment(self, name, value=1, **labels):
+        """Add to a counter"""
+        key = self._key(name, labels)
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+            self.pending_counters[key] = self.pending_counters.get(key, 0) + value
+
+    def observe(self, name, value, buckets=LATENCY_BUCKETS_MS, **labels):
+        """Record a value in a histogram"""
+        key = self._key(name, labels)
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = {
+                    'buckets': buckets,
+                    'counts': [0] * (len(buckets) + 1),
+                    'sum': 0.0,
+                    'count': 0
+                }
+            index = next((i for i, bound in enumerate(buckets) if value <= bound), len(buckets))
+            histogram['counts'][index] += 1
+            histogram['sum'] += value
+            histogram['count'] += 1
+
+            values = self.pending_values.setdefault(key, [])
+            if len(values) < EMF_MAX_VALUES:
+                values.append(value)
+
+    def snapshot(self):
+        """Current counter and histogram values as plain dicts"""
+        with self.lock:
+            return {
+                'counters': [
+                    {'name': name, 'labels': dict(labels), 'value': value}
+                    for (name, labels), value in sorted(self.counters.items())
+                ],
+                'histograms': [
+                    {
+                        'name': name,
+                        'labels': dict(labels),
+                        'count': histogram['count'],
+                        'sum': histogram['sum'],
+                        'buckets': dict(zip([*map(str, histogram['buckets']), '+Inf'], histogram['counts']))
+                    }
+                    for (name, labels), histogram in sorted(self.histograms.items())
+                ]
+            }
+
+    def render_prometheus(self, prefix='genai_'):
+        """Render all metrics in the Prometheus text exposition format"""
+        def format_labels(labels, extra=()):
+            pairs = [*labels, *extra]
+            return '{' + ','.join(f'{k}="{v}"' for k, v in pairs) + '}' if pairs else ''
+
+        lines = []
+        with self.lock:
+            for (name, labels), value in sorted(self.counters.items()):
+                lines.append(f"{prefix}{name}_total{format_labels(labels)} {value}")
+
+            for (name, labels), histogram in sorted(self.histograms.items()):
+                cumulative = 0
+                for bound, count in zip([*map(str, histogram['buckets']), '+Inf'], histogram['counts']):
+                    cumulative += count
+                    lines.append(f"{prefix}{name}_bucket{format_labels(labels, [('le', bound)])} {cumulative}")
+                lines.append(f"{prefix}{name}_sum{format_labels(labels)} {histogram['sum']}")
+                lines.append(f"{prefix}{name}_count{format_labels(labels)} {histogram['count']}")
+
+        return '\n'.join(lines) + '\n'
+
+    def emf_documents(self, namespace=None):
+        """Build CloudWatch Embedded Metric Format documents for values since the last flush"""
+        namespace = namespace or os.environ.get('METRICS_NAMESPACE', 'GenAIPipeline')
+
+        with self.lock:
+            counters, self.pending_counters = self.pending_counters, {}
+            values, self.pending_values = self.pending_values, {}
+
+        # One document per label set, since labels become EMF dimensions
+        documents = {}
+        for (name, labels), value in [*counters.items(), *values.items()]:
+            document = documents.get(labels)
+            if document is None:
+                document = documents[labels] = {
+                    '_aws': {
+                        'Timestamp': int(time.time() * 1000),
+                        'CloudWatchMetrics': [{
+                            'Namespace': namespace,
+                            'Dimensions': [[label for label, _ in labels]],
+                            'Metrics': []
+                        }]
+                    },
+                    **dict(labels)
+                }
+            unit = 'Milliseconds' if name.endswith('_ms') else 'Bytes' if name.endswith('_bytes') else 'Count'
+            document['_aws']['CloudWatchMetrics'][0]['Metrics'].append({'Name': name, 'Unit': unit})
+            document[name] = value
+
+        return list(documents.values())
+
+    def flush_emf(self, namespace=None):
+        """Print pending metrics as EMF lines for CloudWatch Logs to extract"""
+        for document in self.emf_documents(namespace):
+            print(json.dumps(document, separators=(',', ':')))
+
+# Process-wide registry
+registry = MetricsRegistry()
+
+def increment(name, value=1, **labels):
+    """Add to a counter in the process-wide registry"""
+    registry.increment(name, value, **labels)
+
+def observe(name, value, buckets=LATENCY_BUCKETS_MS, **labels):
+    """Record a histogram value in the process-wide registry"""
+    registry.observe(name, value, buckets, **labels)
@@ -4,47 +4,119 @@ Multi-model support for GenAI Pipeline
 
 import json
 import os
+import threading
 import boto3
 
+try:
+    from .metrics import increment, observe
+    from .prompt_cache import build_anthropic_body, record_usage
+    from .structured_output import apply_json_mode, json_mode_prompt, parse_structured_output, stream_members
+    from .token_budget import (
+        MIN_OUTPUT_TOKENS, TOKEN_BUCKETS, estimate_request_tokens, estimate_tokens,
+        overflow_policy, size_max_tokens, truncate_text
+    )
+    from . import vector_index
+except ImportError:
+    from metrics import increment, observe
+    from prompt_cache import build_anthropic_body, record_usage
+    from structured_output import apply_json_mode, json_mode_prompt, parse_structured_output, stream_members
+    from token_budget import (
+        MIN_OUTPUT_TOKENS, TOKEN_BUCKETS, estimate_request_tokens, estimate_tokens,
+        overflow_policy, size_max_tokens, truncate_text
+    )
+    import vector_index
+
+# Geography of the cross-region inference profiles (us, eu or apac) used for
+# models that Bedrock does not serve on demand from a single region
+BEDROCK_PROFILE_GEOGRAPHY = os.environ.get('BEDROCK_PROFILE_GEOGRAPHY', 'us')
+
 # Model configurations
+# Optional cache policy keys: cache_ttl, stale_grace, negative_ttl (seconds)
+# prompt_cache_min_tokens marks models that support Bedrock prompt caching
+# context_window and max_output_tokens are the provider limits used for token budgeting
 MODELS = {
     'claude-haiku': {
         'id': 'anthropic.claude-3-haiku-20240307-v1:0',
         'provider': 'bedrock',
         'max_tokens': 500,
         'temperature': 0.7,
-        'top_p': 0.9
+        'top_p': 0.9,
+        'context_window': 200000,
+        'max_output_tokens': 4096
     },
     'claude-sonnet': {
         'id': 'anthropic.claude-3-sonnet-20240229-v1:0',
         'provider': 'bedrock',
         'max_tokens': 1000,
         'temperature': 0.7,
-        'top_p': 0.9
+        'top_p': 0.9,
+        'context_window': 200000,
+        'max_output_tokens': 4096
     },
     'claude-opus': {
         'id': 'anthropic.claude-3-opus-20240229-v1:0',
         'provider': 'bedrock',
         'max_tokens': 1500,
         'temperature': 0.7,
-        'top_p': 0.9
+        'top_p': 0.9,
+        'context_window': 200000,
+        'max_output_tokens': 4096,
+        # Slowest model: serve stale answers longer while refreshing
+        'stale_grace': 3600
+    },
+    'claude-3-5-haiku': {
+        'id': f'{BEDROCK_PROFILE_GEOGRAPHY}.anthropic.claude-3-5-haiku-20241022-v1:0',
+        'provider': 'bedrock',
+        'max_tokens': 500,
+        'temperature': 0.7,
+        'top_p': 0.9,
+        'context_window': 200000,
+        'max_output_tokens': 8192,
+        'prompt_cache_min_tokens': 2048
+    },
+    'claude-3-7-sonnet': {
+        'id': f'{BEDROCK_PROFILE_GEOGRAPHY}.anthropic.claude-3-7-sonnet-20250219-v1:0',
+        'provider': 'bedrock',
+        'max_tokens': 1000,
+        'temperature': 0.7,
+        'top_p': 0.9,
+        'context_window': 200000,
+        'max_output_tokens': 8192,
+        'prompt_cache_min_tokens': 1024
     },
     'titan-text': {
         'id': 'amazon.titan-text-express-v1',
         'provider': 'bedrock',
         'max_tokens': 500,
         'temperature': 0.7,
-        'top_p': 0.9
+        'top_p': 0.9,
+        'context_window': 8192,
+        'max_output_tokens': 8192
     },
     'llama3': {
         'id': 'meta.llama3-70b-instruct-v1',
         'provider': 'bedrock',
         'max_tokens': 500,
         'temperature': 0.7,
-        'top_p': 0.9
+        'top_p': 0.9,
+        'context_window': 8192,
+        'max_output_tokens': 2048
     }
 }
 
+_bedrock_client = None
+_bedrock_lock = threading.Lock()
+
+def get_bedrock_client():
+    """Shared Bedrock runtime client, created once per process"""
+    global _bedrock_client
+    if _bedrock_client is None:
+        with _bedrock_lock:
+            if _bedrock_client is None:
+                aws_region = os.environ.get('AWS_REGION', os.environ.get('AWS_DEFAULT_REGION', 'us-east-1'))
+                _bedrock_client = boto3.client('bedrock-runtime', region_name=aws_region)
+    return _bedrock_client
+
 def get_model_config(model_name):
     """Get model configuration"""
     if model_name in MODELS:
@@ -53,6 +125,34 @@ def get_model_config(model_name):
         # Default to Claude Haiku
         return MODELS['claude-haiku']
 
+def apply_token_budget(data, model_config):
+    """Fit a request to the model's context window before calling it
+
+    Returns (data, max_tokens, error). Oversized prompts are truncated or
+    rejected according to the overflow policy; error is set on rejection.
+    """
+    input_tokens = estimate_request_tokens(data)
+    max_tokens = size_max_tokens(model_config, data.get('request_class'), input_tokens)
+    observe('estimated_input_tokens', input_tokens, TOKEN_BUCKETS)
+
+    # Leave room for the full answer the request class asks for
+    limit = model_config.get('context_window', input_tokens + max_tokens) - max_tokens
+    if input_tokens <= limit:
+        return data, max_tokens, None
+
+    prompt_tokens = estimate_tokens(data.get('prompt', ''))
+    prompt_limit = prompt_tokens - (input_tokens - limit)
+    if overflow_policy(data) == 'reject' or prompt_limit < MIN_OUTPUT_TOKENS:
+        increment('token_budget_rejections', model=model_config['id'])
+        # ValidationException marks the failure as deterministic for negative caching
+        return data, max_tokens, (
+            f"ValidationException: estimated {input_tokens} input tokens exceed "
+            f"the {limit}-token limit for {model_config['id']}"
+        )
+
+    increment('token_budget_truncations', model=model_config['id'])
+    return {**data, 'prompt': truncate_text(data['prompt'], prompt_limit)}, max_tokens, None
+
 def run_inference_with_model(data, model_name=None):
     """Run inference with specified model"""
     try:
@@ -63,35 +163,48 @@ def run_inference_with_model(data, model_name=None):
         # Get model configuration
         model_config = get_model_config(model_name)
         
-        # Get credentials from environment variables if available
-        aws_region = os.environ.get('AWS_REGION', 'us-east-1')
+        # Retrieved passages count against the token budget like the rest of the prompt
+        data = vector_index.augment_prompt(data)
+        
+        # Trim or reject oversized requests before paying for the network call
+        data, max_tokens, error = apply_token_budget(data, model_config)
+        if error:
+            return {
+                'inference_complete': False,
+                'error': error,
+                'model': model_name,
+                'data': data
+            }
+        model_config = {**model_config, 'max_tokens': max_tokens}
         
-        # Create Bedrock client
-        bedrock = boto3.client('bedrock-runtime', region_name=aws_region)
+        # Reuse the client (and its connection pool) across requests
+        bedrock = get_bedrock_client()
         
         # Prepare prompt
         prompt = data.get('prompt', 'Hello, how can I help you?')
+        usage = None
+        schema = data.get('response_schema')
+        json_mode = bool(data.get('json_mode')) or schema is not None
+        if json_mode:
+            prompt = json_mode_prompt(prompt, schema)
         
         # Call model based on provider
         if model_config['provider'] == 'bedrock':
             # Handle different model providers
             if 'anthropic' in model_config['id']:
-                # Anthropic models (Claude)
+                # Anthropic models (Claude), with prompt caching checkpoints
+                body = build_anthropic_body(data, model_config)
+                prefill = apply_json_mode(body, schema) if json_mode else ''
                 response = bedrock.invoke_model(
                     modelId=model_config['id'],
                     contentType='application/json',
                     accept='application/json',
-                    body=json.dumps({
-                        'anthropic_version': 'bedrock-2023-05-31',
-                        'max_tokens': model_config['max_tokens'],
-                        'temperature': model_config['temperature'],
-                        'top_p': model_config['top_p'],
-                        'messages': [{'role': 'user', 'content': prompt}]
-                    })
+                    body=json.dumps(body)
                 )
                 
                 response_body = json.loads(response.get('body').read())
-                result = response_body['content'][0]['text']
+                result = prefill + response_body['content'][0]['text']
+                usage = record_usage(response_body.get('usage'), model_name)
             
             elif 'amazon' in model_config['id']:
                 # Amazon models (Titan)
@@ -137,17 +250,78 @@ def run_inference_with_model(data, model_name=None):
             # Handle other providers if needed
             raise ValueError(f"Unsupported provider: {model_config['provider']}")
         
-        return {
+        response = {
             'inference_complete': True,
             'result': result,
             'model': model_name,
             'model_id': model_config['id'],
+            'usage': usage,
             'data': data
         }
+        if json_mode:
+            response['output'], errors = parse_structured_output(result, schema)
+            if errors:
+                response['inference_complete'] = False
+                response['error'] = f"Structured output did not match the schema: {'; '.join(errors[:5])}"
+        return response
     except Exception as e:
         return {
             'inference_complete': False,
             'error': str(e),
             'model': model_name,
             'data': data
-        }
\ No newline at end of file
+        }
+
+def stream_inference_with_model(data, model_name=None):
+    """Stream an Anthropic model response as events
+
+    Yields {'text': ...} deltas, or in JSON mode one event per completed
+    top-level member, and always ends with a {'done': True, ...} event.
+    """
+    model_name = model_name or data.get('model', 'claude-haiku')
+    model_config = get_model_config(model_name)
+    if 'anthropic' not in model_config['id']:
+        yield {'done': True, 'error': f"Streaming is not supported for model: {model_config['id']}"}
+        return
+
+    data = vector_index.augment_prompt(data)
+    data, max_tokens, error = apply_token_budget(data, model_config)
+    if error:
+        yield {'done': True, 'error': error}
+        return
+    model_config = {**model_config, 'max_tokens': max_tokens}
+
+    schema = data.get('response_schema')
+    json_mode = bool(data.get('json_mode')) or schema is not None
+    body = build_anthropic_body(data, model_config)
+    prefill = apply_json_mode(body, schema) if json_mode else ''
+
+    response = get_bedrock_client().invoke_model_with_response_stream(
+        modelId=model_config['id'],
+        contentType='application/json',
+        accept='application/json',
+        body=json.dumps(body)
+    )
+
+    usage = {}
+    def text_deltas():
+        for event in response['body']:
+            chunk = json.loads(event['chunk']['bytes'])
+            if chunk['type'] == 'content_block_delta':
+                yield chunk['delta'].get('text', '')
+            elif chunk['type'] == 'message_start':
+                usage.update(chunk['message'].get('usage', {}))
+            elif chunk['type'] == 'message_delta':
+                usage.update(chunk.get('usage', {}))
+
+    if json_mode:
+        for event in stream_members(text_deltas(), schema, prefill):
+            if event.get('done'):
+                event.update({'model': model_name, 'usage': record_usage(usage, model_name)})
+            yield event
+    else:
+        parts = []
+        for text in text_deltas():
+            parts.append(text)
+            yield {'text': text}
+        yield {'done': True, 'result': ''.join(parts), 'model': model_name, 'usage': record_usage(usage, model_name)}
@@ -0,0 +1,371 @@
+"""
+Pipelined executor for GenAI Pipeline
+Runs read -> preprocess -> cache lookup -> inference -> write as concurrent stages
+"""
+
+import os
+import queue
+import threading
+import time
+
+try:
+    from .cached_inference import (cache_enabled, flush_cache_writes, get_cache_key, get_cache_policy,
+                                   get_many_cache_entries, request_options, serve_entry, store_response)
+    from .data_processing import (batch_to_payloads, compile_template, default_template, detect_format,
+                                  prompt_batch, read_chunks)
+    from .dedup import build_dedup_plan
+    from .metrics import increment, observe
+    from .multi_model import run_inference_with_model
+    from .result_writer import open_result_writer, result_record
+    from .s3_io import open_input
+except ImportError:
+    from cached_inference import (cache_enabled, flush_cache_writes, get_cache_key, get_cache_policy,
+                                  get_many_cache_entries, request_options, serve_entry, store_response)
+    from data_processing import (batch_to_payloads, compile_template, default_template, detect_format,
+                                 prompt_batch, read_chunks)
+    from dedup import build_dedup_plan
+    from metrics import increment, observe
+    from multi_model import run_inference_with_model
+    from result_writer import open_result_writer, result_record
+    from s3_io import open_input
+
+# Items waiting in front of each stage; bounds memory when a later stage is slower
+PIPELINE_QUEUE_SIZE = int(os.environ.get('PIPELINE_QUEUE_SIZE', '64'))
+
+# Threads per stage
+PIPELINE_PREPROCESS_WORKERS = int(os.environ.get('PIPELINE_PREPROCESS_WORKERS', '2'))
+PIPELINE_CACHE_WORKERS = int(os.environ.get('PIPELINE_CACHE_WORKERS', '2'))
+PIPELINE_INFERENCE_WORKERS = int(os.environ.get('PIPELINE_INFERENCE_WORKERS', '16'))
+
+# Prompts per batched cache lookup
+PIPELINE_LOOKUP_BATCH = int(os.environ.get('PIPELINE_LOOKUP_BATCH', '50'))
+
+# How often blocked workers check whether the pipeline was stopped
+POLL_SECONDS = 0.1
+
+# End-of-input marker, one per worker
+_DONE = object()
+
+class Stage:
+    """One pipeline step, run by `workers` threads reading from a bounded queue
+
+    function(item) returns the item to pass on, or None to drop it. With
+    fan_out=True it returns an iterable of items instead.
+    """
+
+    def __init__(self, name, function, workers=1, queue_size=None, fan_out=False):
+        self.name = name
+        self.function = function
+        self.workers = workers
+        self.fan_out = fan_out
+        self.queue = queue.Queue(maxsize=queue_size or PIPELINE_QUEUE_SIZE) if function else None
+        self.lock = threading.Lock()
+        self.active = workers
+        self.items = 0
+        self.emitted = 0
+        self.errors = 0
+        self.busy = 0.0
+        self.max_depth = 0
+
+    def record(self, elapsed, emitted):
+        """Account for one processed item"""
+        with self.lock:
+            self.items += 1
+            self.emitted += emitted
+            self.busy += elapsed
+        increment('pipeline_items', stage=self.name)
+        observe('pipeline_stage_ms', elapsed * 1000, stage=self.name)
+
+    def stats(self, wall):
+        """Throughput, utilization and queue depth so far"""
+        return {
+            'stage': self.name,
+            'workers': self.workers,
+            'items': self.items,
+            'emitted': self.emitted,
+            'errors': self.errors,
+            'items_per_sec': round(self.items / wall, 1) if wall else 0.0,
+            'busy_seconds': round(self.busy, 3),
+            # Fraction of the stage's thread time spent working; the busiest stage is the bottleneck
+            'utilization': round(self.busy / (self.workers * wall), 3) if wall else 0.0,
+            'queue_depth': self.queue.qsize() if self.queue else None,
+            'max_queue_depth': self.max_depth if self.queue else None
+        }
+
+class Pipeline:
+    """Runs stages concurrently, connected by bounded queues
+
+    Items from the source flow through the stages in order; outputs of the
+    last stage are dropped. The first exception stops every stage and is
+    re-raised by run().
+    """
+
+    def __init__(self, stages, source_name='read'):
+        self.stages = stages
+        self.reader = Stage(source_name, None)
+        self.stop = threading.Event()
+        self.error = None
+        self.error_lock = threading.Lock()
+        self.start_time = None
+
+    def _put(self, stage, item):
+        """Block until the item is queued or the pipeline stops"""
+        while not self.stop.is_set():
+            try:
+                stage.queue.put(item, timeout=POLL_SECONDS)
+            except queue.Full:
+                continue
+            stage.max_depth = max(stage.max_depth, stage.queue.qsize())
+            return True
+        return False
+
+    def _get(self, stage):
+        """Next item, or _DONE once the input ends or the pipeline stops"""
+        while not self.stop.is_set():
+            try:
+                return stage.queue.get(timeout=POLL_SECONDS)
+            except queue.Empty:
+                continue
+        return _DONE
+
+    def _forward(self, index, item):
+        if index < len(self.stages):
+            return self._put(self.stages[index], item)
+        return True
+
+    def _finish(self, index):
+        """Tell every worker of stage `index` that its input has ended"""
+        if index < len(self.stages):
+            for _ in range(self.stages[index].workers):
+                self._put(self.stages[index], _DONE)
+
+    def _fail(self, error):
+        with self.error_lock:
+            if self.error is None:
+                self.error = error
+        self.stop.set()
+
+    def _feed(self, source):
+        """Pull items from the source into the first stage"""
+        try:
+            iterator = iter(source)
+            while not self.stop.is_set():
+                start = time.perf_counter()
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    break
+                self.reader.record(time.perf_counter() - start, 1)
+                if not self._forward(0, item):
+                    break
+        except Exception as e:
+            self.reader.errors += 1
+            self._fail(e)
+        finally:
+            self._finish(0)
+
+    def _work(self, index):
+        """Worker loop for one thread of stage `index`"""
+        stage = self.stages[index]
+        try:
+            while True:
+                item = self._get(stage)
+                if item is _DONE:
+                    break
+                start = time.perf_counter()
+                output = stage.function(item)
+                if stage.fan_out:
+                    outputs = list(output) if output is not None else []
+                else:
+                    outputs = [] if output is None else [output]
+                stage.record(time.perf_counter() - start, len(outputs))
+                for output in outputs:
+                    if not self._forward(index + 1, output):
+                        return
+        except Exception as e:
+            with stage.lock:
+                stage.errors += 1
+            self._fail(e)
+        finally:
+            with stage.lock:
+                stage.active -= 1
+                last = stage.active == 0
+            # The last worker out passes end-of-input downstream
+            if last:
+                self._finish(index + 1)
+
+    def stats(self):
+        """Per-stage statistics and the current bottleneck"""
+        wall = time.perf_counter() - self.start_time if self.start_time else 0.0
+        stages = [self.reader.stats(wall)] + [stage.stats(wall) for stage in self.stages]
+        return {
+            'seconds': round(wall, 3),
+            'stages': stages,
+            'bottleneck': max(stages, key=lambda stage: stage['utilization'])['stage']
+        }
+
+    def run(self, source, progress=None, interval=5.0):
+        """Process every item of source; calls progress(stats) every `interval` seconds"""
+        self.start_time = time.perf_counter()
+        threads = [threading.Thread(target=self._feed, args=(source,), name=f'pipeline-{self.reader.name}', daemon=True)]
+        for index, stage in enumerate(self.stages):
+            threads += [
+                threading.Thread(target=self._work, args=(index,), name=f'pipeline-{stage.name}-{n}', daemon=True)
+                for n in range(stage.workers)
+            ]
+        for thread in threads:
+            thread.start()
+
+        for thread in threads:
+            while thread.is_alive():
+                thread.join(interval)
+                if progress and thread.is_alive():
+                    progress(self.stats())
+
+        if self.error:
+            raise self.error
+        return self.stats()
+
+def read_input(source, file_format=None, chunk_rows=None):
+    """Read stage source: (row offset, DataFrame chunk) pairs"""
+    if file_format is None:
+        file_format = detect_format(source if isinstance(source, str) else getattr(source, 'name', ''))
+    row_offset = 0
+    for chunk in read_chunks(source, file_format, chunk_rows):
+        yield row_offset, chunk
+        row_offset += len(chunk)
+
+def build_stages(output=None, template=None, model=None, inference_function=None, preprocess_workers=None,
+                 cache_workers=None, inference_workers=None, lookup_batch=None, queue_size=None, summary=None,
+                 plan=None):
+    """Preprocess, dedup, cache lookup, inference and write stages for a prompt file
+
+    Items between the cache and write stages are dicts with the request
+    ('data'), its cache key and the response, which the cache stage fills
+    in for hits so they skip the model. With a DedupPlan, only canonical
+    rows go past the dedup stage and the write stage fans each result
+    back out to the rows that duplicate it. Result rows go to `output`, a
+    result writer; counts go into `summary`.
+    """
+    inference_function = inference_function or run_inference_with_model
+    lookup_batch = lookup_batch or PIPELINE_LOOKUP_BATCH
+    template_parts = compile_template(template) if template else None
+    use_cache = cache_enabled()
+    summary = {} if summary is None else summary
+    summary.update({'requests': 0, 'cache_hits': 0, 'failed': 0, 'duplicates': 0})
+
+    def preprocess(item):
+        row_offset, chunk = item
+        parts = template_parts or compile_template(default_template(chunk.columns))
+        payloads = batch_to_payloads(prompt_batch(chunk, parts, row_offset))
+        if model:
+            for payload in payloads:
+                payload['model'] = model
+        return [payloads[i:i + lookup_batch] for i in range(0, len(payloads), lookup_batch)]
+
+    def deduplicate(payloads):
+        kept = [data for data in payloads if plan.is_canonical(data['row_id'])]
+        return kept or None
+
+    def lookup(payloads):
+        items = [{'data': data, 'cache_key': None, 'response': None} for data in payloads]
+        if not use_cache:
+            return items
+
+        for item in items:
+            data = item['data']
+            item['cache_key'] = get_cache_key(data['prompt'], data.get('model'), request_options(data))
+        entries = get_many_cache_entries([item['cache_key'] for item in items])
+        for item in items:
+            entry = entries.get(item['cache_key'])
+            if entry:
+                policy = get_cache_policy(item['data'].get('model'))
+                item['response'] = serve_entry(entry, item['cache_key'], item['data'], inference_function, policy)
+                item['cached'] = True
+        return items
+
+    def infer(item):
+        if item['response'] is None:
+            start = time.perf_counter()
+            item['response'] = inference_function(item['data'])
+            item['latency_ms'] = (time.perf_counter() - start) * 1000
+            if use_cache:
+                store_response(item['cache_key'], item['response'], get_cache_policy(item['data'].get('model')))
+        return item
+
+    def write(item):
+        response = item['response']
+        summary['requests'] += 1
+        summary['cache_hits'] += 1 if item.get('cached') else 0
+        summary['failed'] += 0 if response.get('inference_complete') else 1
+        data = item['data']
+        followers = plan.followers(data['row_id']) if plan else ()
+        summary['duplicates'] += len(followers)
+        if output:
+            record = result_record(data['row_id'], data, response, item.get('latency_ms'), bool(item.get('cached')))
+            output.write(record)
+            for row_id in followers:
+                output.write({
+                    **record,
+                    'row_id': int(row_id),
+                    # Near duplicates keep the hash of their own prompt
+                    'prompt_hash': plan.prompt_hash(row_id) or record['prompt_hash'],
+                    'latency_ms': None,
+                    'duplicate_of': data['row_id']
+                })
+
+    stages = [
+        Stage('preprocess', preprocess, preprocess_workers or PIPELINE_PREPROCESS_WORKERS, queue_size, fan_out=True),
+        Stage('cache_lookup', lookup, cache_workers or PIPELINE_CACHE_WORKERS, queue_size, fan_out=True),
+        Stage('inference', infer, inference_workers or PIPELINE_INFERENCE_WORKERS, queue_size),
+        # One writer keeps output lines whole and the summary consistent
+        Stage('write', write, 1, queue_size)
+    ]
+    if plan:
+        stages.insert(1, Stage('dedup', deduplicate, 1, queue_size))
+    return stages
+
+def run_pipeline(input_path, output_path=None, template=None, model=None, inference_function=None,
+                 chunk_rows=None, progress=None, interval=5.0, result_format=None, dedup=None, **stage_options):
+    """Run prompts from a CSV/JSONL file (local or s3://) through inference
+
+    Results go to output_path as Parquet, Arrow IPC or JSONL, chosen by
+    result_format or the file suffix. With dedup='exact' or 'near', a first
+    pass over the input finds duplicate prompts, which are sent once.
+
+    Returns the pipeline statistics plus request, cache hit and failure counts.
+    """
+    summary = {}
+    plan = None
+    if dedup:
+        if dedup not in ('exact', 'near'):
+            raise ValueError(f"Unsupported dedup mode: {dedup}")
+        plan_source = open_input(input_path)
+        try:
+            plan = build_dedup_plan(plan_source, template, chunk_rows, near_duplicates=dedup == 'near')
+        finally:
+            if not isinstance(plan_source, str):
+                plan_source.close()
+
+    source = open_input(input_path)
+    output = open_result_writer(output_path, result_format) if output_path else None
+    try:
+        stages = build_stages(output, template, model, inference_function, summary=summary, plan=plan, **stage_options)
+        stats = Pipeline(stages).run(read_input(source, chunk_rows=chunk_rows), progress, interval)
+        if cache_enabled():
+            flush_cache_writes()
+    except BaseException:
+        if output:
+            output.abort()
+        raise
+    finally:
+        if output:
+            output.close()
+        if not isinstance(source, str):
+            source.close()
+
+    stats.update(summary)
+    stats.update({'source': input_path, 'output': output_path})
+    if plan:
+        stats['dedup'] = plan.stats()
+    return stats
@@ -0,0 +1,138 @@
+"""
+Prompt prefix caching for GenAI Pipeline
+Adds Bedrock prompt caching checkpoints to Anthropic requests with long shared prefixes
+"""
+
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+try:
+    from .metrics import increment
+    from .token_budget import estimate_tokens
+except ImportError:
+    from metrics import increment
+    from token_budget import estimate_tokens
+
+# How many distinct prefixes to remember when looking for repeats
+PREFIX_TRACKER_SIZE = int(os.environ.get('PREFIX_TRACKER_SIZE', '4096'))
+
+CACHE_CONTROL = {'type': 'ephemeral'}
+
+def prompt_caching_enabled():
+    """Check if prompt caching checkpoints should be added"""
+    return os.environ.get('ENABLE_PROMPT_CACHE', 'true').lower() == 'true'
+
+def normalize_system(system):
+    """Accept a system prompt as a string or a list of text blocks"""
+    if not system:
+        return []
+    if isinstance(system, str):
+        return [{'type': 'text', 'text': system}]
+    return [dict(block) for block in system]
+
+def split_prompt(prompt):
+    """Split a prompt into paragraphs; a shared prefix can only end on one of these boundaries"""
+    parts = prompt.split('\n\n')
+    return [part + '\n\n' for part in parts[:-1]] + [parts[-1]]
+
+class PrefixTracker:
+    """Remembers hashes of recent prompt prefixes to spot ones shared across requests"""
+
+    def __init__(self, max_entries=PREFIX_TRACKER_SIZE):
+        self.max_entries = max_entries
+        self.seen = OrderedDict()
+        self.lock = threading.Lock()
+
+    def longest_repeat(self, segments, min_tokens):
+        """Index of the last segment of the longest repeated prefix, or None
+
+        Every segment boundary is recorded, so the second request sharing
+        a prefix is the first one to get a checkpoint.
+        """
+        digest = hashlib.sha256()
+        tokens = 0
+        repeat = None
+
+        with self.lock:
+            # The final segment is the question itself and is never cached
+            for index, segment in enumerate(segments[:-1]):
+                digest.update(segment.encode('utf-8'))
+                tokens += estimate_tokens(segment)
+                if not segment:
+                    continue
+                key = digest.hexdigest()
+                if key in self.seen:
+                    self.seen.move_to_end(key)
+                    if tokens >= min_tokens:
+                        repeat = index
+                else:
+                    self.seen[key] = True
+                    if len(self.seen) > self.max_entries:
+                        self.seen.popitem(last=False)
+        return repeat
+
+# Process-wide tracker so repeats are detected across requests
+tracker = PrefixTracker()
+
+def build_anthropic_body(data, model_config):
+    """Build an Anthropic Messages request body with prompt caching checkpoints
+
+    data may carry 'system' and 'messages' (earlier turns as role/content
+    dicts) besides the current 'prompt'.
+    """
+    prompt = data.get('prompt', 'Hello, how can I help you?')
+    system = normalize_system(data.get('system'))
+    history = [
+        {'role': message['role'], 'content': [{'type': 'text', 'text': message['content']}]}
+        for message in data.get('messages', [])
+    ]
+    min_tokens = model_config.get('prompt_cache_min_tokens')
+
+    user_content = [{'type': 'text', 'text': prompt}]
+    if min_tokens and prompt_caching_enabled():
+        # Segment 0 is the system prompt, then earlier turns, then prompt paragraphs
+        parts = split_prompt(prompt)
+        system_text = ''.join(block.get('text', '') for block in system)
+        history_texts = [message['content'][0]['text'] for message in history]
+        repeat = tracker.longest_repeat([system_text, *history_texts, *parts], min_tokens)
+
+        if repeat == 0:
+            system[-1]['cache_control'] = CACHE_CONTROL
+        elif repeat is not None and repeat <= len(history):
+            history[repeat - 1]['content'][-1]['cache_control'] = CACHE_CONTROL
+        elif repeat is not None:
+            # Cache everything up to the end of the shared paragraphs
+            split = repeat - len(history)
+            user_content = [
+                {'type': 'text', 'text': ''.join(parts[:split]), 'cache_control': CACHE_CONTROL},
+                {'type': 'text', 'text': ''.join(parts[split:])}
+            ]
+
+    body = {
+        'anthropic_version': 'bedrock-2023-05-31',
+        'max_tokens': model_config['max_tokens'],
+        'temperature': model_config['temperature'],
+        'top_p': model_config['top_p'],
+        'messages': [*history, {'role': 'user', 'content': user_content}]
+    }
+    if system:
+        body['system'] = system
+    return body
+
+def record_usage(usage, model_name):
+    """Count input tokens by how the prompt cache served them"""
+    if not usage:
+        return {}
+
+    tokens = {
+        'uncached': usage.get('input_tokens', 0),
+        'cache_read': usage.get('cache_read_input_tokens', 0),
+        'cache_write': usage.get('cache_creation_input_tokens', 0)
+    }
+    for kind, count in tokens.items():
+        if count:
+            increment('model_input_tokens', count, model=model_name, kind=kind)
+    increment('model_output_tokens', usage.get('output_tokens', 0), model=model_name)
+    return usage
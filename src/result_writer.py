@@ -0,0 +1,205 @@
+"""
+Result writers for GenAI Pipeline
+Bulk inference results as Parquet, Arrow IPC or JSONL, flushed in row groups
+"""
+
+import hashlib
+import json
+import os
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+try:
+    from .s3_io import S3MultipartWriter, open_output, parse_s3_uri
+except ImportError:
+    from s3_io import S3MultipartWriter, open_output, parse_s3_uri
+
+# Rows buffered before a row group (Parquet) or record batch (Arrow) is written
+RESULT_ROW_GROUP_ROWS = int(os.environ.get('RESULT_ROW_GROUP_ROWS', '50000'))
+
+# Parquet codec: zstd is compact and fast to decode; snappy or none also work
+RESULT_COMPRESSION = os.environ.get('RESULT_COMPRESSION', 'zstd')
+
+RESULT_FIELDS = (
+    'row_id', 'prompt_hash', 'model', 'cached', 'inference_complete', 'latency_ms',
+    'input_tokens', 'output_tokens', 'cache_read_tokens', 'cache_write_tokens', 'output', 'error', 'duplicate_of'
+)
+
+FORMATS_BY_SUFFIX = {'.parquet': 'parquet', '.arrow': 'arrow', '.ipc': 'arrow', '.feather': 'arrow'}
+
+def result_schema():
+    """Arrow schema for result rows; model names are dictionary-encoded"""
+    return pa.schema([
+        ('row_id', pa.int64()),
+        ('prompt_hash', pa.string()),
+        ('model', pa.dictionary(pa.int32(), pa.string())),
+        ('cached', pa.bool_()),
+        ('inference_complete', pa.bool_()),
+        ('latency_ms', pa.float32()),
+        ('input_tokens', pa.int32()),
+        ('output_tokens', pa.int32()),
+        ('cache_read_tokens', pa.int32()),
+        ('cache_write_tokens', pa.int32()),
+        ('output', pa.string()),
+        ('error', pa.string()),
+        # Row whose result this row reuses, when deduplication skipped its model call
+        ('duplicate_of', pa.int64())
+    ])
+
+def prompt_hash(prompt):
+    """Stable hex digest of a prompt, for joins and duplicate analysis without the text"""
+    return hashlib.md5(prompt.encode('utf-8')).hexdigest()
+
+def result_record(row_id, data, response, latency_ms=None, cached=False, duplicate_of=None):
+    """Flatten a request and its inference response into one result row"""
+    usage = response.get('usage') or {}
+    return {
+        'row_id': row_id,
+        'prompt_hash': prompt_hash(data.get('prompt', '')),
+        'model': response.get('model') or data.get('model'),
+        'cached': cached,
+        'inference_complete': bool(response.get('inference_complete')),
+        'latency_ms': latency_ms,
+        'input_tokens': usage.get('input_tokens'),
+        'output_tokens': usage.get('output_tokens'),
+        'cache_read_tokens': usage.get('cache_read_input_tokens'),
+        'cache_write_tokens': usage.get('cache_creation_input_tokens'),
+        'output': response.get('result'),
+        'error': response.get('error'),
+        'duplicate_of': duplicate_of
+    }
+
+def detect_result_format(path):
+    """'parquet', 'arrow' or 'jsonl' from the file name"""
+    return FORMATS_BY_SUFFIX.get(os.path.splitext(path.lower())[1], 'jsonl')
+
+def open_binary_output(path):
+    """A binary stream for a local path or an s3:// URI"""
+    if not path.startswith('s3://'):
+        return open(path, 'wb')
+    return S3MultipartWriter(*parse_s3_uri(path))
+
+class JsonlResultWriter:
+    """One JSON object per result row"""
+
+    def __init__(self, path):
+        self.path = path
+        self.stream = open_output(path)
+        self.rows = 0
+
+    def write(self, record):
+        self.stream.write(json.dumps(record, ensure_ascii=False) + '\n')
+        self.rows += 1
+
+    def close(self):
+        if not self.stream.closed:
+            self.stream.close()
+
+    def abort(self):
+        """Discard a partial S3 upload; local files keep what was written"""
+        target = getattr(self.stream, 'buffer', None)
+        if isinstance(target, S3MultipartWriter):
+            target.abort()
+        self.close()
+
+class ColumnarResultWriter:
+    """Buffers rows column-wise and writes a record batch every row_group_rows rows
+
+    At most one row group is held in memory, so output size is unbounded.
+    """
+
+    def __init__(self, path, row_group_rows=None):
+        if pa is None:
+            raise ImportError("Parquet and Arrow output require pyarrow")
+        self.path = path
+        self.row_group_rows = row_group_rows or RESULT_ROW_GROUP_ROWS
+        self.schema = result_schema()
+        self.sink = open_binary_output(path)
+        self.writer = self._open_writer()
+        self.columns = {field: [] for field in RESULT_FIELDS}
+        # One growing model dictionary, so later batches only add entries
+        self.models = {}
+        self.buffered = 0
+        self.rows = 0
+        self.row_groups = 0
+
+    def _open_writer(self):
+        raise NotImplementedError
+
+    def _write_batch(self, batch):
+        raise NotImplementedError
+
+    def write(self, record):
+        for field, values in self.columns.items():
+            values.append(record.get(field))
+        self.buffered += 1
+        self.rows += 1
+        if self.buffered >= self.row_group_rows:
+            self.flush()
+
+    def flush(self):
+        """Write buffered rows as one row group"""
+        if not self.buffered:
+            return
+        codes = [None if model is None else self.models.setdefault(model, len(self.models))
+                 for model in self.columns['model']]
+        self.columns['model'] = pa.DictionaryArray.from_arrays(
+            pa.array(codes, pa.int32()), pa.array(list(self.models), pa.string())
+        )
+        batch = pa.RecordBatch.from_pydict(self.columns, schema=self.schema)
+        self._write_batch(batch)
+        self.row_groups += 1
+        self.columns = {field: [] for field in RESULT_FIELDS}
+        self.buffered = 0
+
+    def close(self):
+        if self.writer is None:
+            return
+        self.flush()
+        self.writer.close()
+        self.writer = None
+        self.sink.close()
+
+    def abort(self):
+        """Stop writing; discards the upload when writing to S3"""
+        self.writer = None
+        if isinstance(self.sink, S3MultipartWriter):
+            self.sink.abort()
+        elif not self.sink.closed:
+            self.sink.close()
+
+class ParquetResultWriter(ColumnarResultWriter):
+    """Parquet file with one row group per flush"""
+
+    def _open_writer(self):
+        return pq.ParquetWriter(self.sink, self.schema, compression=RESULT_COMPRESSION)
+
+    def _write_batch(self, batch):
+        self.writer.write_batch(batch, row_group_size=len(batch))
+
+class ArrowResultWriter(ColumnarResultWriter):
+    """Arrow IPC file with one record batch per flush"""
+
+    def _open_writer(self):
+        options = pa.ipc.IpcWriteOptions(emit_dictionary_deltas=True)
+        return pa.ipc.new_file(self.sink, self.schema, options=options)
+
+    def _write_batch(self, batch):
+        self.writer.write_batch(batch)
+
+WRITERS = {
+    'jsonl': JsonlResultWriter,
+    'parquet': ParquetResultWriter,
+    'arrow': ArrowResultWriter
+}
+
+def open_result_writer(path, result_format=None):
+    """Writer for a local path or s3:// URI; the format defaults to the file suffix"""
+    result_format = result_format or detect_result_format(path)
+    if result_format not in WRITERS:
+        raise ValueError(f"Unsupported result format: {result_format}")
+    return WRITERS[result_format](path)
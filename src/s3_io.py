@@ -0,0 +1,196 @@
+"""
+S3 streaming I/O for GenAI Pipeline
+File-like readers over parallel ranged GETs and writers over multipart uploads
+"""
+
+import io
+import os
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import boto3
+from botocore.config import Config
+
+# Size of each ranged GET, and how many are fetched ahead in parallel
+S3_READ_PART_MB = int(os.environ.get('S3_READ_PART_MB', '8'))
+S3_READ_CONCURRENCY = int(os.environ.get('S3_READ_CONCURRENCY', '4'))
+
+# Multipart upload part size; S3 requires at least 5 MB for all but the last part
+S3_WRITE_PART_MB = int(os.environ.get('S3_WRITE_PART_MB', '8'))
+MIN_PART_BYTES = 5 * 1024 * 1024
+
+_s3_client = None
+_s3_lock = threading.Lock()
+
+def get_s3_client():
+    """Shared S3 client with enough pooled connections for parallel ranged reads"""
+    global _s3_client
+    if _s3_client is None:
+        with _s3_lock:
+            if _s3_client is None:
+                _s3_client = boto3.client('s3', config=Config(max_pool_connections=max(S3_READ_CONCURRENCY * 2, 10)))
+    return _s3_client
+
+def parse_s3_uri(uri):
+    """Split s3://bucket/key into (bucket, key)"""
+    if not uri.startswith('s3://'):
+        raise ValueError(f"Not an S3 URI: {uri}")
+    bucket, _, key = uri[len('s3://'):].partition('/')
+    return bucket, key
+
+class S3RangeReader(io.RawIOBase):
+    """Read-only file over an S3 object, prefetching ranged GETs in parallel
+
+    Memory use is bounded by concurrency * part_size. Every range is
+    requested with the object's ETag, so a concurrent overwrite fails the
+    read instead of mixing two versions.
+    """
+
+    def __init__(self, bucket, key, part_size=None, concurrency=None, client=None):
+        super().__init__()
+        self.client = client or get_s3_client()
+        self.bucket = bucket
+        self.key = key
+        self.name = key
+        self.part_size = int(part_size or S3_READ_PART_MB * 1024 * 1024)
+        self.concurrency = concurrency or S3_READ_CONCURRENCY
+
+        head = self.client.head_object(Bucket=bucket, Key=key)
+        self.size = head['ContentLength']
+        self.etag = head['ETag']
+
+        self.executor = ThreadPoolExecutor(max_workers=self.concurrency)
+        self.pending = deque()
+        self.next_offset = 0
+        self.current = b''
+        self.position = 0
+
+    def _get_range(self, start, end):
+        response = self.client.get_object(
+            Bucket=self.bucket, Key=self.key, Range=f'bytes={start}-{end}', IfMatch=self.etag
+        )
+        return response['Body'].read()
+
+    def _schedule(self):
+        """Keep up to `concurrency` ranges in flight"""
+        while len(self.pending) < self.concurrency and self.next_offset < self.size:
+            end = min(self.next_offset + self.part_size, self.size) - 1
+            self.pending.append(self.executor.submit(self._get_range, self.next_offset, end))
+            self.next_offset = end + 1
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        if self.position >= len(self.current):
+            self._schedule()
+            if not self.pending:
+                return 0
+            self.current = self.pending.popleft().result()
+            self.position = 0
+            self._schedule()
+
+        count = min(len(buffer), len(self.current) - self.position)
+        buffer[:count] = self.current[self.position:self.position + count]
+        self.position += count
+        return count
+
+    def close(self):
+        if not self.closed:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.pending.clear()
+            self.current = b''
+        super().close()
+
+class S3MultipartWriter(io.BufferedIOBase):
+    """Write-only file that streams to S3 as a multipart upload
+
+    At most one part is buffered. Small outputs that never fill a part are
+    sent with a single PutObject. Call abort() to discard a failed write.
+    """
+
+    def __init__(self, bucket, key, part_size=None, client=None):
+        super().__init__()
+        self.client = client or get_s3_client()
+        self.bucket = bucket
+        self.key = key
+        self.part_size = max(part_size or S3_WRITE_PART_MB * 1024 * 1024, MIN_PART_BYTES)
+        self.buffer = bytearray()
+        self.upload_id = None
+        self.parts = []
+        self.position = 0
+
+    def writable(self):
+        return True
+
+    def tell(self):
+        return self.position
+
+    def write(self, data):
+        if self.closed:
+            raise ValueError("write to closed S3MultipartWriter")
+        self.buffer += data
+        self.position += len(data)
+        while len(self.buffer) >= self.part_size:
+            self._upload_part(bytes(self.buffer[:self.part_size]))
+            del self.buffer[:self.part_size]
+        return len(data)
+
+    def _upload_part(self, body):
+        if self.upload_id is None:
+            self.upload_id = self.client.create_multipart_upload(Bucket=self.bucket, Key=self.key)['UploadId']
+        number = len(self.parts) + 1
+        response = self.client.upload_part(
+            Bucket=self.bucket, Key=self.key, UploadId=self.upload_id, PartNumber=number, Body=body
+        )
+        self.parts.append({'PartNumber': number, 'ETag': response['ETag']})
+
+    def close(self):
+        if self.closed:
+            return
+        try:
+            if self.upload_id is None:
+                self.client.put_object(Bucket=self.bucket, Key=self.key, Body=bytes(self.buffer))
+            else:
+                if self.buffer:
+                    self._upload_part(bytes(self.buffer))
+                self.client.complete_multipart_upload(
+                    Bucket=self.bucket, Key=self.key, UploadId=self.upload_id,
+                    MultipartUpload={'Parts': self.parts}
+                )
+        except Exception:
+            self.abort()
+            raise
+        finally:
+            self.buffer = bytearray()
+            super().close()
+
+    def abort(self):
+        """Discard everything written so far"""
+        if self.upload_id is not None:
+            self.client.abort_multipart_upload(Bucket=self.bucket, Key=self.key, UploadId=self.upload_id)
+            self.upload_id = None
+        self.buffer = bytearray()
+        if not self.closed:
+            super().close()
+
+def open_input(path):
+    """A local path as-is, or a buffered streaming reader for an s3:// URI"""
+    if not path.startswith('s3://'):
+        return path
+    bucket, key = parse_s3_uri(path)
+    return io.BufferedReader(S3RangeReader(bucket, key), buffer_size=1024 * 1024)
+
+def open_output(path):
+    """A text stream for a local path or an s3:// URI"""
+    if not path.startswith('s3://'):
+        return open(path, 'w', encoding='utf-8')
+    bucket, key = parse_s3_uri(path)
+    return io.TextIOWrapper(S3MultipartWriter(bucket, key), encoding='utf-8')
+
+def abort_output(stream):
+    """Discard a partially written output (only S3 uploads can be discarded)"""
+    target = getattr(stream, 'buffer', None)
+    if isinstance(target, S3MultipartWriter):
+        target.abort()
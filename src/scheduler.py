@@ -0,0 +1,264 @@
+"""
+Request scheduling for GenAI Pipeline
+Micro-batching of concurrent requests for the same model, and weighted fair admission across tenants
+"""
+
+import asyncio
+import os
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import asynccontextmanager, contextmanager
+
+try:
+    from .metrics import increment, observe
+except ImportError:
+    from metrics import increment, observe
+
+# A batch is dispatched when it is full or its first request has waited this long
+BATCH_MAX_WAIT_MS = float(os.environ.get('BATCH_MAX_WAIT_MS', '5'))
+BATCH_MAX_SIZE = int(os.environ.get('BATCH_MAX_SIZE', '32'))
+
+# Batches running at once across all batchers
+BATCH_DISPATCH_WORKERS = int(os.environ.get('BATCH_DISPATCH_WORKERS', '16'))
+
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256)
+
+# Model calls in flight per process, and per tenant within that
+DISPATCH_CONCURRENCY = int(os.environ.get('DISPATCH_CONCURRENCY', '32'))
+TENANT_MAX_CONCURRENCY = int(os.environ.get('TENANT_MAX_CONCURRENCY', '8'))
+
+# Share of dispatch slots per priority class when both are waiting, as class=weight pairs
+PRIORITY_WEIGHTS = {
+    name: float(weight)
+    for name, weight in (pair.split('=') for pair in os.environ.get('PRIORITY_WEIGHTS', 'interactive=8,batch=1').split(','))
+}
+
+DEFAULT_PRIORITY = os.environ.get('DEFAULT_PRIORITY', 'interactive')
+DEFAULT_TENANT = 'default'
+
+_dispatch_executor = ThreadPoolExecutor(max_workers=BATCH_DISPATCH_WORKERS, thread_name_prefix='batch')
+
+def batching_enabled():
+    """Check if the server should batch concurrent requests"""
+    return os.environ.get('BATCHING_ENABLED', 'true').lower() == 'true'
+
+class MicroBatcher:
+    """Collects submitted items and runs them through batch_function together
+
+    The collector thread starts a batch with the first waiting item and
+    adds items until max_size is reached or the first item has waited
+    max_wait_ms; the batch then runs on the shared dispatch pool while the
+    next one is collected. batch_function takes a list of items and
+    returns one result per item; an exception fails every item in the batch.
+    """
+
+    def __init__(self, name, batch_function, max_size=None, max_wait_ms=None):
+        self.name = name
+        self.batch_function = batch_function
+        self.max_size = max_size or BATCH_MAX_SIZE
+        self.max_wait = (BATCH_MAX_WAIT_MS if max_wait_ms is None else max_wait_ms) / 1000
+        self.queue = queue.Queue()
+        self.thread = threading.Thread(target=self._collect, name=f'batcher-{name}', daemon=True)
+        self.thread.start()
+
+    def submit(self, item):
+        """Queue an item; the returned Future resolves to its result"""
+        future = Future()
+        self.queue.put((item, future, time.perf_counter()))
+        return future
+
+    def _collect(self):
+        while True:
+            batch = [self.queue.get()]
+            deadline = batch[0][2] + self.max_wait
+            while len(batch) < self.max_size:
+                remaining = deadline - time.perf_counter()
+                try:
+                    batch.append(self.queue.get(timeout=remaining) if remaining > 0 else self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            _dispatch_executor.submit(self._run, batch)
+
+    def _run(self, batch):
+        observe('batch_size', len(batch), BATCH_SIZE_BUCKETS, batcher=self.name)
+        observe('batch_wait_ms', (time.perf_counter() - batch[0][2]) * 1000, batcher=self.name)
+        increment('batches', batcher=self.name)
+        try:
+            results = self.batch_function([item for item, _, _ in batch])
+        except Exception as e:
+            for _, future, _ in batch:
+                future.set_exception(e)
+            return
+        for (_, future, _), result in zip(batch, results):
+            future.set_result(result)
+
+_batchers = {}
+_batchers_lock = threading.Lock()
+
+def get_batcher(name, batch_function):
+    """Batcher for a name (one per kind of request and model), created on first use"""
+    batcher = _batchers.get(name)
+    if batcher is None:
+        with _batchers_lock:
+            batcher = _batchers.get(name)
+            if batcher is None:
+                batcher = _batchers[name] = MicroBatcher(name, batch_function)
+    return batcher
+
+def submit(name, item, batch_function):
+    """Queue an item on the named batcher; returns a concurrent.futures.Future"""
+    return get_batcher(name, batch_function).submit(item)
+
+def parse_priority(priority):
+    """Validated priority class; None means DEFAULT_PRIORITY"""
+    priority = (priority or DEFAULT_PRIORITY).lower()
+    if priority not in PRIORITY_WEIGHTS:
+        raise ValueError(f"ValidationException: unknown priority {priority!r}, expected one of {', '.join(PRIORITY_WEIGHTS)}")
+    return priority
+
+class FairQueue:
+    """Admits requests to model dispatch by weighted fair queueing
+
+    Each (tenant, priority) pair is a flow with the weight of its priority
+    class. A request's tag is its flow's virtual finish time: cost / weight
+    after the flow's previous request, or after the current virtual time
+    when the flow was idle. Free slots go to the smallest tag among flows
+    whose tenant is under its concurrency cap. With default weights,
+    waiting interactive requests get 8 slots for every batch one, and a
+    tenant flooding the queue only delays its own later requests.
+    """
+
+    def __init__(self, capacity=None, tenant_limit=None, weights=None):
+        self.capacity = capacity or DISPATCH_CONCURRENCY
+        self.tenant_limit = tenant_limit or TENANT_MAX_CONCURRENCY
+        self.weights = weights or PRIORITY_WEIGHTS
+        self.lock = threading.Lock()
+        self.running = 0
+        self.tenant_running = {}
+        self.flows = {}
+        self.finish_tags = {}
+        self.virtual_time = 0.0
+
+    def acquire(self, tenant, priority, cost=1.0):
+        """Queue for a dispatch slot; the returned Future resolves once it is granted
+
+        Every granted slot must be given back with release(tenant).
+        Cancelling the Future before it resolves leaves the queue.
+        """
+        future = Future()
+        flow = (tenant, priority)
+        with self.lock:
+            start = max(self.virtual_time, self.finish_tags.get(flow, 0.0))
+            self.finish_tags[flow] = start + cost / self.weights[priority]
+            self.flows.setdefault(flow, deque()).append((self.finish_tags[flow], future, time.perf_counter()))
+            increment('queue_requests', priority=priority)
+            self._dispatch()
+        return future
+
+    def release(self, tenant):
+        with self.lock:
+            self.running -= 1
+            self.tenant_running[tenant] -= 1
+            if not self.tenant_running[tenant]:
+                del self.tenant_running[tenant]
+            self._dispatch()
+
+    def _dispatch(self):
+        while self.running < self.capacity:
+            eligible = [
+                (waiting[0][0], flow) for flow, waiting in self.flows.items()
+                if self.tenant_running.get(flow[0], 0) < self.tenant_limit
+            ]
+            if not eligible:
+                return
+            tag, flow = min(eligible)
+            _, future, enqueued = self.flows[flow].popleft()
+            if not self.flows[flow]:
+                # An idle flow restarts at the current virtual time
+                del self.flows[flow]
+                del self.finish_tags[flow]
+            self.virtual_time = max(self.virtual_time, tag)
+            if not future.set_running_or_notify_cancel():
+                continue
+            tenant, priority = flow
+            self.running += 1
+            self.tenant_running[tenant] = self.tenant_running.get(tenant, 0) + 1
+            observe('queue_delay_ms', (time.perf_counter() - enqueued) * 1000, priority=priority)
+            future.set_result(None)
+
+_fair_queue = None
+_fair_queue_lock = threading.Lock()
+
+def get_fair_queue():
+    """Process-wide admission queue in front of model dispatch"""
+    global _fair_queue
+    if _fair_queue is None:
+        with _fair_queue_lock:
+            if _fair_queue is None:
+                _fair_queue = FairQueue()
+    return _fair_queue
+
+def request_flow(data, tenant=None, priority=None):
+    """Remove tenant and priority from a request (or each request of a batch) and return them
+
+    Returns the flow (tenant, priority); the arguments (from headers) win
+    over body fields, and a batch is admitted as its first request. The
+    fields are removed so they never reach the model, the cache or the
+    data echoed back, which other tenants' identical requests can share.
+    """
+    fields = [
+        (item.pop('tenant', None), item.pop('priority', None))
+        for item in (data if isinstance(data, list) else [data]) if isinstance(item, dict)
+    ]
+    body_tenant, body_priority = fields[0] if fields else (None, None)
+    return tenant or body_tenant or DEFAULT_TENANT, parse_priority(priority or body_priority)
+
+@contextmanager
+def admitted(flow):
+    """Hold a dispatch slot for a (tenant, priority) flow while the block runs"""
+    tenant, priority = flow
+    fair_queue = get_fair_queue()
+    fair_queue.acquire(tenant, priority).result()
+    try:
+        yield
+    finally:
+        fair_queue.release(tenant)
+
+async def acquire_slot(flow):
+    """Wait for a dispatch slot for a (tenant, priority) flow without blocking the event loop
+
+    Returns a function that gives the slot back; calls after the first
+    do nothing, so the slot can be released from more than one place.
+    """
+    tenant, priority = flow
+    fair_queue = get_fair_queue()
+    granted = fair_queue.acquire(tenant, priority)
+    try:
+        await asyncio.wrap_future(granted)
+    except asyncio.CancelledError:
+        # Cancelling fails once the queue has started granting the slot;
+        # the grant then completes under the queue lock, so wait for it
+        # and give the slot back
+        if not granted.cancel():
+            granted.result()
+            fair_queue.release(tenant)
+        raise
+
+    released = threading.Lock()
+
+    def release():
+        if released.acquire(blocking=False):
+            fair_queue.release(tenant)
+    return release
+
+@asynccontextmanager
+async def admitted_async(flow):
+    """admitted() for coroutines: waits for the slot without blocking the event loop"""
+    release = await acquire_slot(flow)
+    try:
+        yield
+    finally:
+        release()
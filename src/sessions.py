@@ -0,0 +1,275 @@
+"""
+Multi-turn conversation sessions for GenAI Pipeline
+Keeps conversation history server-side so clients only send the new message
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+import boto3
+
+try:
+    from .cache_backends import decode_response, encode_response
+    from .metrics import increment, observe
+    from .multi_model import get_model_config
+    from .prompt_cache import normalize_system
+    from .token_budget import TOKEN_BUCKETS, estimate_tokens
+except ImportError:
+    from cache_backends import decode_response, encode_response
+    from metrics import increment, observe
+    from multi_model import get_model_config
+    from prompt_cache import normalize_system
+    from token_budget import TOKEN_BUCKETS, estimate_tokens
+
+# Sessions expire after this many seconds without a new turn
+SESSION_TTL = int(os.environ.get('SESSION_TTL', '86400'))
+
+# Estimated input tokens allowed for system prompt, summary, history and prompt
+SESSION_TOKEN_BUDGET = int(os.environ.get('SESSION_TOKEN_BUDGET', '8000'))
+
+# When over budget, trim history down to this fraction so trimming is not needed every turn
+SESSION_TRIM_TARGET = 0.75
+
+SESSION_SUMMARY_MODEL = os.environ.get('SESSION_SUMMARY_MODEL', 'claude-haiku')
+
+SUMMARY_PREFIX = 'Summary of the earlier conversation:\n'
+
+def summarization_enabled():
+    """Check if trimmed turns should be folded into a running summary"""
+    return os.environ.get('SESSION_SUMMARIZE', 'true').lower() == 'true'
+
+def new_session():
+    """Empty session record"""
+    return {'messages': [], 'summary': None, 'updated_at': int(time.time())}
+
+class SessionStore:
+    """Interface shared by all session stores
+
+    Sessions are dicts with 'messages' (role/content dicts), 'summary' and
+    'updated_at'. Concurrent turns on one session are last-writer-wins.
+    """
+
+    name = 'base'
+
+    def load(self, session_id):
+        """Get a live session or None"""
+        raise NotImplementedError
+
+    def save(self, session_id, session):
+        """Store a session and extend its expiry"""
+        raise NotImplementedError
+
+    def delete(self, session_id):
+        raise NotImplementedError
+
+class MemorySessionStore(SessionStore):
+    """In-process LRU store; sessions only live as long as the process"""
+
+    name = 'memory'
+
+    def __init__(self, max_sessions=None):
+        self.max_sessions = max_sessions or int(os.environ.get('SESSION_MAX_ENTRIES', '10000'))
+        self.sessions = OrderedDict()
+        self.lock = threading.Lock()
+
+    def load(self, session_id):
+        with self.lock:
+            entry = self.sessions.get(session_id)
+            if entry is None:
+                return None
+            if entry[0] <= time.time():
+                del self.sessions[session_id]
+                return None
+            self.sessions.move_to_end(session_id)
+            return decode_response(entry[1])
+
+    def save(self, session_id, session):
+        # Stored encoded so callers cannot mutate the stored history
+        with self.lock:
+            self.sessions[session_id] = (time.time() + SESSION_TTL, encode_response(session))
+            self.sessions.move_to_end(session_id)
+            while len(self.sessions) > self.max_sessions:
+                self.sessions.popitem(last=False)
+
+    def delete(self, session_id):
+        with self.lock:
+            self.sessions.pop(session_id, None)
+
+class SQLiteSessionStore(SessionStore):
+    """On-disk store for EC2/container hosts"""
+
+    name = 'sqlite'
+
+    def __init__(self, path=None):
+        self.path = path or os.environ.get('SESSION_SQLITE_PATH', '/tmp/genai-pipeline-sessions.db')
+        self.local = threading.local()
+        self._connect().execute(
+            'CREATE TABLE IF NOT EXISTS sessions ('
+            'session_id TEXT PRIMARY KEY, payload BLOB NOT NULL, expires_at INTEGER NOT NULL) WITHOUT ROWID'
+        )
+
+    def _connect(self):
+        """One connection per thread, since sqlite3 connections are not shareable"""
+        connection = getattr(self.local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            self.local.connection = connection
+        return connection
+
+    def load(self, session_id):
+        row = self._connect().execute(
+            'SELECT payload FROM sessions WHERE session_id = ? AND expires_at > ?',
+            (session_id, int(time.time()))
+        ).fetchone()
+        return decode_response(row[0]) if row else None
+
+    def save(self, session_id, session):
+        self._connect().execute(
+            'INSERT OR REPLACE INTO sessions (session_id, payload, expires_at) VALUES (?, ?, ?)',
+            (session_id, encode_response(session), int(time.time()) + SESSION_TTL)
+        )
+
+    def delete(self, session_id):
+        self._connect().execute('DELETE FROM sessions WHERE session_id = ?', (session_id,))
+
+class DynamoDBSessionStore(SessionStore):
+    """Store in a DynamoDB table with native TTL on expires_at"""
+
+    name = 'dynamodb'
+
+    def __init__(self, table_name=None):
+        self.table = boto3.resource('dynamodb').Table(
+            table_name or os.environ.get('SESSION_TABLE_NAME', 'GenAIPipelineSessions')
+        )
+
+    def load(self, session_id):
+        # Strongly consistent, since the previous turn may have just been written
+        item = self.table.get_item(
+            Key={'session_id': session_id},
+            ProjectionExpression='payload, expires_at',
+            ConsistentRead=True
+        ).get('Item')
+        if not item or int(item['expires_at']) <= time.time():
+            return None
+        return decode_response(item['payload'])
+
+    def save(self, session_id, session):
+        self.table.put_item(Item={
+            'session_id': session_id,
+            'payload': encode_response(session),
+            'expires_at': int(time.time()) + SESSION_TTL
+        })
+
+    def delete(self, session_id):
+        self.table.delete_item(Key={'session_id': session_id})
+
+STORES = {
+    'memory': MemorySessionStore,
+    'sqlite': SQLiteSessionStore,
+    'dynamodb': DynamoDBSessionStore
+}
+
+# Store instance selected by SESSION_STORE, created on first use
+_store = None
+_store_lock = threading.Lock()
+
+def get_session_store():
+    """Get the configured session store (SESSION_STORE, default: dynamodb)"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                name = os.environ.get('SESSION_STORE', 'dynamodb').lower()
+                if name not in STORES:
+                    raise ValueError(f"Unsupported session store: {name}")
+                _store = STORES[name]()
+    return _store
+
+def split_history(session, system, prompt, budget=None):
+    """Split history into (trimmed, kept) so the request fits the token budget
+
+    Whole user/assistant pairs are trimmed oldest first.
+    """
+    budget = SESSION_TOKEN_BUDGET if budget is None else budget
+    messages = session['messages']
+    fixed = estimate_tokens(prompt) + estimate_tokens(session.get('summary') or '')
+    fixed += sum(estimate_tokens(block.get('text', '')) for block in system)
+    total = fixed + sum(estimate_tokens(message['content']) for message in messages)
+
+    if total <= budget:
+        return [], messages
+
+    target = budget * SESSION_TRIM_TARGET
+    drop = 0
+    while total > target and drop < len(messages):
+        total -= sum(estimate_tokens(message['content']) for message in messages[drop:drop + 2])
+        drop += 2
+    return messages[:drop], messages[drop:]
+
+def summarize(trimmed, summary, inference_function):
+    """Fold trimmed turns into the running summary; keeps the old summary on failure"""
+    transcript = '\n'.join(f"{message['role']}: {message['content']}" for message in trimmed)
+    prompt = (
+        'Update the summary of this conversation with the new turns. '
+        'Keep names, facts, decisions and open questions; reply with the summary only.\n\n'
+        f"Current summary:\n{summary or '(none)'}\n\nNew turns:\n{transcript}"
+    )
+    result = inference_function({'prompt': prompt, 'model': SESSION_SUMMARY_MODEL})
+    if result.get('inference_complete'):
+        return result['result']
+    increment('session_summary_errors')
+    return summary
+
+def fold_history(system, messages, prompt):
+    """One prompt holding system text, summary and history, for models without message support"""
+    parts = [block['text'] for block in system]
+    parts += [f"{message['role'].capitalize()}: {message['content']}" for message in messages]
+    parts.append(f"User: {prompt}\nAssistant:")
+    return '\n\n'.join(parts)
+
+def run_session_inference(data, inference_function):
+    """Run one conversation turn, loading and saving history around the model call"""
+    session_id = data['session_id']
+    store = get_session_store()
+    session = store.load(session_id) or new_session()
+    increment('session_turns', resumed='true' if session['messages'] else 'false')
+
+    prompt = data.get('prompt', '')
+    system = normalize_system(data.get('system'))
+    trimmed, kept = split_history(session, system, prompt)
+    if trimmed:
+        increment('session_trimmed_messages', len(trimmed))
+        if summarization_enabled():
+            session['summary'] = summarize(trimmed, session.get('summary'), inference_function)
+        session['messages'] = kept
+
+    if session.get('summary'):
+        system = [*system, {'type': 'text', 'text': SUMMARY_PREFIX + session['summary']}]
+
+    request = {key: value for key, value in data.items() if key != 'session_id'}
+    if 'anthropic' in get_model_config(data.get('model'))['id']:
+        request.update({'system': system, 'messages': kept})
+    else:
+        # Titan and Llama only take a prompt, so the context goes into it
+        request.pop('system', None)
+        request['prompt'] = fold_history(system, kept, prompt)
+    observe('session_history_tokens', sum(estimate_tokens(message['content']) for message in kept), TOKEN_BUCKETS)
+
+    result = inference_function(request)
+
+    if result.get('inference_complete'):
+        session['messages'] = [
+            *kept,
+            {'role': 'user', 'content': prompt},
+            {'role': 'assistant', 'content': result['result']}
+        ]
+        session['updated_at'] = int(time.time())
+        store.save(session_id, session)
+
+    # Echo only the delta the client sent, not the stored history
+    return {**result, 'data': data, 'session_id': session_id, 'turns': len(session['messages']) // 2}
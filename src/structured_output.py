@@ -0,0 +1,336 @@
+"""
+Structured output (JSON mode) for GenAI Pipeline
+Schema-constrained prompting, compiled validation and incremental JSON parsing
+"""
+
+import hashlib
+import json
+import re
+import threading
+from collections import OrderedDict
+
+try:
+    from .metrics import increment, observe
+except ImportError:
+    from metrics import increment, observe
+
+# Compiled validators kept in memory, keyed by schema hash
+VALIDATOR_CACHE_SIZE = 256
+
+JSON_INSTRUCTIONS = (
+    'Respond with a single JSON value that conforms to this JSON Schema. '
+    'Output only the JSON, with no explanation or code fences.\n\nSchema:\n'
+)
+
+TYPE_CHECKS = {
+    'object': lambda value: isinstance(value, dict),
+    'array': lambda value: isinstance(value, list),
+    'string': lambda value: isinstance(value, str),
+    'integer': lambda value: isinstance(value, int) and not isinstance(value, bool),
+    'number': lambda value: isinstance(value, (int, float)) and not isinstance(value, bool),
+    'boolean': lambda value: isinstance(value, bool),
+    'null': lambda value: value is None
+}
+
+def schema_hash(schema):
+    """Stable hash of a schema, independent of key order"""
+    return hashlib.sha256(json.dumps(schema, sort_keys=True, separators=(',', ':')).encode('utf-8')).hexdigest()
+
+def compile_schema(schema):
+    """Compile a JSON Schema (common subset) into a validator(value, path, errors) function
+
+    Supports type, enum, const, properties, required, additionalProperties,
+    items, minimum/maximum, min/max length and items, pattern and anyOf.
+    """
+    checks = []
+
+    types = schema.get('type')
+    if types is not None:
+        type_list = [types] if isinstance(types, str) else list(types)
+        type_checks = [TYPE_CHECKS[name] for name in type_list]
+        def check_type(value, path, errors):
+            if not any(check(value) for check in type_checks):
+                errors.append(f"{path}: expected {' or '.join(type_list)}")
+                return False
+            return True
+        checks.append(check_type)
+
+    if 'enum' in schema:
+        allowed = schema['enum']
+        def check_enum(value, path, errors):
+            if value not in allowed:
+                errors.append(f"{path}: {value!r} is not one of {allowed}")
+            return True
+        checks.append(check_enum)
+
+    if 'const' in schema:
+        constant = schema['const']
+        def check_const(value, path, errors):
+            if value != constant:
+                errors.append(f"{path}: expected {constant!r}")
+            return True
+        checks.append(check_const)
+
+    bounds = [
+        (key, schema[key]) for key in ('minimum', 'maximum', 'minLength', 'maxLength', 'minItems', 'maxItems')
+        if key in schema
+    ]
+    if bounds:
+        def check_bounds(value, path, errors):
+            for key, bound in bounds:
+                if key in ('minimum', 'maximum'):
+                    if not TYPE_CHECKS['number'](value):
+                        continue
+                    measured = value
+                elif isinstance(value, (str, list)) and (key.endswith('Length') == isinstance(value, str)):
+                    measured = len(value)
+                else:
+                    continue
+                if (key.startswith('min') and measured < bound) or (key.startswith('max') and measured > bound):
+                    errors.append(f"{path}: violates {key}={bound}")
+            return True
+        checks.append(check_bounds)
+
+    if 'pattern' in schema:
+        pattern = re.compile(schema['pattern'])
+        def check_pattern(value, path, errors):
+            if isinstance(value, str) and not pattern.search(value):
+                errors.append(f"{path}: does not match {schema['pattern']!r}")
+            return True
+        checks.append(check_pattern)
+
+    properties = {name: compile_schema(subschema) for name, subschema in schema.get('properties', {}).items()}
+    required = schema.get('required', [])
+    additional = schema.get('additionalProperties', True)
+    additional_validator = compile_schema(additional) if isinstance(additional, dict) else None
+    if properties or required or additional is not True:
+        def check_object(value, path, errors):
+            if not isinstance(value, dict):
+                return True
+            for name in required:
+                if name not in value:
+                    errors.append(f"{path}: missing required property {name!r}")
+            for name, item in value.items():
+                validator = properties.get(name, additional_validator)
+                if validator is not None:
+                    validator(item, f"{path}.{name}", errors)
+                elif name not in properties and additional is False:
+                    errors.append(f"{path}: unexpected property {name!r}")
+            return True
+        checks.append(check_object)
+
+    if isinstance(schema.get('items'), dict):
+        item_validator = compile_schema(schema['items'])
+        def check_items(value, path, errors):
+            if isinstance(value, list):
+                for index, item in enumerate(value):
+                    item_validator(item, f"{path}[{index}]", errors)
+            return True
+        checks.append(check_items)
+
+    if 'anyOf' in schema:
+        options = [compile_schema(option) for option in schema['anyOf']]
+        def check_any_of(value, path, errors):
+            if not any(not option(value, path, []) for option in options):
+                errors.append(f"{path}: does not match any allowed schema")
+            return True
+        checks.append(check_any_of)
+
+    def validate(value, path='$', errors=None):
+        errors = [] if errors is None else errors
+        for check in checks:
+            # A failed type check makes the remaining checks meaningless
+            if not check(value, path, errors):
+                break
+        return errors
+
+    return validate
+
+_validators = OrderedDict()
+_validators_lock = threading.Lock()
+
+def get_validator(schema):
+    """Compiled validator for a schema, cached by schema hash"""
+    key = schema_hash(schema)
+    with _validators_lock:
+        validator = _validators.get(key)
+        if validator is not None:
+            _validators.move_to_end(key)
+            return validator
+
+    validator = compile_schema(schema)
+    with _validators_lock:
+        _validators[key] = validator
+        while len(_validators) > VALIDATOR_CACHE_SIZE:
+            _validators.popitem(last=False)
+    return validator
+
+def validate(value, schema):
+    """List of validation errors (empty when the value conforms)"""
+    return get_validator(schema)(value)
+
+def json_prefill(schema):
+    """Opening character to prefill the assistant turn with, if the top-level type is known"""
+    types = (schema or {}).get('type')
+    return {'object': '{', 'array': '['}.get(types, '') if isinstance(types, str) else ''
+
+def apply_json_mode(body, schema):
+    """Constrain an Anthropic request body to JSON output; returns the prefill text
+
+    The schema goes into the system prompt and the assistant turn is
+    prefilled with the opening bracket, which keeps the model from adding
+    any preamble.
+    """
+    instructions = JSON_INSTRUCTIONS + json.dumps(schema or {'type': 'object'}, separators=(',', ':'))
+    body['system'] = [*body.get('system', []), {'type': 'text', 'text': instructions}]
+
+    prefill = json_prefill(schema or {'type': 'object'})
+    if prefill:
+        body['messages'].append({'role': 'assistant', 'content': prefill})
+    return prefill
+
+def json_mode_prompt(prompt, schema):
+    """Prompt with JSON output instructions, for models without system prompts or prefill"""
+    return f"{prompt}\n\n{JSON_INSTRUCTIONS}{json.dumps(schema or {'type': 'object'}, separators=(',', ':'))}"
+
+def extract_json(text):
+    """Parse the JSON value in model output, tolerating code fences and surrounding text"""
+    text = text.strip()
+    if text.startswith('```'):
+        text = text.split('\n', 1)[-1].rsplit('```', 1)[0]
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError:
+        start = min((index for index in (text.find('{'), text.find('[')) if index >= 0), default=-1)
+        if start < 0:
+            raise
+        value, _ = json.JSONDecoder().raw_decode(text[start:])
+        return value
+
+def parse_structured_output(text, schema):
+    """Parse and validate model output; returns (output, errors)"""
+    try:
+        output = extract_json(text)
+    except json.JSONDecodeError as e:
+        increment('structured_output', result='invalid_json')
+        return None, [f"$: invalid JSON ({e.msg})"]
+
+    errors = validate(output, schema) if schema else []
+    increment('structured_output', result='invalid_schema' if errors else 'valid')
+    return output, errors
+
+class IncrementalJSONParser:
+    """Parses a streamed top-level JSON object or array and reports each member once complete
+
+    feed() returns (key, value) pairs for object members and (index, value)
+    pairs for array items, as soon as their closing character arrives.
+    """
+
+    def __init__(self):
+        self.text = ''
+        self.position = 0
+        self.depth = 0
+        self.in_string = False
+        self.escape = False
+        self.container = None
+        self.key = None
+        self.key_start = None
+        self.value_start = None
+        self.index = 0
+        self.done = False
+
+    def _complete(self, text, end):
+        """Decode the member that ends at `end` (exclusive)"""
+        raw = text[self.value_start:end].strip()
+        self.value_start = None
+        if not raw:
+            return None
+        value = json.loads(raw)
+        if self.container == 'object':
+            member = (self.key, value)
+            self.key = None
+        else:
+            member = (self.index, value)
+            self.index += 1
+        return member
+
+    def feed(self, chunk):
+        """Consume the next piece of text and return newly completed members"""
+        self.text += chunk
+        text = self.text
+        completed = []
+
+        for position in range(self.position, len(text)):
+            char = text[position]
+
+            if self.in_string:
+                if self.escape:
+                    self.escape = False
+                elif char == '\\':
+                    self.escape = True
+                elif char == '"':
+                    self.in_string = False
+                    if self.depth == 1 and self.key_start is not None:
+                        self.key = json.loads(text[self.key_start:position + 1])
+                        self.key_start = None
+                continue
+
+            if char == '"':
+                self.in_string = True
+                # At depth 1 in an object, a string before ':' is a member name
+                if self.depth == 1 and self.container == 'object' and self.key is None and self.value_start is None:
+                    self.key_start = position
+            elif char in '{[':
+                if self.depth == 0:
+                    self.container = 'object' if char == '{' else 'array'
+                    if self.container == 'array':
+                        self.value_start = position + 1
+                self.depth += 1
+            elif char in '}]':
+                self.depth -= 1
+                if self.depth == 0:
+                    if self.value_start is not None:
+                        member = self._complete(text, position)
+                        if member is not None:
+                            completed.append(member)
+                    self.done = True
+            elif self.depth == 1:
+                if char == ':' and self.container == 'object':
+                    self.value_start = position + 1
+                elif char == ',':
+                    member = self._complete(text, position)
+                    if member is not None:
+                        completed.append(member)
+                    if self.container == 'array':
+                        self.value_start = position + 1
+
+        self.position = len(text)
+        return completed
+
+def stream_members(chunks, schema=None, prefill=''):
+    """Yield events for a stream of text chunks: one per completed member, then a final summary
+
+    Each member is validated against its property (or items) schema as
+    soon as it completes.
+    """
+    parser = IncrementalJSONParser()
+    properties = (schema or {}).get('properties', {})
+    items = (schema or {}).get('items')
+    emitted = 0
+
+    for chunk in _prefixed(chunks, prefill):
+        for key, value in parser.feed(chunk):
+            subschema = items if isinstance(key, int) else properties.get(key)
+            errors = get_validator(subschema)(value, f"$.{key}" if isinstance(key, str) else f"$[{key}]") if subschema else []
+            emitted += 1
+            yield {'member': key, 'value': value, 'errors': errors}
+
+    output, errors = parse_structured_output(parser.text, schema)
+    observe('structured_stream_members', emitted, (1, 5, 10, 50, 100, 500))
+    yield {'done': True, 'output': output, 'errors': errors}
+
+def _prefixed(chunks, prefill):
+    """Chunks with the prefill text in front"""
+    if prefill:
+        yield prefill
+    yield from chunks
@@ -0,0 +1,87 @@
+"""
+Token budgeting for GenAI Pipeline
+Local token estimates, prompt truncation and max_tokens sizing
+"""
+
+import math
+import os
+import re
+
+# English prose averages about four characters per token
+CHARS_PER_TOKEN = 4
+
+# Words, digit runs and individual symbols (CJK characters count one each)
+TOKEN_PIECES = re.compile(r"[A-Za-z]+|\d+|\S")
+
+# ASCII symbols that usually become tokens of their own
+PUNCTUATION = '.,;:!?()[]{}<>"\'`=+-*/\\|&^%$#@~_'
+
+# Marker left where the middle of an oversized prompt was removed
+TRUNCATION_MARKER = '\n\n[...]\n\n'
+
+# Output size per request class; input_ratio scales output with the input length
+REQUEST_CLASSES = {
+    'classify': {'max_tokens': 16},
+    'extract': {'max_tokens': 512},
+    'summarize': {'max_tokens': 1024, 'input_ratio': 0.25},
+    'chat': {},
+    'generate': {'max_tokens': 4096}
+}
+
+# Smallest max_tokens worth sending
+MIN_OUTPUT_TOKENS = 16
+
+# Histogram buckets for token counts
+TOKEN_BUCKETS = (100, 500, 1000, 2000, 4000, 8000, 16000, 32000, 64000, 128000)
+
+def overflow_policy(data):
+    """How to handle oversized prompts: 'truncate' or 'reject'"""
+    return data.get('overflow') or os.environ.get('TOKEN_OVERFLOW_POLICY', 'truncate').lower()
+
+def estimate_tokens(text):
+    """Fast, slightly pessimistic token count without a tokenizer
+
+    Takes the larger of a piece count and a character-based estimate, so
+    both symbol-dense text (code, JSON, CJK) and long words are covered.
+    """
+    if not text:
+        return 0
+    if text.isascii():
+        # Same count as TOKEN_PIECES for most text, without building a match list
+        pieces = len(text.split()) + sum(map(text.count, PUNCTUATION))
+    else:
+        pieces = len(TOKEN_PIECES.findall(text))
+    return max(pieces, math.ceil(len(text) / CHARS_PER_TOKEN))
+
+def estimate_request_tokens(data):
+    """Estimated input tokens for the prompt, system prompt and earlier turns"""
+    system = data.get('system') or ''
+    if not isinstance(system, str):
+        system = ''.join(block.get('text', '') for block in system)
+    history = sum(estimate_tokens(message['content']) for message in data.get('messages', []))
+    return estimate_tokens(data.get('prompt', '')) + estimate_tokens(system) + history
+
+def size_max_tokens(model_config, request_class, input_tokens):
+    """max_tokens for a request class, within the model's output limit"""
+    settings = REQUEST_CLASSES.get(request_class or 'chat', REQUEST_CLASSES['chat'])
+    max_tokens = settings.get('max_tokens', model_config['max_tokens'])
+    if 'input_ratio' in settings:
+        max_tokens = min(max_tokens, max(int(input_tokens * settings['input_ratio']), MIN_OUTPUT_TOKENS))
+    return min(max_tokens, model_config.get('max_output_tokens', max_tokens))
+
+def truncate_text(text, max_tokens):
+    """Keep the start and end of text within roughly max_tokens
+
+    Instructions tend to sit at the start of a prompt and the question at
+    the end, so the middle is removed.
+    """
+    original = text
+    # Token density is uneven, so shrink again if the first cut was not enough
+    for _ in range(3):
+        tokens = estimate_tokens(text)
+        if tokens <= max_tokens:
+            return text
+        keep = max(int(len(text) * max_tokens / tokens * 0.95) - len(TRUNCATION_MARKER), 0)
+        head = keep // 2
+        text = original[:head] + TRUNCATION_MARKER + original[len(original) - (keep - head):]
+    return text
@@ -0,0 +1,379 @@
+"""
+Vector index for GenAI Pipeline
+In-process nearest-neighbour search over a memory-mapped passage corpus, for retrieval-augmented prompts
+"""
+
+import json
+import os
+import shutil
+import threading
+import time
+
+import numpy as np
+
+try:
+    from . import embeddings
+    from .metrics import increment, observe
+    from .token_budget import estimate_tokens
+except ImportError:
+    import embeddings
+    from metrics import increment, observe
+    from token_budget import estimate_tokens
+
+# Snapshot directory loaded on first retrieval
+VECTOR_INDEX_PATH = os.environ.get('VECTOR_INDEX_PATH')
+
+# Passages retrieved per prompt and the token budget they may use
+RETRIEVAL_TOP_K = int(os.environ.get('RETRIEVAL_TOP_K', '4'))
+RETRIEVAL_MAX_TOKENS = int(os.environ.get('RETRIEVAL_MAX_TOKENS', '2000'))
+
+# Inverted lists scanned per query once the index is trained; more is slower and more exact
+VECTOR_NPROBE = int(os.environ.get('VECTOR_NPROBE', '16'))
+
+# Rows scored per matrix product in brute-force scans; bounds the score matrix
+SEARCH_BLOCK_ROWS = 65536
+
+# Vectors sampled to train the inverted-list centroids
+TRAIN_SAMPLE_ROWS = 65536
+
+METRICS = ('cosine', 'ip')
+
+CONTEXT_TEMPLATE = "Use the following context to answer.\n\n{context}\n\nQuestion: {prompt}"
+
+def _merge_top_k(scores, ids, new_scores, new_ids, k):
+    """Best k (score, id) pairs per query from two candidate sets"""
+    scores = np.concatenate([scores, new_scores], axis=1)
+    ids = np.concatenate([ids, new_ids], axis=1)
+    if scores.shape[1] > k:
+        keep = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        scores = np.take_along_axis(scores, keep, axis=1)
+        ids = np.take_along_axis(ids, keep, axis=1)
+    return scores, ids
+
+class VectorIndex:
+    """Float32 vectors and their passages, searched by inner product
+
+    Snapshot vectors are memory-mapped read-only, so loading is instant and
+    pages are shared between processes. add() appends to an in-memory tail
+    that is always scanned exhaustively; save() folds it into the next
+    snapshot. After train(), snapshot vectors are grouped into inverted
+    lists by nearest centroid and a query scans only the nprobe nearest
+    lists (IVF), each a contiguous slice of the file.
+
+    compact() and train() build new arrays and swap them in under lock, so
+    searches always see one consistent snapshot.
+    """
+
+    def __init__(self, dimensions, metric='cosine', embedding_model=None):
+        if metric not in METRICS:
+            raise ValueError(f"Unsupported metric: {metric}")
+        self.dimensions = int(dimensions)
+        self.metric = metric
+        self.embedding_model = embedding_model
+        self.nprobe = VECTOR_NPROBE
+        # Snapshot: vectors in list order, their ids, and passages by id
+        self.vectors = np.empty((0, self.dimensions), dtype=np.float32)
+        self.ids = np.empty(0, dtype=np.int64)
+        self.passages = np.empty(0, dtype=np.uint8)
+        self.passage_offsets = np.zeros(1, dtype=np.int64)
+        # Inverted lists: list i is vectors[list_offsets[i]:list_offsets[i + 1]]
+        self.centroids = None
+        self.list_offsets = None
+        # Inserts since the snapshot
+        self.tail = np.empty((1024, self.dimensions), dtype=np.float32)
+        self.tail_size = 0
+        self.tail_texts = []
+        self.lock = threading.Lock()
+        # Serializes compact() and train(), which rebuild outside lock
+        self.rebuild_lock = threading.RLock()
+
+    def __len__(self):
+        return len(self.vectors) + self.tail_size
+
+    @property
+    def nlist(self):
+        return 0 if self.centroids is None else len(self.centroids)
+
+    def _prepare(self, vectors):
+        """(rows, dimensions) float32 copy, L2-normalized for cosine"""
+        vectors = np.array(vectors, dtype=np.float32, ndmin=2)
+        if vectors.shape[1] != self.dimensions:
+            raise ValueError(f"Expected {self.dimensions}-dimensional vectors, got {vectors.shape[1]}")
+        if self.metric == 'cosine':
+            norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+            np.divide(vectors, norms, out=vectors, where=norms > 0)
+        return vectors
+
+    def add(self, vectors, texts):
+        """Insert vectors with their passages; returns the new ids"""
+        vectors = self._prepare(vectors)
+        if len(vectors) != len(texts):
+            raise ValueError("vectors and texts must have the same length")
+        with self.lock:
+            needed = self.tail_size + len(vectors)
+            if needed > len(self.tail):
+                grown = np.empty((max(needed, len(self.tail) * 2), self.dimensions), dtype=np.float32)
+                grown[:self.tail_size] = self.tail[:self.tail_size]
+                self.tail = grown
+            self.tail[self.tail_size:needed] = vectors
+            self.tail_texts.extend(texts)
+            first = len(self.vectors) + self.tail_size
+            self.tail_size = needed
+        return np.arange(first, first + len(vectors))
+
+    def passage(self, passage_id):
+        """Text stored with a vector id"""
+        passage_id = int(passage_id)
+        with self.lock:
+            count, passages, offsets, tail_texts = len(self.vectors), self.passages, self.passage_offsets, self.tail_texts
+        if passage_id < count:
+            start, end = offsets[passage_id], offsets[passage_id + 1]
+            return passages[start:end].tobytes().decode('utf-8')
+        return tail_texts[passage_id - count]
+
+    def _scan(self, queries, vectors, ids, k, best):
+        """Score a contiguous block of vectors in SEARCH_BLOCK_ROWS pieces and merge into best"""
+        for start in range(0, len(vectors), SEARCH_BLOCK_ROWS):
+            block = vectors[start:start + SEARCH_BLOCK_ROWS]
+            scores = queries @ block.T
+            block_ids = ids[start:start + SEARCH_BLOCK_ROWS]
+            if scores.shape[1] > k:
+                keep = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+                best = _merge_top_k(*best, np.take_along_axis(scores, keep, axis=1), block_ids[keep], k)
+            else:
+                best = _merge_top_k(*best, scores, np.broadcast_to(block_ids, scores.shape), k)
+        return best
+
+    def search(self, queries, k=10, nprobe=None, exact=False):
+        """Top-k ids and scores per query, best first
+
+        Queries are one vector or a (rows, dimensions) batch. Trained
+        indexes scan nprobe lists per query unless exact is set. Ids of
+        missing results (fewer than k vectors) are -1.
+        """
+        start = time.perf_counter()
+        queries = self._prepare(queries)
+        empty = (np.full((len(queries), 0), -np.inf, dtype=np.float32), np.empty((len(queries), 0), dtype=np.int64))
+        with self.lock:
+            vectors, vector_ids, centroids, list_offsets = self.vectors, self.ids, self.centroids, self.list_offsets
+            tail, tail_size = self.tail, self.tail_size
+
+        if centroids is None or exact:
+            scores, ids = self._scan(queries, vectors, vector_ids, k, empty)
+        else:
+            nprobe = min(nprobe or self.nprobe, len(centroids))
+            probes = np.argpartition(-(queries @ centroids.T), nprobe - 1, axis=1)[:, :nprobe]
+            results = []
+            for query, lists in zip(queries, probes):
+                best = (empty[0][:1], empty[1][:1])
+                for list_id in lists:
+                    start_row, end_row = list_offsets[list_id], list_offsets[list_id + 1]
+                    best = self._scan(query[None], vectors[start_row:end_row], vector_ids[start_row:end_row], k, best)
+                results.append(best)
+            scores = np.concatenate([result[0] for result in results])
+            ids = np.concatenate([result[1] for result in results])
+
+        if tail_size:
+            tail_ids = np.arange(len(vectors), len(vectors) + tail_size)
+            scores, ids = self._scan(queries, tail[:tail_size], tail_ids, k, (scores, ids))
+
+        order = np.argsort(-scores, axis=1, kind='stable')
+        scores = np.take_along_axis(scores, order, axis=1)
+        ids = np.take_along_axis(ids, order, axis=1)
+        if scores.shape[1] < k:
+            missing = k - scores.shape[1]
+            scores = np.pad(scores, ((0, 0), (0, missing)), constant_values=-np.inf)
+            ids = np.pad(ids, ((0, 0), (0, missing)), constant_values=-1)
+        observe('vector_search_ms', (time.perf_counter() - start) * 1000, mode='ivf' if centroids is not None and not exact else 'flat')
+        return ids, scores
+
+    def _assign(self, vectors, centroids):
+        """Nearest centroid of each vector"""
+        assignments = np.empty(len(vectors), dtype=np.int64)
+        for start in range(0, len(vectors), SEARCH_BLOCK_ROWS):
+            assignments[start:start + SEARCH_BLOCK_ROWS] = np.argmax(
+                vectors[start:start + SEARCH_BLOCK_ROWS] @ centroids.T, axis=1
+            )
+        return assignments
+
+    def _group(self, vectors, centroids):
+        """Vectors in inverted-list order: (vectors, ids, list_offsets)"""
+        assignments = self._assign(vectors, centroids)
+        order = np.argsort(assignments, kind='stable')
+        list_offsets = np.searchsorted(assignments[order], np.arange(len(centroids) + 1)).astype(np.int64)
+        return vectors[order], order.astype(np.int64), list_offsets
+
+    def train(self, nlist=None, iterations=10, seed=0):
+        """Cluster all vectors into nlist inverted lists (k-means on unit vectors)
+
+        nlist defaults to 4 * sqrt(n). Pending inserts are folded into the
+        snapshot arrays in memory.
+        """
+        with self.rebuild_lock:
+            self.compact()
+            with self.lock:
+                count = len(self.vectors)
+                vectors = np.empty((count, self.dimensions), dtype=np.float32)
+                vectors[self.ids] = self.vectors
+            nlist = min(int(nlist or 4 * np.sqrt(count)), count)
+            if nlist < 1:
+                raise ValueError("Cannot train an empty index")
+            rng = np.random.default_rng(seed)
+            sample = vectors[rng.choice(count, min(count, max(TRAIN_SAMPLE_ROWS, nlist * 32)), replace=False)]
+
+            centroids = sample[rng.choice(len(sample), nlist, replace=False)].copy()
+            for _ in range(iterations):
+                assignments = self._assign(sample, centroids)
+                sums = np.zeros_like(centroids)
+                np.add.at(sums, assignments, sample)
+                counts = np.bincount(assignments, minlength=nlist)
+                # Empty clusters restart at a random sample
+                empty = counts == 0
+                sums[empty] = sample[rng.choice(len(sample), int(empty.sum()))]
+                norms = np.linalg.norm(sums, axis=1, keepdims=True)
+                centroids = sums / np.maximum(norms, 1e-12)
+
+            grouped, ids, list_offsets = self._group(vectors, centroids)
+            with self.lock:
+                self.vectors, self.ids, self.centroids, self.list_offsets = grouped, ids, centroids, list_offsets
+        return self
+
+    def compact(self):
+        """Fold inserted vectors into the snapshot arrays (in memory)"""
+        with self.rebuild_lock:
+            with self.lock:
+                folded = self.tail_size
+                if not folded:
+                    return
+                count = len(self.vectors)
+                vectors = np.empty((count + folded, self.dimensions), dtype=np.float32)
+                vectors[self.ids] = self.vectors
+                vectors[count:] = self.tail[:folded]
+                texts = self.tail_texts[:folded]
+                passages, passage_offsets, centroids = self.passages, self.passage_offsets, self.centroids
+
+            encoded = [text.encode('utf-8') for text in texts]
+            lengths = np.fromiter((len(data) for data in encoded), dtype=np.int64, count=len(encoded))
+            passages = np.concatenate([np.asarray(passages), np.frombuffer(b''.join(encoded), dtype=np.uint8)])
+            passage_offsets = np.concatenate([passage_offsets, passage_offsets[-1] + np.cumsum(lengths)])
+            if centroids is not None:
+                vectors, ids, list_offsets = self._group(vectors, centroids)
+            else:
+                ids, list_offsets = np.arange(len(vectors), dtype=np.int64), None
+
+            with self.lock:
+                # Rows added while rebuilding stay in a fresh tail, their ids unchanged
+                tail = np.empty((max(1024, self.tail_size - folded), self.dimensions), dtype=np.float32)
+                tail[:self.tail_size - folded] = self.tail[folded:self.tail_size]
+                self.vectors, self.ids, self.list_offsets = vectors, ids, list_offsets
+                self.passages, self.passage_offsets = passages, passage_offsets
+                self.tail, self.tail_size, self.tail_texts = tail, self.tail_size - folded, self.tail_texts[folded:]
+
+    def save(self, path):
+        """Write a snapshot directory, replacing any existing one atomically"""
+        with self.rebuild_lock:
+            self.compact()
+            with self.lock:
+                vectors, ids, centroids, list_offsets = self.vectors, self.ids, self.centroids, self.list_offsets
+                passages, passage_offsets = self.passages, self.passage_offsets
+        staging = f'{path}.tmp'
+        shutil.rmtree(staging, ignore_errors=True)
+        os.makedirs(staging)
+        np.save(os.path.join(staging, 'vectors.npy'), vectors)
+        np.save(os.path.join(staging, 'ids.npy'), ids)
+        np.save(os.path.join(staging, 'passage_offsets.npy'), passage_offsets)
+        np.asarray(passages).tofile(os.path.join(staging, 'passages.bin'))
+        if centroids is not None:
+            np.save(os.path.join(staging, 'centroids.npy'), centroids)
+            np.save(os.path.join(staging, 'list_offsets.npy'), list_offsets)
+        with open(os.path.join(staging, 'meta.json'), 'w') as f:
+            json.dump({
+                'dimensions': self.dimensions,
+                'metric': self.metric,
+                'embedding_model': self.embedding_model,
+                'count': len(vectors),
+                'nlist': 0 if centroids is None else len(centroids)
+            }, f)
+
+        # Open memory maps keep reading the replaced files until they are dropped
+        previous = f'{path}.old'
+        shutil.rmtree(previous, ignore_errors=True)
+        if os.path.exists(path):
+            os.rename(path, previous)
+        os.rename(staging, path)
+        shutil.rmtree(previous, ignore_errors=True)
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        """Open a snapshot directory; vectors and passages are memory-mapped unless mmap is False"""
+        with open(os.path.join(path, 'meta.json')) as f:
+            meta = json.load(f)
+        mode = 'r' if mmap else None
+        index = cls(meta['dimensions'], meta['metric'], meta.get('embedding_model'))
+        index.vectors = np.load(os.path.join(path, 'vectors.npy'), mmap_mode=mode)
+        index.ids = np.load(os.path.join(path, 'ids.npy'))
+        index.passage_offsets = np.load(os.path.join(path, 'passage_offsets.npy'))
+        passages = os.path.join(path, 'passages.bin')
+        if mmap and os.path.getsize(passages):
+            index.passages = np.memmap(passages, dtype=np.uint8, mode='r')
+        else:
+            index.passages = np.fromfile(passages, dtype=np.uint8)
+        if meta.get('nlist'):
+            index.centroids = np.load(os.path.join(path, 'centroids.npy'))
+            index.list_offsets = np.load(os.path.join(path, 'list_offsets.npy'))
+        return index
+
+_index = None
+_index_lock = threading.Lock()
+
+def get_vector_index():
+    """Snapshot at VECTOR_INDEX_PATH, loaded once per process; None when not configured"""
+    global _index
+    if _index is None and VECTOR_INDEX_PATH:
+        with _index_lock:
+            if _index is None:
+                _index = VectorIndex.load(VECTOR_INDEX_PATH)
+    return _index
+
+def retrieve(prompt, k=None, index=None):
+    """Nearest passages to a prompt as [{'id', 'score', 'text'}], best first"""
+    index = index or get_vector_index()
+    vectors, _ = embeddings.embed_texts([prompt], index.embedding_model, index.dimensions, input_type='search_query')
+    ids, scores = index.search(vectors, k or RETRIEVAL_TOP_K)
+    return [
+        {'id': int(passage_id), 'score': float(score), 'text': index.passage(passage_id)}
+        for passage_id, score in zip(ids[0], scores[0]) if passage_id >= 0
+    ]
+
+def augment_prompt(data, index=None):
+    """Prepend retrieved passages to the prompt when data['retrieve'] is set
+
+    retrieve is True or a passage count. Passages are added best first
+    until RETRIEVAL_MAX_TOKENS is reached; their ids are returned in
+    'retrieved'. The system prompt is left alone so it stays cacheable.
+    """
+    retrieve_option = data.get('retrieve')
+    if not retrieve_option:
+        return data
+    index = index or get_vector_index()
+    if index is None:
+        raise ValueError("ValidationException: retrieval requested but VECTOR_INDEX_PATH is not set")
+
+    start = time.perf_counter()
+    k = RETRIEVAL_TOP_K if retrieve_option is True else int(retrieve_option)
+    passages, used = [], 0
+    for passage in retrieve(data['prompt'], k, index):
+        tokens = estimate_tokens(passage['text'])
+        if used + tokens > RETRIEVAL_MAX_TOKENS:
+            break
+        passages.append(passage)
+        used += tokens
+    observe('retrieval_ms', (time.perf_counter() - start) * 1000)
+    increment('retrieval_passages', len(passages))
+
+    context = '\n\n'.join(f"[{number}] {passage['text']}" for number, passage in enumerate(passages, 1))
+    return {
+        **data,
+        'prompt': CONTEXT_TEMPLATE.format(context=context, prompt=data['prompt']) if passages else data['prompt'],
+        'retrieved': [passage['id'] for passage in passages]
+    }
@@ -5,6 +5,7 @@ Easy-to-use Streamlit web interface for testing the GenAI Pipeline
 """
 
 import streamlit as st
+import pandas as pd
 import requests
 import time
 import json
@@ -132,6 +133,9 @@ def main():
             display_results()
         else:
             st.info("Click 'Run Complete Test Suite' to start testing")
+    
+    st.markdown("---")
+    display_timeseries()
 
 def run_complete_test():
     """Run all tests"""
@@ -199,5 +203,46 @@ def display_results():
             else:
                 st.error(f"Error: {result['error']}")
 
+def load_timeseries(uploaded_file):
+    """Load a time series exported by performance_test.py or stress_test.py"""
+    if uploaded_file.name.endswith('.json'):
+        return pd.DataFrame(json.load(uploaded_file)['windows'])
+    return pd.read_csv(uploaded_file)
+
+def display_timeseries():
+    """Chart per-second throughput, errors and latency from a load test"""
+    st.header("📈 Load Test Timeline")
+    
+    uploaded_file = st.file_uploader(
+        "Upload a time series file (*_timeseries.csv or .json)",
+        type=['csv', 'json']
+    )
+    if uploaded_file is None:
+        st.caption("Run scripts/performance_test.py or scripts/stress_test.py to produce a time series")
+        return
+    
+    df = load_timeseries(uploaded_file).set_index('second')
+    
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.metric("Peak RPS", f"{df['requests_per_second'].max():.1f}")
+    with col2:
+        st.metric("Peak p99", f"{df['p99_response_time'].max():.2f}s")
+    with col3:
+        st.metric("Peak Error Rate", f"{df['error_rate'].max():.1f}%")
+    
+    st.subheader("Throughput (requests/second)")
+    st.line_chart(df[['requests_per_second']])
+    
+    st.subheader("Latency percentiles (seconds)")
+    st.line_chart(df[['p50_response_time', 'p95_response_time', 'p99_response_time']])
+    
+    st.subheader("Error rate (%)")
+    st.line_chart(df[['error_rate']])
+    
+    if df['active_users'].notna().any():
+        st.subheader("Active users")
+        st.line_chart(df[['active_users']])
+
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,38 @@
+#!/usr/bin/env python3
+"""
+Shared test fixtures
+"""
+
+import json
+import os
+import sys
+from unittest.mock import Mock
+
+import numpy as np
+import pytest
+
+# Add project root to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from src import multi_model
+
+@pytest.fixture
+def fake_bedrock(monkeypatch):
+    """Bedrock stand-in that embeds each text as a deterministic 8-dimensional vector"""
+    def vector(text):
+        return np.random.default_rng(len(text)).normal(size=8).tolist()
+
+    def invoke_model(modelId, body, **kwargs):
+        request = json.loads(body)
+        if 'texts' in request:
+            payload = {'embeddings': {'float': [vector(text) for text in request['texts']]}}
+        else:
+            payload = {'embedding': vector(request['inputText']), 'inputTextTokenCount': 3}
+        response = Mock()
+        response.get.return_value.read.return_value = json.dumps(payload)
+        return response
+
+    bedrock = Mock()
+    bedrock.invoke_model.side_effect = invoke_model
+    monkeypatch.setattr(multi_model, '_bedrock_client', bedrock)
+    return bedrock
@@ -74,6 +74,29 @@ def test_lambda_handler_structure(mock_boto_client):
     except Exception as e:
         pytest.skip(f"Lambda handler test failed: {e}")
 
+@patch('boto3.client')
+def test_lambda_handler_reports_cold_start(mock_boto_client):
+    """Test that only the first invocation is reported as a cold start"""
+    import lambda_function
+    
+    mock_bedrock = Mock()
+    mock_bedrock.invoke_model.return_value.get.return_value.read.return_value = json.dumps({
+        'content': [{'text': 'test response'}]
+    }).encode()
+    mock_boto_client.return_value = mock_bedrock
+    
+    lambda_function._cold_start = True
+    event = {'body': json.dumps({'prompt': 'test prompt'})}
+    
+    first = lambda_function.lambda_handler(event, Mock())['headers']
+    second = lambda_function.lambda_handler(event, Mock())['headers']
+    
+    assert first['X-Cold-Start'] == 'true'
+    assert second['X-Cold-Start'] == 'false'
+    assert second['X-Init-Duration-Ms'] == '0.0'
+    assert float(second['X-Server-Time-Ms']) >= float(second['X-Inference-Time-Ms'])
+    assert 'inference;dur=' in second['Server-Timing']
+
 def test_project_structure():
     """Test that project has expected structure"""
     expected_files = [
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Tests for the pluggable cache backends
+"""
+
+import pytest
+import os
+import sys
+import time
+
+# Add project root to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from src import cache_backends
+
+@pytest.fixture(params=['memory', 'sqlite', 'redis', 'dynamodb'])
+def backend(request, tmp_path, monkeypatch):
+    """Create each backend against a local store"""
+    if request.param == 'memory':
+        yield cache_backends.MemoryCacheBackend(max_entries=100)
+    elif request.param == 'sqlite':
+        yield cache_backends.SQLiteCacheBackend(str(tmp_path / 'cache.db'))
+    elif request.param == 'redis':
+        fakeredis = pytest.importorskip('fakeredis')
+        pytest.importorskip('lupa')
+        yield cache_backends.RedisCacheBackend(client=fakeredis.FakeRedis())
+    else:
+        moto = pytest.importorskip('moto')
+        import boto3
+        monkeypatch.setenv('AWS_DEFAULT_REGION', 'us-east-1')
+        monkeypatch.setenv('AWS_ACCESS_KEY_ID', 'testing')
+        monkeypatch.setenv('AWS_SECRET_ACCESS_KEY', 'testing')
+        with moto.mock_aws():
+            boto3.resource('dynamodb').create_table(
+                TableName='TestCache',
+                KeySchema=[{'AttributeName': 'cache_key', 'KeyType': 'HASH'}],
+                AttributeDefinitions=[{'AttributeName': 'cache_key', 'AttributeType': 'S'}],
+                BillingMode='PAY_PER_REQUEST'
+            )
+            yield cache_backends.DynamoDBCacheBackend('TestCache')
+
+def test_backend_get_put_and_batch(backend):
+    """Test the shared get/put/batch interface"""
+    assert backend.get('missing') is None
+    
+    assert backend.put('a', {'result': 'A'}, ttl=60)
+    entry = backend.get('a')
+    assert entry['response'] == {'result': 'A'}
+    assert entry['expires_at'] > time.time()
+    
+    backend.put_many({'b': {'result': 'B'}, 'c': {'result': 'C'}}, ttl=60)
+    found = backend.get_many(['a', 'b', 'c', 'missing'])
+    assert {key: entry['response']['result'] for key, entry in found.items()} == {'a': 'A', 'b': 'B', 'c': 'C'}
+    
+    backend.delete('a')
+    assert backend.get('a') is None
+
+def test_backend_hides_expired_entries(backend):
+    """Test that entries past their TTL are never returned"""
+    backend.put('old', {'result': 'old'}, ttl=-1)
+    assert backend.get('old') is None
+    assert backend.get_many(['old']) == {}
+
+def test_backend_keeps_the_newer_entry(backend, monkeypatch):
+    """Test that a delayed write never replaces a fresher entry"""
+    now = time.time()
+    monkeypatch.setattr(cache_backends.time, 'time', lambda: now + 5)
+    assert backend.put('a', {'result': 'new'}, ttl=60)
+    monkeypatch.setattr(cache_backends.time, 'time', lambda: now)
+    
+    assert not backend.put('a', {'result': 'old'}, ttl=60)
+    assert not backend.put_many({'a': {'result': 'old'}, 'b': {'result': 'B'}}, ttl=60)
+    assert {key: entry['response']['result'] for key, entry in backend.get_many(['a', 'b']).items()} == {'a': 'new', 'b': 'B'}
+
+def test_memory_backend_evicts_least_recently_used():
+    """Test LRU eviction once max_entries is reached"""
+    backend = cache_backends.MemoryCacheBackend(max_entries=2)
+    backend.put('a', {'result': 'A'}, ttl=60)
+    backend.put('b', {'result': 'B'}, ttl=60)
+    backend.get('a')
+    backend.put('c', {'result': 'C'}, ttl=60)
+    
+    assert set(backend.get_many(['a', 'b', 'c'])) == {'a', 'c'}
+
+def test_backend_selected_by_configuration(monkeypatch):
+    """Test that CACHE_BACKEND picks the implementation"""
+    monkeypatch.setenv('CACHE_BACKEND', 'memory')
+    monkeypatch.setattr(cache_backends, '_backend', None)
+    
+    assert isinstance(cache_backends.get_cache_backend(), cache_backends.MemoryCacheBackend)
@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+Tests for the DynamoDB-backed inference cache
+"""
+
+import pytest
+import os
+import sys
+import time
+
+# Add project root to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+moto = pytest.importorskip('moto')
+import boto3
+
+from src import cache_backends, cached_inference, metrics
+
+@pytest.fixture
+def cache_table(monkeypatch):
+    """Create a local stand-in for the cache table"""
+    monkeypatch.setenv('AWS_DEFAULT_REGION', 'us-east-1')
+    monkeypatch.setenv('AWS_ACCESS_KEY_ID', 'testing')
+    monkeypatch.setenv('AWS_SECRET_ACCESS_KEY', 'testing')
+    monkeypatch.setenv('CACHE_TABLE_NAME', 'TestCache')
+    monkeypatch.setenv('CACHE_BACKEND', 'dynamodb')
+    
+    with moto.mock_aws():
+        table = boto3.resource('dynamodb').create_table(
+            TableName='TestCache',
+            KeySchema=[{'AttributeName': 'cache_key', 'KeyType': 'HASH'}],
+            AttributeDefinitions=[{'AttributeName': 'cache_key', 'AttributeType': 'S'}],
+            BillingMode='PAY_PER_REQUEST'
+        )
+        monkeypatch.setattr(cache_backends, '_backend', None)
+        yield table
+
+def test_cache_round_trip_uses_compact_items(cache_table):
+    """Test that responses are stored as compressed binary with epoch TTL"""
+    response = {'inference_complete': True, 'result': 'cached answer ' * 50, 'data': {'prompt': 'hi'}}
+    
+    assert cached_inference.save_to_cache('key-1', response)
+    assert cached_inference.get_from_cache('key-1') == response
+    
+    item = cache_table.get_item(Key={'cache_key': 'key-1'})['Item']
+    assert set(item) == {'cache_key', 'payload', 'fresh_until', 'expires_at', 'created_at'}
+    assert int(item['expires_at']) > time.time()
+    assert len(item['payload'].value) < len(response['result'])
+
+def test_expired_entry_is_a_miss(cache_table):
+    """Test that entries past their TTL are not served before DynamoDB deletes them"""
+    cache_table.put_item(Item={
+        'cache_key': 'key-2',
+        'payload': cache_backends.encode_response({'result': 'old'}),
+        'expires_at': int(time.time()) - 10,
+        'created_at': 0
+    })
+    
+    assert cached_inference.get_from_cache('key-2') is None
+
+def test_conditional_put_keeps_fresher_entry(cache_table):
+    """Test that an older write cannot overwrite a newer cache entry"""
+    future = int((time.time() + 60) * 1000)
+    cache_table.put_item(Item={
+        'cache_key': 'key-3',
+        'payload': cache_backends.encode_response({'result': 'fresh'}),
+        'expires_at': int(time.time()) + 3600,
+        'created_at': future
+    })
+    
+    assert not cached_inference.save_to_cache('key-3', {'result': 'stale'})
+    assert cached_inference.get_from_cache('key-3') == {'result': 'fresh'}
+
+def test_batch_inference_reads_in_bulk_and_writes_behind(cache_table, monkeypatch):
+    """Test that a batch only calls the model for misses and caches them via write-behind"""
+    monkeypatch.setenv('CACHE_WRITE_BEHIND', 'true')
+    calls = []
+    
+    def fake_inference(data):
+        calls.append(data['prompt'])
+        return {'inference_complete': True, 'result': data['prompt'].upper()}
+    
+    cached_inference.save_to_cache(cached_inference.get_cache_key('prompt-0'), {'inference_complete': True, 'result': 'HIT'})
+    
+    # More keys than one BatchGetItem call allows, with a duplicate prompt
+    prompts = [f'prompt-{i}' for i in range(150)] + ['prompt-1']
+    results = cached_inference.run_cached_inference([{'prompt': p} for p in prompts], fake_inference)
+    
+    assert results[0]['result'] == 'HIT'
+    assert results[-1]['result'] == 'PROMPT-1'
+    assert len(calls) == 149
+    
+    cached_inference.flush_cache_writes()
+    keys = [cached_inference.get_cache_key(p) for p in prompts]
+    assert len(cached_inference.get_many_from_cache(keys)) == 150
+
+@pytest.fixture
+def memory_cache(monkeypatch):
+    """Use the in-process backend with synchronous writes"""
+    monkeypatch.setenv('CACHE_BACKEND', 'memory')
+    monkeypatch.setenv('CACHE_WRITE_BEHIND', 'false')
+    monkeypatch.setattr(cache_backends, '_backend', None)
+    return cache_backends.get_cache_backend()
+
+def test_stale_entry_is_served_while_refreshing(memory_cache):
+    """Test stale-while-revalidate within the grace window"""
+    cache_key = cached_inference.get_cache_key('swr prompt')
+    memory_cache.put(cache_key, {'inference_complete': True, 'result': 'stale'}, ttl=-1, grace=60)
+    
+    refreshed = []
+    def fake_inference(data):
+        refreshed.append(data['prompt'])
+        return {'inference_complete': True, 'result': 'fresh'}
+    
+    response = cached_inference.run_cached_inference({'prompt': 'swr prompt'}, fake_inference)
+    assert response['result'] == 'stale'
+    
+    # The refresh runs in the background and replaces the stale entry
+    for _ in range(100):
+        if not cached_inference._refreshing:
+            break
+        time.sleep(0.01)
+    assert refreshed == ['swr prompt']
+    assert cached_inference.get_from_cache(cache_key)['result'] == 'fresh'
+
+def test_stale_entry_is_not_refreshed_in_lambda(memory_cache, monkeypatch):
+    """Test that Lambda serves stale entries without a background refresh"""
+    monkeypatch.setenv('AWS_LAMBDA_FUNCTION_NAME', 'genai-inference')
+    cache_key = cached_inference.get_cache_key('lambda prompt')
+    memory_cache.put(cache_key, {'inference_complete': True, 'result': 'stale'}, ttl=-1, grace=60)
+    
+    response = cached_inference.run_cached_inference({'prompt': 'lambda prompt'}, lambda data: pytest.fail('refreshed'))
+    assert response['result'] == 'stale' and not cached_inference._refreshing
+
+def test_deterministic_errors_are_negatively_cached(memory_cache):
+    """Test that validation failures are cached briefly and transient ones are not"""
+    calls = []
+    def failing_inference(data):
+        calls.append(data['prompt'])
+        error = 'ValidationException: prompt too long' if data['prompt'] == 'bad' else 'ThrottlingException'
+        return {'inference_complete': False, 'error': error}
+    
+    for _ in range(3):
+        cached_inference.run_cached_inference({'prompt': 'bad'}, failing_inference)
+        cached_inference.run_cached_inference({'prompt': 'busy'}, failing_inference)
+    
+    assert calls.count('bad') == 1
+    assert calls.count('busy') == 3
+
+def test_cache_policy_is_per_model(monkeypatch):
+    """Test that MODELS entries override the default cache policy"""
+    monkeypatch.setitem(cached_inference.MODELS['claude-haiku'], 'stale_grace', 5)
+    
+    assert cached_inference.get_cache_policy('claude-haiku')['stale_grace'] == 5
+    assert cached_inference.get_cache_policy('unknown')['stale_grace'] == cached_inference.CACHE_STALE_GRACE
+    assert cached_inference.get_cache_key('p', 'claude-haiku') != cached_inference.get_cache_key('p', 'claude-opus')
+
+def test_cache_metrics_per_tier(memory_cache, monkeypatch):
+    """Test hit/miss counters, lookup latency and EMF output"""
+    monkeypatch.setattr(metrics, 'registry', metrics.MetricsRegistry())
+    inference = lambda data: {'inference_complete': True, 'result': 'ok'}
+    
+    cached_inference.run_cached_inference({'prompt': 'metrics prompt'}, inference)
+    cached_inference.run_cached_inference({'prompt': 'metrics prompt'}, inference)
+    
+    counters = {
+        (c['name'], c['labels'].get('result')): c['value']
+        for c in metrics.registry.snapshot()['counters']
+    }
+    assert counters[('cache_requests', 'miss')] == 1
+    assert counters[('cache_requests', 'hit')] == 1
+    assert 'genai_cache_lookup_ms_count{tier="memory"} 2' in metrics.registry.render_prometheus()
+    
+    documents = metrics.registry.emf_documents('Test')
+    lookup = next(d for d in documents if 'cache_lookup_ms' in d)
+    assert lookup['tier'] == 'memory' and len(lookup['cache_lookup_ms']) == 2
+    assert metrics.registry.emf_documents('Test') == []
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Tests for the chunked preprocessing engine
+"""
+
+import gzip
+import json
+import os
+import sys
+
+import boto3
+import pytest
+
+# Add project root to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from src import data_processing, s3_io
+
+def test_batches_are_templated_cleaned_and_chunked(tmp_path):
+    """Test templating, whitespace cleanup, empty-row dropping and chunk sizes"""
+    path = tmp_path / 'input.csv'
+    path.write_text('id,topic,text\n1,cloud,"  spans\n two   lines "\n2,edge,\n3,arm,fast\n4,x,y\n5,a,b\n')
+
+    batches = list(data_processing.iter_prompt_batches(str(path), 'About {topic}: {text}', chunk_rows=2))
+
+    assert [len(batch) for batch in batches] == [2, 2, 1]
+    assert batches[0].to_dict('records') == [
+        {'row_id': 0, 'prompt': 'About cloud: spans two lines'},
+        {'row_id': 1, 'prompt': 'About edge:'}
+    ]
+    assert data_processing.batch_to_payloads(batches[1])[0] == {'prompt': 'About arm: fast', 'row_id': 2}
+
+def test_preprocess_jsonl_to_output(tmp_path):
+    """Test the default prompt column, JSONL input and output, and reported stats"""
+    path = tmp_path / 'input.jsonl'
+    path.write_text('{"prompt": "first"}\n{"prompt": null}\n{"prompt": "third"}\n')
+    output = tmp_path / 'prompts.jsonl'
+
+    result = data_processing.preprocess_data(str(path), output_path=str(output))
+
+    assert result['rows'] == 2
+    assert result['rows_per_sec'] > 0 and result['peak_rss_mb'] > 0
+    assert [json.loads(line) for line in output.read_text().splitlines()] == [
+        {'row_id': 0, 'prompt': 'first'},
+        {'row_id': 2, 'prompt': 'third'}
+    ]
+
+def test_parallel_matches_serial_order(tmp_path):
+    """Test that byte-range shards merge back in input order with global row ids"""
+    path = tmp_path / 'input.csv'
+    rows = ''.join(f"{i},topic {i % 7},{'text' if i % 5 else ''} {i}\n" for i in range(2000))
+    path.write_text('id,topic,text\n' + rows)
+
+    header, ranges = data_processing.plan_shards(str(path), 7, skip_header=True)
+    assert header == b'id,topic,text\n'
+    assert ranges[0][0] == len(header) and ranges[-1][1] == path.stat().st_size
+    sizes = [end - start for start, end in ranges]
+    assert len(sizes) == 7 and max(sizes) - min(sizes) < 100
+
+    def records(batches):
+        return [record for batch in batches for record in batch.to_dict('records')]
+    serial = list(data_processing.iter_prompt_batches(str(path), '{topic}: {text}'))
+    parallel = list(data_processing.iter_prompt_batches_parallel(str(path), '{topic}: {text}', workers=2))
+    assert records(parallel) == records(serial)
+
+    # A quoted field spanning lines that a shard boundary cuts falls back
+    # to reading the rest of the file serially
+    path.write_text('id,topic,text\n' + rows + '2000,"multi\nline",x\n' + rows, encoding='utf-8')
+    header, ranges = data_processing.plan_shards(str(path), 8, skip_header=True)
+    assert ranges[3][1] - len(header) - len(rows) in range(1, 16)
+    serial = list(data_processing.iter_prompt_batches(str(path), '{topic}: {text}'))
+    parallel = list(data_processing.iter_prompt_batches_parallel(str(path), '{topic}: {text}', workers=2))
+    assert records(parallel) == records(serial) and len(records(serial)) == 4001
+
+def test_s3_ranged_input_and_multipart_output(monkeypatch):
+    """Test streaming an S3 object through ranged reads into a multipart upload"""
+    moto = pytest.importorskip('moto')
+    monkeypatch.setenv('AWS_DEFAULT_REGION', 'us-east-1')
+    monkeypatch.setenv('AWS_ACCESS_KEY_ID', 'testing')
+    monkeypatch.setenv('AWS_SECRET_ACCESS_KEY', 'testing')
+
+    with moto.mock_aws():
+        client = boto3.client('s3')
+        monkeypatch.setattr(s3_io, '_s3_client', client)
+        client.create_bucket(Bucket='data')
+        rows = ''.join(f"{i},topic {i % 7},{'x' * 100} {i}\n" for i in range(60000))
+        client.put_object(Bucket='data', Key='in/notes.csv.gz', Body=gzip.compress(('id,topic,text\n' + rows).encode()))
+
+        # Small ranges so the gzip stream spans many parallel GETs
+        monkeypatch.setattr(s3_io, 'S3_READ_PART_MB', 0.125)
+        monkeypatch.setattr(s3_io, 'S3_WRITE_PART_MB', 5)
+        event = {'Records': [{'s3': {'bucket': {'name': 'data'}, 'object': {'key': 'in/notes.csv.gz'}}}]}
+        response = data_processing.lambda_handler(event, None)
+        assert response['statusCode'] == 200, response['body']
+        assert json.loads(response['body'])['output'] == 's3://data/processed/notes.jsonl'
+
+        # Over 5 MB of prompts, so the output went up in more than one part
+        output = client.get_object(Bucket='data', Key='processed/notes.jsonl')
+        assert output['ContentLength'] > s3_io.MIN_PART_BYTES and '-' in output['ETag']
+        lines = output['Body'].read().decode().splitlines()
+        assert len(lines) == 60000
+        assert json.loads(lines[-1]) == {'row_id': 59999, 'prompt': f"{'x' * 100} 59999"}
+
+        # A failed write leaves no partial object behind
+        writer = s3_io.S3MultipartWriter('data', 'partial.jsonl')
+        writer.write(b'x' * (s3_io.MIN_PART_BYTES + 1))
+        writer.abort()
+        assert client.list_multipart_uploads(Bucket='data').get('Uploads', []) == []
+        assert 'Contents' not in client.list_objects_v2(Bucket='data', Prefix='partial')
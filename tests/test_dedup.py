@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+Tests for prompt deduplication
+"""
+
+import os
+import sys
+
+import numpy as np
+
+# Add project root to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from src import dedup
+
+def test_hash_index_grows_and_keeps_first_value():
+    """Test repeated keys within and across calls, collisions and resizing"""
+    index = dedup.HashIndex(capacity=4)
+    # 5, 13 and 21 share a slot in a table of 8
+    keys = np.array([5, 13, 5, 21, 13], dtype=np.uint64)
+    assert index.lookup_or_insert(keys, [0, 1, 2, 3, 4]).tolist() == [0, 1, 0, 3, 1]
+
+    rng = np.random.default_rng(0)
+    more = rng.integers(1, 1 << 63, 10000, dtype=np.uint64)
+    assert (index.lookup_or_insert(more, np.arange(10, 10010)) == np.arange(10, 10010)).all()
+    assert index.lookup_or_insert(np.array([21, more[5]], dtype=np.uint64), [-1, -1]).tolist() == [3, 15]
+    assert index.size == 10003 and len(index.keys) >= 2 * index.size
+
+def test_plan_maps_exact_and_near_duplicates_to_first_row():
+    """Test canonical rows, followers and near-duplicate chains across batches"""
+    base = 'summarize the quarterly revenue report for the customer and list the main risks to the deployment schedule'
+    edited = base.replace('main', 'key')
+    prompts = [base, 'explain arm64 processors', base, edited, 'write a python function that parses json logs', edited]
+
+    exact = dedup.DedupPlan()
+    exact.add([0, 1, 2], prompts[:3])
+    exact.add([3, 4, 5], prompts[3:])
+    assert exact.canonical[:6].tolist() == [0, 1, 0, 3, 4, 3]
+    assert exact.followers(0).tolist() == [2] and exact.followers(1).tolist() == []
+
+    near = dedup.DedupPlan(near_duplicates=True)
+    near.add([0, 1, 2], prompts[:3])
+    near.add([3, 4, 5], prompts[3:])
+    assert near.canonical[:6].tolist() == [0, 1, 0, 0, 4, 0]
+    assert near.followers(0).tolist() == [2, 3, 5]
+    stats = near.stats()
+    assert (stats['unique'], stats['exact_duplicates'], stats['near_duplicates']) == (3, 2, 1)
+    assert stats['calls_saved'] == 0.5
+    assert near.prompt_hash(2) is None and near.prompt_hash(5) == near.prompt_hash(3) == dedup.prompt_hash(edited)
+
+    # A batch holding only an exact repeat of an earlier near duplicate
+    chained = dedup.DedupPlan(near_duplicates=True)
+    chained.add([0, 1], [base, edited])
+    chained.add([2], [edited])
+    assert chained.canonical[:3].tolist() == [0, 0, 0]
+    assert chained.followers(0).tolist() == [1, 2]
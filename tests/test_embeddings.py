@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""
+Tests for the embeddings module
+"""
+
+import json
+import os
+import sys
+
+import numpy as np
+
+# Add project root to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from src import embeddings
+
+def test_cohere_batches_and_duplicate_texts(fake_bedrock):
+    """Test that texts are sent in provider-sized batches, each distinct text once"""
+    texts = [f'text {"x" * (i % 150)}' for i in range(300)]
+
+    vectors, _ = embeddings.embed_texts(texts, 'cohere-embed-english')
+
+    sizes = sorted(len(json.loads(call.kwargs['body'])['texts']) for call in fake_bedrock.invoke_model.call_args_list)
+    assert sizes == [54, 96]
+    assert vectors.shape == (300, 8) and vectors.dtype == np.float32
+    assert np.array_equal(vectors[3], vectors[153])
+
+def test_base64_output_normalized_and_quantized(fake_bedrock):
+    """Test the binary encodings round-trip and match the float vectors"""
+    texts = ['alpha', 'beta gamma', 'delta']
+
+    plain = embeddings.run_embedding({'texts': texts, 'normalize': True})
+    assert plain['inference_complete'] and plain['usage'] == {'input_tokens': 9}
+    vectors = embeddings.decode_array(plain['embeddings'], plain['dtype'], plain['shape'])
+    assert np.allclose(np.linalg.norm(vectors, axis=1), 1.0)
+    assert len(plain['embeddings']) < len(json.dumps(vectors.tolist())) / 2
+
+    int8 = embeddings.run_embedding({'texts': texts, 'normalize': True, 'quantize': 'int8'})
+    codes = embeddings.decode_array(int8['embeddings'], 'int8', int8['shape'])
+    scales = embeddings.decode_array(int8['scales'], 'float32', [3])
+    assert np.abs(codes * scales[:, None] - vectors).max() <= scales.max() / 2 + 1e-6
+
+    binary = embeddings.run_embedding({'texts': texts, 'quantize': 'binary', 'encoding': 'float'})
+    assert binary['shape'] == [3, 1] and binary['dimensions'] == 8
+    assert np.array_equal(np.unpackbits(np.array(binary['embeddings'], dtype=np.uint8), axis=1), (vectors > 0).astype(np.uint8))
+
+    error = embeddings.run_embedding({'texts': texts, 'model': 'titan-embed-v2', 'dimensions': 300})
+    assert not error['inference_complete'] and error['error'].startswith('ValidationException')
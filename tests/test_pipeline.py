@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Tests for the pipelined executor
+"""
+
+import json
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+# Add project root to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from src import cache_backends, pipeline, result_writer
+
+def test_stages_overlap_and_report_stats():
+    """Test fan-out, bounded queues, concurrent slow stages and per-stage counts"""
+    results = []
+    lock = threading.Lock()
+
+    def slow(item):
+        time.sleep(0.02)
+        return item * 2
+
+    def collect(item):
+        with lock:
+            results.append(item)
+
+    stages = [
+        pipeline.Stage('split', lambda item: range(item * 10, item * 10 + 10), fan_out=True),
+        pipeline.Stage('slow', slow, workers=10, queue_size=4),
+        pipeline.Stage('collect', collect)
+    ]
+    start = time.perf_counter()
+    stats = pipeline.Pipeline(stages).run(range(5))
+
+    assert sorted(results) == [n * 2 for n in range(50)]
+    # 50 sleeps of 20 ms across 10 threads
+    assert time.perf_counter() - start < 0.5
+    counts = {stage['stage']: (stage['items'], stage['emitted']) for stage in stats['stages']}
+    assert counts == {'read': (5, 5), 'split': (5, 50), 'slow': (50, 50), 'collect': (50, 0)}
+    assert stats['stages'][2]['max_queue_depth'] <= 4
+    assert stats['bottleneck'] == 'slow'
+
+def test_stage_error_stops_the_pipeline():
+    """Test that the first exception is raised instead of hanging on full queues"""
+    def fail(item):
+        if item == 3:
+            raise ValueError('bad item')
+        return item
+
+    stages = [pipeline.Stage('check', fail), pipeline.Stage('sink', lambda item: time.sleep(0.01), queue_size=1)]
+    with pytest.raises(ValueError, match='bad item'):
+        pipeline.Pipeline(stages).run(range(1000))
+
+def test_run_pipeline_serves_repeats_from_cache(tmp_path, monkeypatch):
+    """Test the end-to-end stages: templated prompts, model calls, cache hits and JSONL output"""
+    monkeypatch.setenv('CACHE_BACKEND', 'memory')
+    monkeypatch.setenv('CACHE_WRITE_BEHIND', 'false')
+    monkeypatch.setattr(cache_backends, '_backend', None)
+
+    path = tmp_path / 'input.csv'
+    path.write_text('topic,text\n' + ''.join(f't{i},note {i}\n' for i in range(120)))
+    calls = []
+
+    def model(data):
+        calls.append(data['prompt'])
+        return {'inference_complete': True, 'result': data['prompt'].upper(), 'data': data}
+
+    output = tmp_path / 'results.jsonl'
+    first = pipeline.run_pipeline(str(path), str(output), '{topic}: {text}', inference_function=model, chunk_rows=25)
+    assert (first['requests'], first['cache_hits'], first['failed']) == (120, 0, 0)
+
+    records = sorted((json.loads(line) for line in output.read_text().splitlines()), key=lambda r: r['row_id'])
+    assert records[7]['output'] == 'T7: NOTE 7' and records[7]['prompt_hash'] == result_writer.prompt_hash('t7: note 7')
+    assert not records[7]['cached'] and records[7]['latency_ms'] >= 0
+
+    second = pipeline.run_pipeline(str(path), None, '{topic}: {text}', inference_function=model)
+    assert second['cache_hits'] == 120 and len(calls) == 120
+
+def test_run_pipeline_fans_back_duplicates(tmp_path, monkeypatch):
+    """Test that each distinct prompt is sent once and every row gets a result"""
+    monkeypatch.setenv('ENABLE_CACHE', 'false')
+    path = tmp_path / 'input.jsonl'
+    path.write_text(''.join(json.dumps({'prompt': f'question {i % 10}'}) + '\n' for i in range(100)))
+    calls = []
+
+    def model(data):
+        calls.append(data['row_id'])
+        return {'inference_complete': True, 'result': data['prompt'].upper()}
+
+    output = tmp_path / 'results.jsonl'
+    stats = pipeline.run_pipeline(str(path), str(output), inference_function=model, dedup='exact')
+    assert sorted(calls) == list(range(10))
+    assert (stats['requests'], stats['duplicates'], stats['dedup']['calls_saved']) == (10, 90, 0.9)
+
+    records = {record['row_id']: record for record in map(json.loads, output.read_text().splitlines())}
+    assert len(records) == 100
+    assert records[57]['output'] == 'QUESTION 7' and records[57]['duplicate_of'] == 7
+    assert records[7]['duplicate_of'] is None
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Tests for prompt prefix caching
+"""
+
+import json
+import os
+import sys
+from unittest.mock import Mock
+
+# Add project root to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from src import metrics, multi_model, prompt_cache
+
+MODEL = {'max_tokens': 100, 'temperature': 0.7, 'top_p': 0.9, 'prompt_cache_min_tokens': 10}
+
+def test_repeated_document_prefix_gets_checkpoint(monkeypatch):
+    """Test that a shared leading document is cached from its second use"""
+    monkeypatch.setattr(prompt_cache, 'tracker', prompt_cache.PrefixTracker())
+    document = 'Quarterly report. ' * 20
+
+    first = prompt_cache.build_anthropic_body({'prompt': f"{document}\n\nSummarize it"}, MODEL)
+    second = prompt_cache.build_anthropic_body({'prompt': f"{document}\n\nList the risks"}, MODEL)
+
+    assert first['messages'][0]['content'] == [{'type': 'text', 'text': f"{document}\n\nSummarize it"}]
+    cached, question = second['messages'][0]['content']
+    assert cached == {'type': 'text', 'text': f"{document}\n\n", 'cache_control': {'type': 'ephemeral'}}
+    assert question == {'type': 'text', 'text': 'List the risks'}
+
+def test_system_prompt_checkpoint_and_unsupported_models(monkeypatch):
+    """Test system prompt caching, and that models without support get no checkpoints"""
+    monkeypatch.setattr(prompt_cache, 'tracker', prompt_cache.PrefixTracker())
+    data = {'system': 'You are a careful analyst. ' * 10, 'prompt': 'Hello'}
+
+    prompt_cache.build_anthropic_body(data, MODEL)
+    body = prompt_cache.build_anthropic_body(data, MODEL)
+    assert body['system'][-1]['cache_control'] == {'type': 'ephemeral'}
+    assert 'cache_control' not in json.dumps(prompt_cache.build_anthropic_body(data, {**MODEL, 'prompt_cache_min_tokens': None}))
+
+    # Short prefixes stay below the provider minimum
+    short = {'system': 'Be brief.', 'prompt': 'Hello'}
+    prompt_cache.build_anthropic_body(short, MODEL)
+    assert 'cache_control' not in json.dumps(prompt_cache.build_anthropic_body(short, MODEL))
+
+def test_cached_input_tokens_are_recorded(monkeypatch):
+    """Test that usage from the model response feeds the token metrics"""
+    monkeypatch.setattr(metrics, 'registry', metrics.MetricsRegistry())
+    bedrock = Mock()
+    bedrock.invoke_model.return_value.get.return_value.read.return_value = json.dumps({
+        'content': [{'text': 'ok'}],
+        'usage': {'input_tokens': 12, 'cache_read_input_tokens': 2048, 'cache_creation_input_tokens': 0, 'output_tokens': 5}
+    })
+    monkeypatch.setattr(multi_model, '_bedrock_client', bedrock)
+
+    result = multi_model.run_inference_with_model({'prompt': 'Hi', 'system': 'Rules'}, 'claude-3-5-haiku')
+
+    assert result['usage']['cache_read_input_tokens'] == 2048
+    assert json.loads(bedrock.invoke_model.call_args.kwargs['body'])['system'] == [{'type': 'text', 'text': 'Rules'}]
+    counters = {(c['name'], c['labels'].get('kind')): c['value'] for c in metrics.registry.snapshot()['counters']}
+    assert counters[('model_input_tokens', 'cache_read')] == 2048
+    assert counters[('model_input_tokens', 'uncached')] == 12
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Tests for columnar result output
+"""
+
+import json
+import os
+import sys
+
+import pytest
+
+# Add project root to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+pa = pytest.importorskip('pyarrow')
+import pyarrow.parquet as pq
+
+from src import result_writer
+
+def records(count):
+    """Result rows with a mix of completed, cached and failed requests"""
+    rows = []
+    for row_id in range(count):
+        response = {
+            'inference_complete': row_id % 10 != 0,
+            'result': f'answer {row_id}',
+            # A model first seen in a later row group extends the dictionary
+            'model': 'claude-haiku' if row_id < 150 else 'titan-text',
+            'usage': {'input_tokens': 20 + row_id % 5, 'output_tokens': 7}
+        }
+        if row_id % 10 == 0:
+            response['error'] = 'ThrottlingException'
+        rows.append(result_writer.result_record(row_id, {'prompt': f'question {row_id}'}, response, 12.5, row_id % 3 == 0))
+    return rows
+
+@pytest.mark.parametrize('suffix', ['parquet', 'arrow'])
+def test_columnar_writers_flush_row_groups(tmp_path, monkeypatch, suffix):
+    """Test that rows are flushed in row groups and read back intact"""
+    monkeypatch.setattr(result_writer, 'RESULT_ROW_GROUP_ROWS', 100)
+    path = str(tmp_path / f'results.{suffix}')
+    rows = records(250)
+
+    writer = result_writer.open_result_writer(path)
+    for row in rows:
+        writer.write(row)
+    writer.close()
+
+    assert writer.row_groups == 3
+    if suffix == 'parquet':
+        assert pq.ParquetFile(path).metadata.num_row_groups == 3
+        table = pq.read_table(path)
+    else:
+        table = pa.ipc.open_file(path).read_all()
+    assert table.schema.equals(result_writer.result_schema())
+    assert table.to_pylist()[10] == rows[10] and table.to_pylist()[200] == rows[200]
+    assert table.column('error').null_count == 225
+
+def test_result_format_from_suffix(tmp_path):
+    """Test suffix detection and the JSONL writer's identical rows"""
+    assert result_writer.detect_result_format('s3://bucket/out.PARQUET') == 'parquet'
+    assert result_writer.detect_result_format('out.feather') == 'arrow'
+    assert result_writer.detect_result_format('out.jsonl') == 'jsonl'
+
+    path = tmp_path / 'results.jsonl'
+    writer = result_writer.open_result_writer(str(path))
+    for row in records(3):
+        writer.write(row)
+    writer.close()
+    assert [json.loads(line) for line in path.read_text().splitlines()] == records(3)
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Tests for the streaming load test results log
+"""
+
+import os
+import sys
+import random
+
+# Add scripts to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'scripts'))
+
+from results_log import LatencyHistogram, ResultLogWriter, StreamingStats, TimeSeriesAggregator, parse_timing_headers, read_results
+
+def test_histogram_percentiles_close_to_exact():
+    """Test that histogram percentiles stay within the configured accuracy"""
+    random.seed(7)
+    values = [random.lognormvariate(0, 0.5) for _ in range(5000)]
+    
+    histogram = LatencyHistogram()
+    for value in values:
+        histogram.add(value)
+    
+    ordered = sorted(values)
+    for p in (50, 95, 99):
+        exact = ordered[min(int(p / 100 * len(ordered)), len(ordered) - 1)]
+        assert abs(histogram.percentile(p) - exact) / exact < 0.03
+
+def test_result_log_rotation_and_lazy_read(tmp_path):
+    """Test that the writer rotates segments and the reader sees every result"""
+    with ResultLogWriter(tmp_path, prefix='run', max_bytes=200) as writer:
+        for i in range(50):
+            writer.write({'test_id': i, 'success': i % 5 != 0, 'response_time': 0.1 + i / 100})
+    
+    assert len(writer.files) > 1
+    
+    stats = StreamingStats()
+    for result in read_results([tmp_path]):
+        stats.add(result)
+    
+    summary = stats.summary(total_time=10)
+    assert summary['total_requests'] == 50
+    assert summary['failed_requests'] == 10
+    assert summary['requests_per_second'] == 5
+
+def test_timeseries_windows_and_export(tmp_path):
+    """Test that results land in per-second windows, including empty gaps"""
+    timeseries = TimeSeriesAggregator(start_time=100.0)
+    timeseries.add({'success': True, 'response_time': 0.2, 'timestamp': 100.1})
+    timeseries.add({'success': False, 'response_time': 0.5, 'timestamp': 100.9})
+    timeseries.add({'success': True, 'response_time': 0.4, 'timestamp': 102.5})
+    
+    rows = list(timeseries.rows())
+    assert [row['requests'] for row in rows] == [2, 0, 1]
+    assert rows[0]['error_rate'] == 50
+    
+    output = timeseries.export(tmp_path / 'timeseries.csv')
+    with open(output) as f:
+        assert len(f.readlines()) == 4
+
+def test_cold_start_init_is_not_network_time():
+    """Test that init duration is split out of the client-side remainder"""
+    headers = {'X-Cold-Start': 'true', 'X-Server-Time-Ms': '300.0', 'X-Init-Duration-Ms': '1200.0'}
+    timing = parse_timing_headers(headers, 1.6)
+    assert timing['cold_start'] and abs(timing['init_duration'] - 1.2) < 1e-9
+    assert abs(timing['network_time'] - 0.1) < 1e-9
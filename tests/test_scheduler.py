@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+Tests for request scheduling
+"""
+
+import asyncio
+import json
+import os
+import sys
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from unittest.mock import Mock
+
+import pytest
+
+# Add project root to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from src import cache_backends, embeddings, inference, metrics, multi_model, scheduler
+
+def test_concurrent_submissions_share_batches(monkeypatch):
+    """Test batching by size and wait time, result fan-out, errors and metrics"""
+    monkeypatch.setattr(metrics, 'registry', metrics.MetricsRegistry())
+    sizes = []
+
+    def double(items):
+        sizes.append(len(items))
+        if 'bad' in items:
+            raise ValueError('bad item')
+        return [item * 2 for item in items]
+
+    batcher = scheduler.MicroBatcher('test', double, max_size=8, max_wait_ms=100)
+    barrier = threading.Barrier(20)
+
+    def submit(item):
+        barrier.wait()
+        return batcher.submit(item).result(timeout=5)
+
+    with ThreadPoolExecutor(max_workers=20) as executor:
+        assert list(executor.map(submit, range(20))) == [n * 2 for n in range(20)]
+    assert sum(sizes) == 20 and len(sizes) <= 5 and max(sizes) == 8
+
+    with pytest.raises(ValueError, match='bad item'):
+        batcher.submit('bad').result(timeout=5)
+
+    histogram = next(h for h in metrics.registry.snapshot()['histograms'] if h['name'] == 'batch_size')
+    assert histogram['labels'] == {'batcher': 'test'} and histogram['sum'] == 21
+
+def test_embedding_batch_packs_requests_into_shared_calls(fake_bedrock):
+    """Test that several /embed requests are sent as one Cohere call and split back"""
+    items = [
+        {'texts': [f'request {i} text {j}' for j in range(10)], 'model': 'cohere-embed-english', 'encoding': 'float'}
+        for i in range(5)
+    ]
+    items.append({'texts': [], 'model': 'cohere-embed-english'})
+
+    results = embeddings.run_embedding_batch(items)
+
+    # The empty request fails on its own; the others then run separately
+    assert not results[-1]['inference_complete'] and all(result['inference_complete'] for result in results[:-1])
+    fake_bedrock.invoke_model.reset_mock()
+    results = embeddings.run_embedding_batch(items[:-1])
+    assert fake_bedrock.invoke_model.call_count == 1
+    assert len(json.loads(fake_bedrock.invoke_model.call_args.kwargs['body'])['texts']) == 50
+    single = embeddings.run_embedding(items[3])
+    assert results[3]['embeddings'] == single['embeddings'] and results[3]['shape'] == [10, 8]
+
+def test_fair_queue_weights_classes_and_isolates_tenants(monkeypatch):
+    """Test that interactive requests overtake a bulk backlog and delay is recorded per class"""
+    monkeypatch.setattr(metrics, 'registry', metrics.MetricsRegistry())
+    fair_queue = scheduler.FairQueue(capacity=1, tenant_limit=10, weights={'interactive': 4, 'batch': 1})
+    assert fair_queue.acquire('bulk', 'batch').done()
+
+    waiting = [('bulk', fair_queue.acquire('bulk', 'batch')) for _ in range(8)]
+    waiting += [('web', fair_queue.acquire('web', 'interactive')) for _ in range(4)]
+    order = []
+    for _ in range(len(waiting)):
+        fair_queue.release(order[-1] if order else 'bulk')
+        granted = [(tenant, future) for tenant, future in waiting if future.done()]
+        order.append(granted[0][0])
+        waiting.remove(granted[0])
+
+    assert order[:5].count('web') == 4 and order[5:] == ['bulk'] * 7
+    histograms = {h['labels']['priority']: h['count'] for h in metrics.registry.snapshot()['histograms'] if h['name'] == 'queue_delay_ms'}
+    assert histograms == {'batch': 9, 'interactive': 4}
+
+def test_tenant_caps_and_cancelled_waiters():
+    """Test per-tenant concurrency caps, leaving the queue and the async slot holder"""
+    fair_queue = scheduler.FairQueue(capacity=4, tenant_limit=2)
+    first, second, third = (fair_queue.acquire('a', 'batch') for _ in range(3))
+    assert first.done() and second.done() and not third.done()
+    assert fair_queue.acquire('b', 'interactive').done()
+
+    fourth = fair_queue.acquire('a', 'batch')
+    assert fourth.cancel()
+    fair_queue.release('a')
+    assert third.done() and fourth.cancelled()
+    assert fair_queue.tenant_running == {'a': 2, 'b': 1}
+
+    with pytest.raises(ValueError, match='ValidationException'):
+        scheduler.parse_priority('urgent')
+
+    async def hold(tenant):
+        async with scheduler.admitted_async((tenant, 'batch')):
+            await asyncio.sleep(0.01)
+
+    async def main():
+        waiter = asyncio.ensure_future(hold('a'))
+        await asyncio.sleep(0.01)
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+        await hold('c')
+
+    scheduler._fair_queue = fair_queue
+    try:
+        asyncio.run(main())
+    finally:
+        scheduler._fair_queue = None
+    # The cancelled waiter is skipped once tenant a has room again
+    assert fair_queue.tenant_running == {'a': 2, 'b': 1}
+    fair_queue.release('a')
+    assert fair_queue.tenant_running == {'a': 1, 'b': 1} and not fair_queue.flows
+
+    # Cancelled after the queue started granting the slot: the slot is still given back
+    granting = Future()
+    granting.set_running_or_notify_cancel()
+    released = []
+    fair_queue.acquire = lambda tenant, priority: granting
+    fair_queue.release = released.append
+
+    async def cancel_mid_grant():
+        waiter = asyncio.ensure_future(scheduler.acquire_slot(('d', 'interactive')))
+        await asyncio.sleep(0.01)
+        waiter.cancel()
+        threading.Timer(0.05, granting.set_result, [None]).start()
+        await asyncio.gather(waiter, return_exceptions=True)
+
+    scheduler._fair_queue = fair_queue
+    try:
+        asyncio.run(cancel_mid_grant())
+    finally:
+        scheduler._fair_queue = None
+    assert released == ['d']
+
+def test_tenant_and_priority_stay_out_of_shared_responses(monkeypatch):
+    """Test that two tenants sending one prompt share the cached answer but not each other's flow"""
+    monkeypatch.setenv('CACHE_BACKEND', 'memory')
+    monkeypatch.setenv('CACHE_WRITE_BEHIND', 'false')
+    monkeypatch.setattr(cache_backends, '_backend', None)
+    bedrock = Mock()
+    bedrock.invoke_model.return_value.get.return_value.read.return_value = json.dumps({
+        'content': [{'text': 'ok'}], 'usage': {'input_tokens': 10, 'output_tokens': 1}
+    })
+    monkeypatch.setattr(multi_model, '_bedrock_client', bedrock)
+    flows = []
+    admitted = scheduler.admitted
+    monkeypatch.setattr(inference, 'admitted', lambda flow: flows.append(flow) or admitted(flow))
+
+    bodies = []
+    for tenant, priority in [('acme', 'batch'), ('globex', None)]:
+        event = {'body': json.dumps({'prompt': 'Same question', 'priority': priority}), 'headers': {'X-Tenant-Id': tenant}}
+        response = inference.lambda_handler(event, None)
+        assert response['statusCode'] == 200, response['body']
+        bodies.append(json.loads(response['body']))
+
+    assert flows == [('acme', 'batch'), ('globex', 'interactive')]
+    assert bedrock.invoke_model.call_count == 1 and bodies[0]['result'] == bodies[1]['result'] == 'ok'
+    for body in bodies:
+        assert 'tenant' not in body['data'] and 'priority' not in body['data']
+
+    batch = [{'prompt': 'a', 'tenant': 'acme'}, {'prompt': 'b', 'tenant': 'globex', 'priority': 'batch'}]
+    assert scheduler.request_flow(batch) == ('acme', 'interactive')
+    assert batch == [{'prompt': 'a'}, {'prompt': 'b'}]
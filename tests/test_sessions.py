@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Tests for multi-turn conversation sessions
+"""
+
+import pytest
+import os
+import sys
+
+# Add project root to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from src import sessions
+
+@pytest.fixture(params=['memory', 'sqlite', 'dynamodb'])
+def store(request, tmp_path, monkeypatch):
+    """Create each store against a local backend"""
+    if request.param == 'memory':
+        yield sessions.MemorySessionStore(max_sessions=10)
+    elif request.param == 'sqlite':
+        yield sessions.SQLiteSessionStore(str(tmp_path / 'sessions.db'))
+    else:
+        moto = pytest.importorskip('moto')
+        import boto3
+        monkeypatch.setenv('AWS_DEFAULT_REGION', 'us-east-1')
+        monkeypatch.setenv('AWS_ACCESS_KEY_ID', 'testing')
+        monkeypatch.setenv('AWS_SECRET_ACCESS_KEY', 'testing')
+        with moto.mock_aws():
+            boto3.resource('dynamodb').create_table(
+                TableName='test-sessions',
+                KeySchema=[{'AttributeName': 'session_id', 'KeyType': 'HASH'}],
+                AttributeDefinitions=[{'AttributeName': 'session_id', 'AttributeType': 'S'}],
+                BillingMode='PAY_PER_REQUEST'
+            )
+            yield sessions.DynamoDBSessionStore('test-sessions')
+
+def test_store_round_trip_and_delete(store):
+    """Test that every store saves, loads and deletes sessions"""
+    session = {'messages': [{'role': 'user', 'content': 'hi'}], 'summary': None, 'updated_at': 1}
+    store.save('abc', session)
+
+    assert store.load('abc') == session
+    assert store.load('missing') is None
+
+    store.delete('abc')
+    assert store.load('abc') is None
+
+@pytest.fixture
+def memory_sessions(monkeypatch):
+    """Use the in-process session store"""
+    monkeypatch.setenv('SESSION_STORE', 'memory')
+    monkeypatch.setattr(sessions, '_store', None)
+    return sessions.get_session_store()
+
+def test_delta_requests_build_history(memory_sessions):
+    """Test that each turn sends only the new prompt and history is added server-side"""
+    requests = []
+    def fake_inference(data):
+        requests.append(data)
+        return {'inference_complete': True, 'result': f"answer {len(requests)}", 'data': data}
+
+    sessions.run_session_inference({'session_id': 's1', 'prompt': 'first'}, fake_inference)
+    result = sessions.run_session_inference({'session_id': 's1', 'prompt': 'second'}, fake_inference)
+
+    assert requests[1]['messages'] == [
+        {'role': 'user', 'content': 'first'},
+        {'role': 'assistant', 'content': 'answer 1'}
+    ]
+    assert 'session_id' not in requests[1]
+    assert result['turns'] == 2
+    assert result['data'] == {'session_id': 's1', 'prompt': 'second'}
+
+def test_history_is_folded_into_the_prompt_for_titan(memory_sessions):
+    """Test that models without message support still get the conversation"""
+    requests = []
+    def fake_inference(data):
+        requests.append(data)
+        return {'inference_complete': True, 'result': f"answer {len(requests)}"}
+
+    sessions.run_session_inference({'session_id': 's3', 'prompt': 'first', 'model': 'titan-text', 'system': 'Be brief'}, fake_inference)
+    result = sessions.run_session_inference({'session_id': 's3', 'prompt': 'second', 'model': 'titan-text'}, fake_inference)
+
+    assert 'messages' not in requests[-1] and 'system' not in requests[-1]
+    assert requests[-1]['prompt'] == 'User: first\n\nAssistant: answer 1\n\nUser: second\nAssistant:'
+    assert requests[0]['prompt'].startswith('Be brief\n\n')
+    assert result['turns'] == 2 and result['data']['prompt'] == 'second'
+
+def test_history_is_trimmed_into_summary(memory_sessions, monkeypatch):
+    """Test that turns over the token budget are folded into a summary"""
+    monkeypatch.setattr(sessions, 'SESSION_TOKEN_BUDGET', 100)
+    memory_sessions.save('s2', {
+        'messages': [{'role': 'user', 'content': 'x' * 200}, {'role': 'assistant', 'content': 'y' * 200}] * 2,
+        'summary': None,
+        'updated_at': 0
+    })
+
+    requests = []
+    def fake_inference(data):
+        requests.append(data)
+        if data['prompt'].startswith('Update the summary'):
+            return {'inference_complete': True, 'result': 'they talked about x and y'}
+        return {'inference_complete': True, 'result': 'ok'}
+
+    sessions.run_session_inference({'session_id': 's2', 'prompt': 'next'}, fake_inference)
+
+    turn = requests[-1]
+    assert len(turn['messages']) < 4
+    assert turn['system'][-1]['text'].endswith('they talked about x and y')
+    assert memory_sessions.load('s2')['summary'] == 'they talked about x and y'
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Tests for structured output (JSON mode)
+"""
+
+import json
+import os
+import sys
+from unittest.mock import Mock
+
+# Add project root to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from src import cached_inference, multi_model, structured_output
+
+SCHEMA = {
+    'type': 'object',
+    'properties': {
+        'sentiment': {'enum': ['positive', 'negative', 'neutral']},
+        'score': {'type': 'number', 'minimum': 0, 'maximum': 1},
+        'topics': {'type': 'array', 'items': {'type': 'string'}}
+    },
+    'required': ['sentiment', 'score'],
+    'additionalProperties': False
+}
+
+def test_compiled_validator_is_cached_and_reports_errors():
+    """Test validation errors and reuse of the compiled validator"""
+    assert structured_output.get_validator(SCHEMA) is structured_output.get_validator(json.loads(json.dumps(SCHEMA)))
+    assert structured_output.validate({'sentiment': 'positive', 'score': 0.9, 'topics': ['a']}, SCHEMA) == []
+
+    errors = structured_output.validate({'sentiment': 'angry', 'topics': [1], 'extra': True}, SCHEMA)
+    assert "$: missing required property 'score'" in errors
+    assert '$.topics[0]: expected string' in errors
+    assert "$: unexpected property 'extra'" in errors
+    assert any(error.startswith('$.sentiment') for error in errors)
+
+def test_incremental_parser_emits_members_as_they_complete():
+    """Test that members are reported on their closing character, across chunk boundaries"""
+    parser = structured_output.IncrementalJSONParser()
+    text = '{"note": "a, {tricky} \\"value\\"", "nested": {"x": [1, 2]}, "n": 3}'
+
+    emitted = []
+    for position, char in enumerate(text):
+        for member in parser.feed(char):
+            emitted.append((member, position))
+
+    assert [member for member, _ in emitted] == [
+        ('note', 'a, {tricky} "value"'),
+        ('nested', {'x': [1, 2]}),
+        ('n', 3)
+    ]
+    # The first member is available long before the document ends
+    assert emitted[0][1] < len(text) // 2
+    assert parser.done
+
+def test_json_mode_request_and_stream(monkeypatch):
+    """Test prefill, validation of the full response and streamed member events"""
+    bedrock = Mock()
+    bedrock.invoke_model.return_value.get.return_value.read.return_value = json.dumps({
+        'content': [{'text': '"sentiment": "positive", "score": 1.5}'}]
+    })
+    deltas = ['"sentiment": "neg', 'ative", "sco', 're": 0.2}']
+    bedrock.invoke_model_with_response_stream.return_value = {'body': [
+        {'chunk': {'bytes': json.dumps({'type': 'content_block_delta', 'delta': {'text': delta}}).encode()}}
+        for delta in deltas
+    ]}
+    monkeypatch.setattr(multi_model, '_bedrock_client', bedrock)
+    data = {'prompt': 'Great product', 'response_schema': SCHEMA}
+
+    result = multi_model.run_inference_with_model(data)
+    body = json.loads(bedrock.invoke_model.call_args.kwargs['body'])
+    assert body['messages'][-1] == {'role': 'assistant', 'content': '{'}
+    assert result['output'] == {'sentiment': 'positive', 'score': 1.5}
+    assert not result['inference_complete'] and 'maximum' in result['error']
+
+    events = list(multi_model.stream_inference_with_model(data))
+    assert [(event['member'], event['value']) for event in events[:-1]] == [('sentiment', 'negative'), ('score', 0.2)]
+    assert events[-1]['done'] and events[-1]['errors'] == []
+
+    assert cached_inference.get_cache_key('p', None, cached_inference.request_options(data)) != cached_inference.get_cache_key('p')
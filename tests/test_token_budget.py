@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Tests for token budgeting
+"""
+
+import json
+import os
+import sys
+from unittest.mock import Mock
+
+# Add project root to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from src import cache_backends, cached_inference, multi_model, token_budget
+
+def test_estimate_and_truncate():
+    """Test that estimates are pessimistic and truncation keeps both ends"""
+    assert token_budget.estimate_tokens('') == 0
+    assert token_budget.estimate_tokens('hello world') >= 2
+    assert token_budget.estimate_tokens('{"a": [1, 2]}') >= 10
+
+    text = 'Instructions first. ' + 'filler words ' * 2000 + 'Final question?'
+    truncated = token_budget.truncate_text(text, 500)
+    assert token_budget.estimate_tokens(truncated) <= 500
+    assert truncated.startswith('Instructions first.') and truncated.endswith('Final question?')
+    assert token_budget.TRUNCATION_MARKER in truncated
+
+def test_max_tokens_follows_request_class():
+    """Test output sizing per request class and model limits"""
+    model = multi_model.MODELS['llama3']
+    assert token_budget.size_max_tokens(model, 'classify', 1000) == 16
+    assert token_budget.size_max_tokens(model, 'summarize', 400) == 100
+    assert token_budget.size_max_tokens(model, 'generate', 10) == model['max_output_tokens']
+    assert token_budget.size_max_tokens(model, None, 10) == model['max_tokens']
+
+def test_oversized_prompts_are_trimmed_or_rejected(monkeypatch):
+    """Test that the budget is applied before the Bedrock call"""
+    bedrock = Mock()
+    bedrock.invoke_model.return_value.get.return_value.read.return_value = json.dumps({
+        'results': [{'outputText': 'ok'}]
+    })
+    monkeypatch.setattr(multi_model, '_bedrock_client', bedrock)
+    prompt = 'word ' * 20000
+
+    result = multi_model.run_inference_with_model({'prompt': prompt, 'overflow': 'reject'}, 'titan-text')
+    assert not result['inference_complete']
+    assert result['error'].startswith('ValidationException')
+    bedrock.invoke_model.assert_not_called()
+
+    result = multi_model.run_inference_with_model({'prompt': prompt, 'request_class': 'classify'}, 'titan-text')
+    body = json.loads(bedrock.invoke_model.call_args.kwargs['body'])
+    assert result['inference_complete']
+    assert body['textGenerationConfig']['maxTokenCount'] == 16
+    assert token_budget.estimate_tokens(body['inputText']) <= 8192 - 16
+
+def test_overflow_policy_is_part_of_the_cache_key(monkeypatch):
+    """Test that a cached rejection is not served to the same prompt with overflow=truncate"""
+    monkeypatch.setenv('CACHE_BACKEND', 'memory')
+    monkeypatch.setenv('CACHE_WRITE_BEHIND', 'false')
+    monkeypatch.setattr(cache_backends, '_backend', None)
+    bedrock = Mock()
+    bedrock.invoke_model.return_value.get.return_value.read.return_value = json.dumps({
+        'results': [{'outputText': 'ok'}]
+    })
+    monkeypatch.setattr(multi_model, '_bedrock_client', bedrock)
+    request = {'prompt': 'word ' * 20000, 'model': 'titan-text'}
+
+    rejected = cached_inference.run_cached_inference({**request, 'overflow': 'reject'}, multi_model.run_inference_with_model)
+    truncated = cached_inference.run_cached_inference({**request, 'overflow': 'truncate'}, multi_model.run_inference_with_model)
+
+    assert not rejected['inference_complete'] and truncated['inference_complete']
+    assert bedrock.invoke_model.call_count == 1
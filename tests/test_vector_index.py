@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Tests for the vector index and retrieval
+"""
+
+import json
+import os
+import sys
+from unittest.mock import Mock
+
+import numpy as np
+
+# Add project root to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from src import embeddings, multi_model, vector_index
+
+def clustered_vectors(count, dimensions=16, clusters=20, seed=0):
+    """Unit vectors scattered around random centres, like real embeddings"""
+    rng = np.random.default_rng(seed)
+    centres = rng.normal(size=(clusters, dimensions))
+    vectors = centres[rng.integers(0, clusters, count)] + rng.normal(scale=0.3, size=(count, dimensions))
+    return (vectors / np.linalg.norm(vectors, axis=1, keepdims=True)).astype(np.float32)
+
+def test_search_snapshot_and_inserts(tmp_path, monkeypatch):
+    """Test exact top-k, mmap snapshots, inserts after loading and IVF recall"""
+    monkeypatch.setattr(vector_index, 'SEARCH_BLOCK_ROWS', 300)
+    vectors = clustered_vectors(2000)
+    queries = clustered_vectors(20, seed=1)
+    truth = np.argsort(-(queries @ vectors.T), axis=1)[:, :5]
+
+    index = vector_index.VectorIndex(16)
+    index.add(vectors[:1500], [f'passage {i}' for i in range(1500)])
+    index.save(str(tmp_path / 'index'))
+    loaded = vector_index.VectorIndex.load(str(tmp_path / 'index'))
+    assert isinstance(loaded.vectors, np.memmap)
+    assert loaded.add(vectors[1500:], [f'passage {i}' for i in range(1500, 2000)])[0] == 1500
+
+    ids, scores = loaded.search(queries, k=5)
+    assert np.array_equal(ids, truth)
+    assert np.all(np.diff(scores, axis=1) <= 0) and loaded.passage(1999) == 'passage 1999'
+
+    loaded.train(nlist=32)
+    loaded.save(str(tmp_path / 'index'))
+    trained = vector_index.VectorIndex.load(str(tmp_path / 'index'))
+    assert trained.nlist == 32 and len(trained) == 2000
+    ids, _ = trained.search(queries, k=5, nprobe=8)
+    assert np.mean([len(set(found) & set(expected)) / 5 for found, expected in zip(ids, truth)]) >= 0.9
+    assert trained.passage(ids[0][0]) == f'passage {truth[0][0]}'
+
+    # Fewer vectors than k pads with -1
+    ids, _ = vector_index.VectorIndex(16).search(queries[0], k=3)
+    assert ids.tolist() == [[-1, -1, -1]]
+
+def test_search_during_compact_and_train(monkeypatch):
+    """Test that a search racing compact() and train() keeps one consistent snapshot"""
+    vectors = clustered_vectors(1000)
+    index = vector_index.VectorIndex(16)
+    index.add(vectors[:500], [f'passage {i}' for i in range(500)])
+    index.compact()
+    index.add(vectors[500:], [f'passage {i}' for i in range(500, 1000)])
+    probes = np.array([3, 600, 999])
+
+    # Rebuild the index while a search is between scanning the snapshot and the tail
+    scan = index._scan
+    def racing_scan(*args):
+        if not index.nlist:
+            index.train(nlist=8)
+        return scan(*args)
+    monkeypatch.setattr(index, '_scan', racing_scan)
+
+    ids, scores = index.search(vectors[probes], k=1, exact=True)
+    assert ids[:, 0].tolist() == probes.tolist() and np.allclose(scores[:, 0], 1, atol=1e-5)
+    assert len(index) == 1000 and index.passage(999) == 'passage 999'
+
+def test_retrieved_passages_are_prepended(monkeypatch):
+    """Test that retrieval runs before the model call and respects the token budget"""
+    vectors = clustered_vectors(50)
+    index = vector_index.VectorIndex(16)
+    index.add(vectors, [f'fact number {i} ' * 20 for i in range(50)])
+    monkeypatch.setattr(vector_index, '_index', index)
+    monkeypatch.setattr(vector_index, 'RETRIEVAL_MAX_TOKENS', 250)
+    monkeypatch.setattr(embeddings, 'embed_texts', lambda texts, *args, **kwargs: (vectors[[7]], {}))
+
+    bedrock = Mock()
+    bedrock.invoke_model.return_value.get.return_value.read.return_value = json.dumps({
+        'content': [{'text': 'ok'}], 'usage': {'input_tokens': 10, 'output_tokens': 1}
+    })
+    monkeypatch.setattr(multi_model, '_bedrock_client', bedrock)
+
+    result = multi_model.run_inference_with_model({'prompt': 'What is fact 7?', 'retrieve': 4}, 'claude-haiku')
+
+    assert result['inference_complete'] and result['data']['retrieved'][0] == 7
+    assert 1 <= len(result['data']['retrieved']) < 4
+    prompt = json.loads(bedrock.invoke_model.call_args.kwargs['body'])['messages'][0]['content'][0]['text']
+    assert prompt.startswith('Use the following context') and prompt.endswith('Question: What is fact 7?')
+    assert '[1] fact number 7 ' in prompt
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Tests for workload replay and synthetic traffic generation
+"""
+
+import os
+import sys
+import json
+from collections import Counter
+
+# Add scripts to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'scripts'))
+
+from workload import fit_workload, generate_synthetic, load_workload, replay_schedule
+
+def test_replay_preserves_inter_arrival_times(tmp_path):
+    """Test that replay offsets follow recorded timestamps scaled by speed-up"""
+    log = tmp_path / 'traffic.jsonl'
+    with open(log, 'w') as f:
+        for ts, prompt in [(100.0, 'a'), (102.0, 'b'), (106.0, 'c')]:
+            f.write(json.dumps({'timestamp': ts, 'prompt': prompt, 'model': 'claude-haiku'}) + '\n')
+    
+    schedule = list(replay_schedule(load_workload(log), speedup=2.0))
+    
+    assert [offset for offset, _ in schedule] == [0.0, 1.0, 3.0]
+    assert schedule[1][1] == {'prompt': 'b', 'model': 'claude-haiku'}
+
+    # Records without a prompt or a length get a prompt of typical length
+    with open(log, 'w') as f:
+        f.write(json.dumps({'timestamp': 100.0, 'request_id': 'r1'}) + '\n')
+    assert len(next(load_workload(log))['prompt']) >= 150
+
+def test_synthetic_workload_matches_fitted_popularity():
+    """Test that a synthetic workload can be fitted back to a similar profile"""
+    profile = {
+        'distinct_prompts': 200,
+        'zipf_s': 1.2,
+        'length_mu': 5.0,
+        'length_sigma': 0.5,
+        'rate': 50.0,
+        'models': {}
+    }
+    schedule = list(generate_synthetic(profile, 5000, seed=1))
+    
+    # Popular prompts repeat with identical text so they hit the cache
+    counts = Counter(payload['prompt'] for _, payload in schedule)
+    assert counts.most_common(1)[0][1] > 5000 / 20
+    
+    records = [
+        {'timestamp': offset, 'prompt': payload['prompt'], 'prompt_length': len(payload['prompt'])}
+        for offset, payload in schedule
+    ]
+    fitted = fit_workload(records)
+    assert 0.8 < fitted['zipf_s'] < 1.6
+    assert abs(fitted['rate'] - 50.0) < 5.0
+
+def test_heavy_hitters_find_most_popular_prompts():
+    """Test that the streaming sketch keeps the most frequent prompts"""
+    from warm_cache import HeavyHitters
+    
+    profile = {
+        'distinct_prompts': 500,
+        'zipf_s': 1.3,
+        'length_mu': 4.0,
+        'length_sigma': 0.3,
+        'rate': 10.0,
+        'models': {}
+    }
+    prompts = [payload['prompt'] for _, payload in generate_synthetic(profile, 20000, seed=3)]
+    
+    sketch = HeavyHitters(capacity=10, width=4096)
+    for prompt in prompts:
+        sketch.add(prompt, {'prompt': prompt})
+    
+    exact_top = {prompt for prompt, _ in Counter(prompts).most_common(5)}
+    found = {key for key, _ in sketch.most_common()}
+    assert exact_top <= found
+    assert sketch.total == 20000
+
+def test_warm_cache_refreshes_stale_entries(tmp_path, monkeypatch):
+    """Test that warming keys by request options and recomputes stale entries"""
+    from warm_cache import find_popular_prompts, warm_cache
+    from src import cache_backends, cached_inference
+    
+    monkeypatch.setenv('CACHE_BACKEND', 'memory')
+    monkeypatch.setenv('CACHE_WRITE_BEHIND', 'true')
+    monkeypatch.setattr(cache_backends, '_backend', None)
+    
+    log = tmp_path / 'traffic.jsonl'
+    with open(log, 'w') as f:
+        for record in [{'prompt': 'a'}, {'prompt': 'a', 'system': 'terse'}, {'prompt': 'b'}, {'prompt': 'c'}]:
+            f.write(json.dumps(record) + '\n')
+    entries, sketch = find_popular_prompts(log, 10)
+    assert len(entries) == 4
+    
+    backend = cache_backends.get_cache_backend()
+    backend.put(cached_inference.get_cache_key('b'), {'inference_complete': True, 'result': 'old'}, ttl=-1, grace=60)
+    backend.put(cached_inference.get_cache_key('c'), {'inference_complete': True, 'result': 'C'}, ttl=60)
+    
+    calls = []
+    def fake_inference(data):
+        calls.append((data['prompt'], data.get('system')))
+        return {'inference_complete': True, 'result': data['prompt'].upper()}
+    
+    assert warm_cache(entries, sketch.payloads, rate=0, batch_size=2, inference_function=fake_inference) == (3, 0)
+    assert sorted(calls, key=str) == [('a', 'terse'), ('a', None), ('b', None)]
+    assert cached_inference.get_from_cache(cached_inference.get_cache_key('b'))['result'] == 'B'